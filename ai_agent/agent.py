@@ -1,21 +1,21 @@
 import os
 import json
 import re
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_classic.agents import AgentExecutor, create_tool_calling_agent
+from langchain_classic.agents import create_tool_calling_agent
 from ai_agent.tools.classify_product import classify_product
 from ai_agent.tools.calculate_pricing import calculate_pricing
+from ai_agent.orchestrator import build_insurance_package
+from ai_agent.executor import ParallelAgentExecutor, PromptTokenMetrics, ToolOutputRecorder
+from ai_agent.json_stream import CompleteJSONParsed, JSONStreamTerminator
 
 load_dotenv()
 
-llm = ChatOpenAI(
-    model="gpt-5-mini-2025-08-07",
-    temperature=0,
-    openai_api_key=os.getenv("OPENAI_API_KEY")
-)
-
 tools = [classify_product, calculate_pricing]
 
 prompt = ChatPromptTemplate.from_messages([
@@ -162,19 +162,72 @@ Return JSON only. Stop immediately.
 ])
 
 
-agent = create_tool_calling_agent(llm, tools, prompt)
-agent_executor = AgentExecutor(
-    agent=agent,
-    tools=tools,
-    verbose=True,
-    max_iterations=10,
-    handle_parsing_errors=True,
-    return_intermediate_steps=False,
-    early_stopping_method="generate"
-)
+# Fields of each tool output the model needs to write the final JSON. Only these
+# are re-sent in agent_scratchpad; the full outputs stay in intermediate_steps.
+TOOL_OUTPUT_PROJECTIONS = {
+    "classify_product": [
+        "category",
+        "market",
+        "price",
+        "classification.eligible",
+        "classification.reason",
+        "classification.risk_profile",
+        "classification.document_type",
+        "classification.coverage_modules",
+        "classification.exclusions",
+        "classification.assurmax_caps",
+    ],
+    "calculate_pricing": [
+        "plan",
+        "market",
+        "12_months",
+        "24_months",
+        "value_bucket",
+        "error",
+        "reason",
+    ],
+}
+
+_agent_executor = None
+_agent_lock = threading.Lock()
+
+
+def get_llm():
+    """Agent LLM. Streaming lets JSONStreamTerminator stop the final answer as soon as its JSON is complete."""
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model="gpt-5-mini-2025-08-07",
+        temperature=0,
+        streaming=True,
+        openai_api_key=os.getenv("OPENAI_API_KEY")
+    )
+
+
+def get_agent_executor() -> ParallelAgentExecutor:
+    """Shared agent executor, built on first use (thread-safe)."""
+    global _agent_executor
+    if _agent_executor is None:
+        with _agent_lock:
+            if _agent_executor is None:
+                agent = create_tool_calling_agent(get_llm(), tools, prompt)
+                # Tool calls emitted in the same turn (e.g. the four ASSURMAX pricing calls) run concurrently
+                _agent_executor = ParallelAgentExecutor(
+                    agent=agent,
+                    tools=tools,
+                    verbose=True,
+                    max_iterations=10,
+                    handle_parsing_errors=True,
+                    return_intermediate_steps=False,
+                    early_stopping_method="generate",
+                    max_tool_workers=4,
+                    tool_timeout=60.0,
+                    tool_output_projections=TOOL_OUTPUT_PROJECTIONS
+                )
+    return _agent_executor
 
 def extract_json_from_output(output: str):
-    """Extract JSON from agent output."""
+    """Extract JSON from agent output (fallback when the answer was not cut short while streaming)."""
     if not output:
         return {"error": "Empty output from agent"}
     
@@ -208,7 +261,116 @@ def extract_json_from_output(output: str):
     }
 
 def generate_packages(product: dict):
-    """Generate insurance packages for a product."""
+    """
+    Generate insurance packages for a product.
+
+    Runs the deterministic orchestrator: one classify_product call, direct
+    pricing calls, JSON assembled in code. Same output contract as the agent.
+    """
+    try:
+        return build_insurance_package(product)
+    except Exception as e:
+        return {
+            "error": str(e),
+            "product": product.get("product_name"),
+            "eligible": False
+        }
+
+DEFAULT_BATCH_CONCURRENCY = 8
+
+
+def iter_generate_packages(products: List[dict], concurrency: int = DEFAULT_BATCH_CONCURRENCY) -> Iterator[Tuple[int, dict]]:
+    """
+    Generate packages for many products concurrently.
+
+    Yields (input_index, package) as each product completes. At most
+    `concurrency` products are in flight; a failing product yields an
+    error package and does not affect the others.
+    """
+    if not products:
+        return
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(products))))
+    try:
+        future_to_idx = {executor.submit(generate_packages, p): i for i, p in enumerate(products)}
+        for future in as_completed(future_to_idx):
+            idx = future_to_idx[future]
+            try:
+                package = future.result()
+            except Exception as e:
+                package = {
+                    "error": str(e),
+                    "product": products[idx].get("product_name"),
+                    "eligible": False
+                }
+            yield idx, package
+    finally:
+        # Consumer may stop early: drop products that have not started yet
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def generate_packages_batch(
+    products: List[dict],
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    on_result: Optional[Callable[[int, dict], None]] = None,
+) -> List[dict]:
+    """
+    Generate packages for many products, results in input order.
+
+    Args:
+        products: product dicts (same shape as generate_packages)
+        concurrency: max products processed at once
+        on_result: optional callback(index, package) fired as each product completes
+    """
+    results: List[Optional[dict]] = [None] * len(products)
+    for idx, package in iter_generate_packages(products, concurrency):
+        results[idx] = package
+        if on_result:
+            on_result(idx, package)
+    return results
+
+
+async def agenerate_packages(product: dict) -> dict:
+    """Async generate_packages; runs the blocking pipeline in a worker thread."""
+    return await asyncio.to_thread(generate_packages, product)
+
+
+async def astream_generate_packages(products: List[dict], concurrency: int = DEFAULT_BATCH_CONCURRENCY):
+    """Async counterpart of iter_generate_packages: yields (index, package) as completed."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(idx: int, product: dict):
+        async with semaphore:
+            try:
+                return idx, await agenerate_packages(product)
+            except Exception as e:
+                return idx, {"error": str(e), "product": product.get("product_name"), "eligible": False}
+
+    tasks = [asyncio.ensure_future(run(i, p)) for i, p in enumerate(products)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def agenerate_packages_batch(products: List[dict], concurrency: int = DEFAULT_BATCH_CONCURRENCY) -> List[dict]:
+    """Async generate_packages_batch: results in input order."""
+    results: List[Optional[dict]] = [None] * len(products)
+    async for idx, package in astream_generate_packages(products, concurrency):
+        results[idx] = package
+    return results
+
+def generate_packages_agentic(product: dict, details: Optional[Dict[str, Any]] = None):
+    """
+    Generate insurance packages for a product through the tool-calling agent.
+
+    Args:
+        product: product dict (same shape as generate_packages)
+        details: optional dict filled out of band with "tool_outputs" (full,
+            unprojected tool results), "prompt_tokens" (per-iteration usage)
+            and "early_stop" (final answer cut once its JSON was complete)
+    """
     product_name = product.get("product_name")
     price = product.get("price")
     currency = product.get("currency", "AED")
@@ -236,9 +398,26 @@ Market: {currency} = {"UAE" if currency == "AED" else "Tunisia"}
 Begin now.
 """
     
+    metrics = PromptTokenMetrics()
+    recorder = ToolOutputRecorder()
+    callbacks = [metrics, recorder, JSONStreamTerminator()]
+
+    def record_details(early_stop: bool):
+        if details is not None:
+            details["tool_outputs"] = recorder.outputs
+            details["prompt_tokens"] = metrics.iterations
+            details["early_stop"] = early_stop
+
     try:
-        result = agent_executor.invoke({"input": input_text})
+        try:
+            result = get_agent_executor().invoke({"input": input_text}, config={"callbacks": callbacks})
+        except CompleteJSONParsed as done:
+            # Final answer streamed a complete JSON object: generation was cut there
+            record_details(early_stop=True)
+            return done.value
+
         output = result.get("output", "")
+        record_details(early_stop=False)
         
         if isinstance(output, str):
             return extract_json_from_output(output)
@@ -252,6 +431,8 @@ Begin now.
             }
         
     except Exception as e:
+        # Failed runs keep their tool outputs and token counts too
+        record_details(early_stop=False)
         return {
             "error": str(e),
             "product": product_name,
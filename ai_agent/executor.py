@@ -0,0 +1,244 @@
+"""
+AgentExecutor that runs the tool calls of one model turn in parallel.
+
+A tool-calling model can emit several independent calls in one turn (the four
+ASSURMAX calculate_pricing calls, for example). The stock AgentExecutor runs
+them one after another; this one submits them to a worker pool and hands the
+observations back in the order the model asked for them.
+
+It also keeps the scratchpad small: tool outputs can be projected down to the
+fields the model needs before they are re-sent on every iteration, while the
+full observations stay in intermediate_steps for the caller.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.callbacks import BaseCallbackHandler, CallbackManagerForChainRun
+from langchain_core.outputs import LLMResult
+from langchain_core.tools import BaseTool
+from langchain_classic.agents import AgentExecutor
+
+
+# Worker pool of the turn being executed on this thread (see _iter_next_step)
+_turn = threading.local()
+
+
+class ParallelAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor with concurrent tool execution.
+
+    Attributes:
+        max_tool_workers: max tool calls of one turn running at once
+        tool_timeout: seconds each tool call may take before its observation
+            is replaced by a timeout message (None = no limit)
+        tool_output_projections: tool name -> dotted field paths kept when the
+            observation is fed back to the model (tools not listed pass through)
+    """
+
+    max_tool_workers: int = 4
+    tool_timeout: Optional[float] = 60.0
+    tool_output_projections: Dict[str, List[str]] = {}
+
+    def _prepare_intermediate_steps(
+        self,
+        intermediate_steps: List[Tuple[AgentAction, Any]],
+    ) -> List[Tuple[AgentAction, Any]]:
+        steps = super()._prepare_intermediate_steps(intermediate_steps)
+        if not self.tool_output_projections:
+            return steps
+        return [
+            (action, project_tool_output(observation, self.tool_output_projections.get(action.tool)))
+            for action, observation in steps
+        ]
+
+    def _iter_next_step(
+        self,
+        name_to_tool_map: Dict[str, BaseTool],
+        color_mapping: Dict[str, str],
+        inputs: Dict[str, str],
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Iterator[Union[AgentFinish, AgentAction, AgentStep]]:
+        pool = ThreadPoolExecutor(max_workers=self.max_tool_workers, thread_name_prefix="agent-tool")
+        _turn.pool = pool
+        try:
+            # The base generator yields the planned actions, then calls
+            # _perform_agent_action per action. While the pool is set that
+            # call only submits the tool, so draining it starts every tool.
+            items = list(super()._iter_next_step(
+                name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager
+            ))
+        finally:
+            _turn.pool = None
+
+        try:
+            for item in items:
+                if isinstance(item, _PendingStep):
+                    yield self._resolve(item)
+                else:
+                    yield item
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _perform_agent_action(
+        self,
+        name_to_tool_map: Dict[str, BaseTool],
+        color_mapping: Dict[str, str],
+        agent_action: AgentAction,
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ):
+        pool = getattr(_turn, "pool", None)
+        if pool is None:
+            return super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+        perform = super()._perform_agent_action
+        pending = _PendingStep(agent_action)
+
+        def run() -> AgentStep:
+            pending.started_at = time.monotonic()
+            pending.started.set()
+            return perform(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+        pending.future = pool.submit(run)
+        return pending
+
+    def _resolve(self, pending: "_PendingStep") -> AgentStep:
+        tool = pending.action.tool
+        timeout = None
+        if self.tool_timeout is not None:
+            # The clock starts when the call does, not while it waits for a worker
+            pending.started.wait()
+            timeout = max(0.0, pending.started_at + self.tool_timeout - time.monotonic())
+        try:
+            return pending.future.result(timeout=timeout)
+        except FutureTimeoutError:
+            pending.future.cancel()
+            observation = f"Error: tool '{tool}' timed out after {self.tool_timeout}s"
+        except Exception as e:
+            observation = f"Error: tool '{tool}' failed: {type(e).__name__}: {e}"
+        print(f"⚠️  {observation}")
+        return AgentStep(action=pending.action, observation=observation)
+
+
+class _PendingStep:
+    __slots__ = ("action", "future", "started", "started_at")
+
+    def __init__(self, action: AgentAction):
+        self.action = action
+        self.future: Optional[Future] = None
+        self.started = threading.Event()
+        self.started_at: Optional[float] = None
+
+
+def project_tool_output(observation: Any, fields: Optional[List[str]]) -> Any:
+    """
+    Keep only `fields` (dotted paths, e.g. "classification.risk_profile") of a
+    dict observation. JSON strings are parsed first; anything else, and
+    tools without a projection, pass through unchanged.
+    """
+    if not fields:
+        return observation
+    data = observation
+    if isinstance(observation, str):
+        try:
+            data = json.loads(observation)
+        except ValueError:
+            return observation
+    if not isinstance(data, dict):
+        return observation
+
+    projected: Dict[str, Any] = {}
+    for path in fields:
+        keys = path.split(".")
+        src = data
+        for key in keys[:-1]:
+            src = src.get(key) if isinstance(src, dict) else None
+        if not isinstance(src, dict) or keys[-1] not in src:
+            continue
+        dst = projected
+        for key in keys[:-1]:
+            dst = dst.setdefault(key, {})
+        dst[keys[-1]] = src[keys[-1]]
+    return projected
+
+
+class PromptTokenMetrics(BaseCallbackHandler):
+    """
+    Callback recording prompt / completion tokens of every LLM call in an
+    agent run, one entry per iteration (provider usage, when reported).
+    A call that ends in an error - including the final turn cut short by
+    JSONStreamTerminator - is recorded too, with the error type.
+    """
+
+    def __init__(self):
+        self.iterations: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _usage(response: Optional[LLMResult]) -> Tuple[Optional[int], Optional[int]]:
+        if response is None:
+            return None, None
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("prompt_tokens") is not None:
+            return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+        for generations in response.generations:
+            for gen in generations:
+                meta = getattr(getattr(gen, "message", None), "usage_metadata", None) or {}
+                if meta:
+                    return meta.get("input_tokens"), meta.get("output_tokens")
+        return None, None
+
+    def _record(self, response: Optional[LLMResult], error: Optional[BaseException] = None):
+        prompt_tokens, completion_tokens = self._usage(response)
+        entry = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+        if error is not None:
+            entry["error"] = type(error).__name__
+        with self._lock:
+            self.iterations.append({"iteration": len(self.iterations) + 1, **entry})
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self._record(response)
+
+    def on_llm_error(self, error: BaseException, *, response: Optional[LLMResult] = None, **kwargs: Any) -> None:
+        self._record(response, error)
+
+    @property
+    def total_prompt_tokens(self) -> int:
+        with self._lock:
+            return sum(i["prompt_tokens"] or 0 for i in self.iterations)
+
+
+class ToolOutputRecorder(BaseCallbackHandler):
+    """Callback keeping the full (unprojected) output of every tool call."""
+
+    def __init__(self):
+        self.outputs: List[Dict[str, Any]] = []
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id=None, inputs=None, **kwargs: Any) -> None:
+        with self._lock:
+            self._pending[run_id] = {
+                "tool": (serialized or {}).get("name"),
+                "input": inputs if inputs is not None else input_str,
+            }
+
+    def on_tool_end(self, output: Any, *, run_id=None, **kwargs: Any) -> None:
+        with self._lock:
+            entry = self._pending.pop(run_id, {"tool": kwargs.get("name"), "input": None})
+            entry["output"] = output
+            self.outputs.append(entry)
+
+    def on_tool_error(self, error: BaseException, *, run_id=None, **kwargs: Any) -> None:
+        # A raising tool never reaches on_tool_end: close its pending entry here
+        with self._lock:
+            entry = self._pending.pop(run_id, {"tool": kwargs.get("name"), "input": None})
+            entry["output"] = None
+            entry["error"] = f"{type(error).__name__}: {error}"
+            self.outputs.append(entry)
@@ -0,0 +1,123 @@
+"""
+Incremental JSON extraction from a token stream.
+
+The agent's final answer is a single JSON object, optionally wrapped in a
+```json fence or a sentence of prose. Instead of waiting for the whole
+completion and regex-scanning it, the streamed tokens are fed to
+IncrementalJSONParser and the LLM stream is cut as soon as the first
+complete top-level object parses.
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class IncrementalJSONParser:
+    """
+    Single-pass scanner that tracks brace depth (ignoring braces inside
+    strings) and returns the first complete top-level JSON object.
+    Each character is looked at once, however the text is split into chunks.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._buf: List[str] = []
+        self._pos = 0          # next char of _buf to scan
+        self._start = -1       # index of the '{' opening the current candidate
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.result: Optional[Dict[str, Any]] = None
+
+    def feed(self, text: str) -> Optional[Dict[str, Any]]:
+        """Add a chunk; returns the parsed object once one is complete."""
+        if self.result is not None:
+            return self.result
+        self._buf.extend(text)
+
+        while self._pos < len(self._buf):
+            ch = self._buf[self._pos]
+            self._pos += 1
+
+            if self._start < 0:
+                if ch == "{":
+                    self._start, self._depth = self._pos - 1, 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = "".join(self._buf[self._start:self._pos])
+                    try:
+                        parsed = json.loads(candidate)
+                    except json.JSONDecodeError:
+                        # Brace in prose, not JSON: rescan after it
+                        self._pos, self._start = self._start + 1, -1
+                        continue
+                    if isinstance(parsed, dict):
+                        self.result = parsed
+                        return parsed
+                    self._start = -1
+        return None
+
+
+class CompleteJSONParsed(Exception):
+    """Raised from the stream callback to stop generation; carries the object."""
+
+    def __init__(self, value: Dict[str, Any]):
+        super().__init__("complete JSON object received")
+        self.value = value
+
+
+class _HideStopSignal(logging.Filter):
+    """The callback manager logs every handler exception; the stop signal is not an error."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return CompleteJSONParsed.__name__ not in record.getMessage()
+
+
+logging.getLogger("langchain_core.callbacks.manager").addFilter(_HideStopSignal())
+
+
+class JSONStreamTerminator(BaseCallbackHandler):
+    """
+    Callback feeding streamed LLM tokens to an IncrementalJSONParser.
+
+    The parser is reset at the start of every LLM call, so only the turn that
+    produces the final answer (tool-call turns stream no text) can trigger
+    it. Requires a streaming chat model; without token events nothing
+    happens and the caller falls back to parsing the full output.
+    """
+
+    raise_error = True
+
+    def __init__(self):
+        self.parser = IncrementalJSONParser()
+
+    def on_llm_start(self, *args: Any, **kwargs: Any) -> None:
+        self.parser.reset()
+
+    def on_chat_model_start(self, *args: Any, **kwargs: Any) -> None:
+        self.parser.reset()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if token and self.parser.feed(token) is not None:
+            raise CompleteJSONParsed(self.parser.result)
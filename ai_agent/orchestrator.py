@@ -0,0 +1,158 @@
+"""
+Deterministic insurance-package orchestrator.
+
+The quote flow is fixed: classify once, price the plans the classification
+calls for, then assemble the ASSURMAX / STANDARD JSON documented in the agent
+prompt. Doing it in code removes every LLM round trip except the ones made
+inside classify_product.
+"""
+
+from typing import Dict, Optional, Tuple
+
+from ai_agent.tools.classify_product import classify_product
+from ai_agent.tools.pricing_engine import check_value_cap, price, value_bucket
+
+
+# ASSURMAX+ is not priced by the engine yet
+ASSURMAX_PLANS = ("ASSURMAX",)
+STANDARD_PLAN = "STANDARD"
+
+
+def market_for_currency(currency: str) -> str:
+    return "UAE" if currency == "AED" else "Tunisia"
+
+
+def _product_block(product: Dict, classification_result: Dict, include_description: bool = True) -> Dict:
+    block = {
+        "name": product.get("product_name"),
+        "brand": product.get("brand", "N/A"),
+        "category": classification_result.get("category") or product.get("category", "N/A"),
+        "price": product.get("price"),
+        "currency": product.get("currency", "AED"),
+    }
+    if include_description:
+        block["description"] = product.get("description", "N/A")
+    return block
+
+
+def _not_eligible(product: Dict, classification_result: Dict, reason: str) -> Dict:
+    return {
+        "product": _product_block(product, classification_result, include_description=False),
+        "eligible": False,
+        "reason": reason,
+    }
+
+
+def _price(risk_profile: str, product_value: float, market: str, plan: str) -> Dict:
+    # The engine directly: no tool-call schema validation per plan
+    return price(risk_profile or "", product_value, market, plan)
+
+
+def _assurmax_plans(product_value: float, market: str, risk_profile: str, caps: Dict) -> Tuple[Dict, Optional[str]]:
+    """
+    Price every ASSURMAX tier. One pricing call returns both the
+    12 and 24 month figures, so the four agent calls collapse to one per tier.
+    Tiers the pricing engine does not offer are left out.
+    """
+    plans = {}
+    for plan in ASSURMAX_PLANS:
+        pricing = _price(risk_profile, product_value, market, plan)
+        if pricing.get("error"):
+            continue
+        plans[plan] = {
+            "12_months": {
+                "annual_premium": pricing["12_months"]["annual_premium"],
+                "currency": pricing["12_months"]["currency"],
+                "per_item_cap": caps.get("per_item_cap"),
+                "pack_cap": caps.get("pack_cap"),
+            },
+            "24_months": {
+                "total_premium": pricing["24_months"]["total_premium"],
+                "currency": pricing["24_months"]["currency"],
+                "per_item_cap": caps.get("per_item_cap"),
+                "pack_cap": caps.get("pack_cap"),
+            },
+        }
+    return plans, value_bucket(risk_profile, product_value, market)
+
+
+def build_insurance_package(product: Dict) -> Dict:
+    """
+    Build the insurance package JSON for one product without an agent loop.
+
+    Args:
+        product: dict with product_name, price, currency, brand, category, description
+
+    Returns:
+        NOT ELIGIBLE, ASSURMAX or STANDARD package (same contract as the agent prompt)
+    """
+    product_name = product.get("product_name")
+    product_price = product.get("price")
+    currency = product.get("currency", "AED")
+
+    if not product_name or product_price is None:
+        return {
+            "error": "Missing required fields: product_name and price",
+            "eligible": False,
+        }
+
+    classification_result = classify_product.invoke({
+        "product_name": product_name,
+        "category": product.get("category", "") or "",
+        "brand": product.get("brand", "") or "",
+        "price": product_price,
+        "currency": currency,
+        "description": product.get("description", "") or "",
+    })
+    classification = classification_result.get("classification", {})
+
+    if not classification.get("eligible"):
+        return _not_eligible(product, classification_result, classification.get("reason", "Not eligible"))
+
+    market = classification_result.get("market") or market_for_currency(currency)
+    risk_profile = classification.get("risk_profile")
+    product_value = classification_result.get("price") or product_price
+    caps = classification.get("assurmax_caps")
+
+    # Over the spec's value cap: no plan is priced
+    over_cap = check_value_cap(risk_profile, product_value, market)
+    if over_cap:
+        return {**_not_eligible(product, classification_result, over_cap["reason"]), "over_cap": True}
+
+    package = {
+        "product": _product_block(product, classification_result),
+        "eligible": True,
+        "risk_profile": risk_profile,
+        "market": market,
+    }
+
+    if caps:
+        plans, bucket = _assurmax_plans(product_value, market, risk_profile, caps)
+        if plans:
+            package["document_type"] = "ASSURMAX"
+            package["value_bucket"] = bucket
+            package["plans"] = plans
+            package["coverage_modules"] = classification.get("coverage_modules", [])
+            package["exclusions"] = classification.get("exclusions", [])
+            return package
+
+    pricing = _price(risk_profile, product_value, market, STANDARD_PLAN)
+    if pricing.get("error"):
+        return _not_eligible(product, classification_result, pricing["error"])
+
+    package["document_type"] = "STANDARD"
+    package["value_bucket"] = pricing.get("value_bucket")
+    package["premium"] = {
+        "12_months": {
+            "annual_premium": pricing["12_months"]["annual_premium"],
+            "currency": pricing["12_months"]["currency"],
+        },
+        "24_months": {
+            "total_premium": pricing["24_months"]["total_premium"],
+            "currency": pricing["24_months"]["currency"],
+        },
+    }
+    package["coverage_modules"] = classification.get("coverage_modules", [])
+    package["exclusions"] = classification.get("exclusions", [])
+    return package
+
@@ -0,0 +1,197 @@
+"""
+Embedding backend benchmark: recall@k on our spec queries, encode latency
+and memory, one backend per child process (so RSS is not shared).
+
+Usage:
+    python ai_agent/rag/benchmark_embeddings.py
+    python ai_agent/rag/benchmark_embeddings.py --backends hf-large onnx-int8 --k 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+
+# (query, relevant spec_family, market or None = either market)
+SPEC_QUERIES: List[Tuple[str, str, Optional[str]]] = [
+    # embedding.test_retrieval sanity queries
+    ("iPhone smartphone mobile insurance UAE", "ELECTRONICS", "UAE"),
+    ("lawn mower gardening equipment", "GARDEN_DIY", None),
+    ("exercise bike fitness Tunisia", "SPORT_OUTDOOR", "Tunisia"),
+    ("welding station industrial", "GARDEN_DIY", None),
+    # product-style queries per spec family
+    ("Samsung Galaxy smartphone", "ELECTRONICS", None),
+    ("laptop computer", "ELECTRONICS", None),
+    ("wireless headphones", "ELECTRONICS", None),
+    ("baby stroller", "BABY", None),
+    ("car seat for infants Tunisia", "BABY", "Tunisia"),
+    ("hard shell suitcase travel luggage", "BAGS_LUGGAGE", "UAE"),
+    ("three seater sofa", "FURNITURE", None),
+    ("refrigerator", "HOME_APPLIANCES", None),
+    ("washing machine Tunisia", "HOME_APPLIANCES", "Tunisia"),
+    ("electric scooter", "MICROMOBILITY", "UAE"),
+    ("hearing aid", "OPTICAL", "UAE"),
+    ("prescription glasses frames", "OPTICAL", "UAE"),
+    ("hair dryer", "PERSONAL_CARE", "UAE"),
+    ("massage device wellness Tunisia", "HEALTH_WELLNESS", "Tunisia"),
+    ("bluetooth speaker", "SOUND_MUSIC", "UAE"),
+    ("treadmill", "SPORT_OUTDOOR", None),
+    ("camping tent", "SPORT_OUTDOOR", None),
+    ("Zara jacket", "TEXTILES", "UAE"),
+    ("luxury handbag Gucci", "LUXURY", "UAE"),
+    ("power drill DIY tools", "GARDEN_DIY", None),
+]
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process (Linux /proc, else peak RSS)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS of this process; NaN where the resource module is missing (Windows)."""
+    # Imported here: this module is also imported by the KB build (SPEC_QUERIES,
+    # is_relevant), which must run on Windows too
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def is_relevant(metadata: Dict, spec_family: str, market: Optional[str]) -> bool:
+    return metadata.get("spec_family") == spec_family and (market is None or metadata.get("market") == market)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run_backend(backend: str, k: int) -> Dict:
+    """Build a throwaway local index with `backend` and score every query."""
+    from ai_agent.rag.embedding import load_documents, chunk_documents
+    from ai_agent.rag.embedding_backends import create_embeddings
+    from ai_agent.rag.vector_store import LocalVectorStore
+
+    rss_start = current_rss_mb()
+    t0 = time.perf_counter()
+    embeddings, model_id = create_embeddings(backend, remote=False)
+    embeddings.embed_query("warm-up")
+    load_s = time.perf_counter() - t0
+    rss_model = current_rss_mb()
+
+    chunks = chunk_documents(load_documents())
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        store = LocalVectorStore.build(
+            Path(tmp),
+            texts=[c["text"] for c in chunks],
+            metadatas=[c["metadata"] for c in chunks],
+            embedding=embeddings,
+            model_name=model_id,
+        )
+        index_s = time.perf_counter() - t0
+
+        encode_ms, search_ms, recalls, hits_at_1 = [], [], [], []
+        for query, spec_family, market in SPEC_QUERIES:
+            t0 = time.perf_counter()
+            vector = embeddings.embed_query(query)
+            t1 = time.perf_counter()
+            docs = store.similarity_search_by_vector(vector, k=k)
+            t2 = time.perf_counter()
+            encode_ms.append((t1 - t0) * 1000)
+            search_ms.append((t2 - t1) * 1000)
+
+            relevant_total = sum(is_relevant(m, spec_family, market) for m in store.metadatas)
+            found = sum(is_relevant(d.metadata, spec_family, market) for d in docs)
+            recalls.append(found / min(k, relevant_total) if relevant_total else 0.0)
+            hits_at_1.append(1.0 if docs and is_relevant(docs[0].metadata, spec_family, market) else 0.0)
+
+    return {
+        "backend": backend,
+        "model": model_id,
+        "k": k,
+        "queries": len(SPEC_QUERIES),
+        f"recall@{k}": round(sum(recalls) / len(recalls), 4),
+        "hit@1": round(sum(hits_at_1) / len(hits_at_1), 4),
+        "load_s": round(load_s, 2),
+        "index_s": round(index_s, 2),
+        "chunks": len(chunks),
+        "encode_ms_p50": round(percentile(encode_ms, 50), 2),
+        "encode_ms_p95": round(percentile(encode_ms, 95), 2),
+        "search_ms_p50": round(percentile(search_ms, 50), 4),
+        "rss_model_mb": round(rss_model - rss_start, 1),
+        "rss_peak_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_isolated(backend: str, k: int) -> Dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--single", backend, "--k", str(k)],
+        capture_output=True, text=True, env=os.environ.copy(),
+    )
+    for line in reversed(out.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return {"backend": backend, "error": (out.stderr or out.stdout).strip().splitlines()[-1:] or ["no output"]}
+
+
+def print_table(results: List[Dict], k: int):
+    columns = ["backend", f"recall@{k}", "hit@1", "encode_ms_p50", "encode_ms_p95",
+               "search_ms_p50", "load_s", "index_s", "rss_model_mb", "rss_peak_mb"]
+    print("\n" + "=" * 110)
+    print("EMBEDDING BACKEND BENCHMARK")
+    print("=" * 110)
+    print("  ".join(f"{c:>13}" for c in columns))
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:>13}  ❌ {r['error'][0]}")
+            continue
+        print("  ".join(f"{str(r.get(c)):>13}" for c in columns))
+    print("=" * 110)
+
+
+if __name__ == "__main__":
+    from ai_agent.rag.embedding_backends import EMBEDDING_BACKENDS
+
+    parser = argparse.ArgumentParser(description="Compare embedding backends on the spec corpus")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_backend(args.single, args.k)))
+        sys.exit(0)
+
+    results = []
+    for backend in args.backends:
+        print(f"⏱️  Benchmarking {backend}...")
+        results.append(run_isolated(backend, args.k))
+
+    print_table(results, args.k)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results written to {args.output}")
@@ -0,0 +1,234 @@
+"""
+Retrieval benchmark: recall@k, MRR, latency and prompt size of every
+retrieval configuration, on a labeled query set, fully offline.
+
+Query sets:
+    sanity    embedding.test_retrieval queries
+    product   product-style queries (SPEC_QUERIES) and the test_classify.py products
+    classify  the family-scoped query classify_product issues for every
+              (spec family, market), with its filters and sections
+
+By default the index is rebuilt in a temp dir from documents.jsonl with the
+current chunker (vectors come from the embedding store, so only new chunk
+texts are encoded): chunking changes show up without touching the live KB.
+--store benchmarks an existing local store instead.
+
+Usage:
+    python ai_agent/rag/benchmark_retrieval.py
+    python ai_agent/rag/benchmark_retrieval.py --modes dense hybrid --k 3 5 --output after.json --baseline before.json
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from ai_agent.rag.benchmark_embeddings import SPEC_QUERIES, is_relevant, percentile
+
+
+SANITY_QUERY_COUNT = 4
+
+# test_classify.py products: (query, spec family of its test section, market)
+CLASSIFY_PRODUCTS = [
+    ("iPhone 15 Pro Smartphone Apple", "ELECTRONICS", "UAE"),
+    ("Apple Smart Folio for iPad Apple", "ELECTRONICS", "UAE"),
+    ("Samsung Keyboard Case for Tab Samsung", "ELECTRONICS", "UAE"),
+    ("Samsung QLED TV 65 Television Samsung", "ELECTRONICS", "UAE"),
+    ("Microwave Oven LG Microwave LG", "HOME_APPLIANCES", "UAE"),
+    ("Samsonite Suitcase Large Suitcase Samsonite", "BAGS_LUGGAGE", "UAE"),
+    ("Gaming Backpack with LED Backpack ROG", "BAGS_LUGGAGE", "UAE"),
+    ("Leather Key Case Key case", "BAGS_LUGGAGE", "UAE"),
+    ("IKEA Gaming Chair Chair IKEA", "FURNITURE", "UAE"),
+    ("Glass Coffee Table Glass coffee table", "FURNITURE", "UAE"),
+    ("ZARA Denim Jacket Clothing ZARA", "TEXTILES", "UAE"),
+    ("H&M Denim Jacket Clothing H&M", "TEXTILES", "UAE"),
+    ("Rolex Submariner Rolex", "LUXURY", "UAE"),
+    ("Casio Watch Watch Casio", "LUXURY", "UAE"),
+    ("Baby Stroller Chicco Stroller Chicco", "BABY", "UAE"),
+    ("Baby Bottle Set Bottle Philips", "BABY", "UAE"),
+]
+
+MODES = ("dense", "bm25", "hybrid")
+
+
+def labeled_queries(metadatas: List[Dict]) -> List[Dict]:
+    """Every benchmark query with its relevance label and retrieval arguments."""
+    from ai_agent.tools.classify_product import (
+        CHUNKS_PER_SPEC, CLASSIFY_SECTIONS, MARKETS, SPEC_INTERPRETATION_MODE, _family_query,
+    )
+
+    queries = []
+    for i, (query, spec_family, market) in enumerate(SPEC_QUERIES + CLASSIFY_PRODUCTS):
+        queries.append({
+            "set": "sanity" if i < SANITY_QUERY_COUNT else "product",
+            "query": query, "spec_family": spec_family, "market": market,
+            "filter": {}, "chunks_per_doc": 1,
+        })
+
+    available = {(m.get("spec_family"), m.get("market")) for m in metadatas}
+    for family in SPEC_INTERPRETATION_MODE:
+        for market in MARKETS:
+            if (family, market) not in available:
+                continue                    # no spec: classify_product finds nothing either
+            queries.append({
+                "set": "classify",
+                "query": _family_query(family, market), "spec_family": family, "market": market,
+                "filter": {"market": market, "spec_family": family, "sections": list(CLASSIFY_SECTIONS)},
+                "chunks_per_doc": CHUNKS_PER_SPEC,
+            })
+    return queries
+
+
+# ---------------------------------------------------------------------------
+# INDEX
+# ---------------------------------------------------------------------------
+
+def open_indexes(tmp_dir: Path, store_dir: Optional[Path] = None):
+    """(vector store, BM25 index, query embeddings) over the benchmark corpus."""
+    from ai_agent.rag.bm25 import BM25Index
+    from ai_agent.rag.embedding_backends import create_embeddings
+    from ai_agent.rag.vector_store import LocalVectorStore, load_local_chunks
+
+    # Not the retriever's query cache: latency is measured cold
+    embeddings, model_id = create_embeddings()
+
+    if store_dir is None:
+        from ai_agent.rag.embedding import chunk_documents, load_documents
+        from ai_agent.rag.embedding_store import EmbeddingStore, StoredEmbeddings, get_embedding_store_dir
+
+        chunks = chunk_documents(load_documents())
+        cache = EmbeddingStore(get_embedding_store_dir(), model_id)
+        LocalVectorStore.build(
+            tmp_dir,
+            texts=[c["text"] for c in chunks],
+            metadatas=[c["metadata"] for c in chunks],
+            embedding=StoredEmbeddings(embeddings, cache),
+            model_name=model_id,
+        )
+        cache.flush()
+        store_dir = tmp_dir
+
+    store = LocalVectorStore(store_dir, embedding=embeddings)
+    built_with = store.info.get("model")
+    if built_with and built_with != model_id:
+        raise RuntimeError(f"{store_dir} was built with {built_with}, queries use {model_id}")
+    texts, metadatas = load_local_chunks(store_dir)
+    return store, BM25Index(texts, metadatas), embeddings
+
+
+# ---------------------------------------------------------------------------
+# SCORING
+# ---------------------------------------------------------------------------
+
+def run_config(queries: List[Dict], store, keyword_index, mode: str, k: int) -> List[Dict]:
+    """Score every query set for one (mode, k)."""
+    from ai_agent.rag.retriever import merge_chunks_by_file, search_specs
+    from ai_agent.rag.spec_metadata import build_filter
+
+    rows: Dict[str, Dict[str, List[float]]] = {}
+    for q in queries:
+        chunk_k = k * q["chunks_per_doc"]
+        relevant_total = sum(
+            is_relevant(m, q["spec_family"], q["market"])
+            for m in store.metadatas
+            if not q["filter"].get("sections") or m.get("section") in q["filter"]["sections"]
+        )
+
+        t0 = time.perf_counter()
+        docs = search_specs(
+            q["query"], k=chunk_k, filter=build_filter(**q["filter"]),
+            mode=mode, vectorstore=store, keyword_index=keyword_index,
+        )
+        latency_ms = (time.perf_counter() - t0) * 1000
+
+        ranks = [i for i, d in enumerate(docs, start=1) if is_relevant(d.metadata, q["spec_family"], q["market"])]
+        # What reaches the prompt: merged spec documents (classify) or the raw chunks
+        prompt_docs = merge_chunks_by_file(docs)[:k] if q["chunks_per_doc"] > 1 else docs
+
+        metrics = rows.setdefault(q["set"], {"recall": [], "rr": [], "hit1": [], "ms": [], "chars": []})
+        metrics["recall"].append(len(ranks) / min(chunk_k, relevant_total) if relevant_total else 0.0)
+        metrics["rr"].append(1.0 / ranks[0] if ranks else 0.0)
+        metrics["hit1"].append(1.0 if ranks[:1] == [1] else 0.0)
+        metrics["ms"].append(latency_ms)
+        metrics["chars"].append(sum(len(d.page_content) for d in prompt_docs))
+
+    return [
+        {
+            "set": name,
+            "mode": mode,
+            "k": k,
+            "queries": len(m["recall"]),
+            "recall@k": round(sum(m["recall"]) / len(m["recall"]), 4),
+            "mrr": round(sum(m["rr"]) / len(m["rr"]), 4),
+            "hit@1": round(sum(m["hit1"]) / len(m["hit1"]), 4),
+            "p50_ms": round(percentile(m["ms"], 50), 2),
+            "p95_ms": round(percentile(m["ms"], 95), 2),
+            "prompt_chars_mean": round(sum(m["chars"]) / len(m["chars"])),
+            "prompt_chars_p95": round(percentile(m["chars"], 95)),
+        }
+        for name, m in rows.items()
+    ]
+
+
+def run_benchmark(modes=MODES, ks=(3,), store_dir: Optional[Path] = None, warmup: bool = True) -> List[Dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        store, keyword_index, embeddings = open_indexes(Path(tmp), store_dir)
+        queries = labeled_queries(store.metadatas)
+        print(f"📋 {len(queries)} labeled queries over {len(store)} chunks")
+        if warmup:
+            embeddings.embed_query("warm-up")
+
+        results = []
+        for mode in modes:
+            for k in ks:
+                print(f"⏱️  {mode} @ k={k}...")
+                results.extend(run_config(queries, store, keyword_index, mode, k))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# REPORT
+# ---------------------------------------------------------------------------
+
+COLUMNS = ["recall@k", "mrr", "hit@1", "p50_ms", "p95_ms", "prompt_chars_mean", "prompt_chars_p95"]
+
+
+def print_table(results: List[Dict], baseline: Optional[List[Dict]] = None):
+    """Results table; with a baseline, each cell also shows the change (new - old)."""
+    before = {(r["set"], r["mode"], r["k"]): r for r in baseline or []}
+    print("\n" + "=" * 120)
+    print("RETRIEVAL BENCHMARK" + (" (Δ vs baseline)" if baseline else ""))
+    print("=" * 120)
+    print(f"{'set':<9} {'mode':<7} {'k':>2} {'n':>3}  " + "  ".join(f"{c:>17}" for c in COLUMNS))
+    for r in results:
+        old = before.get((r["set"], r["mode"], r["k"]))
+        cells = []
+        for c in COLUMNS:
+            cell = f"{r[c]}"
+            if old is not None:
+                cell += f" ({r[c] - old[c]:+.4g})"
+            cells.append(f"{cell:>17}")
+        print(f"{r['set']:<9} {r['mode']:<7} {r['k']:>2} {r['queries']:>3}  " + "  ".join(cells))
+    print("=" * 120)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency on the spec corpus")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--k", nargs="+", type=int, default=[3])
+    parser.add_argument("--store", default=None, help="Existing local store dir (default: rebuild from documents.jsonl)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON of a previous run to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.modes, args.k, Path(args.store) if args.store else None)
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else None
+    print_table(results, baseline)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Results written to {args.output}")
@@ -0,0 +1,144 @@
+"""
+BM25 keyword index over the spec chunks, and reciprocal-rank fusion with the
+dense results.
+
+Spec lookups are keyword-heavy (risk profile codes such as
+ELECTRONIC_PRODUCTS_TN, product names in eligibility tables) and dense
+retrieval sometimes ranks the exact-term chunk low. The corpus is a few dozen
+chunks, so a pure-Python inverted index is built in memory on first use.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from ai_agent.rag.vector_store import match_filter
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:_[a-z0-9]+)*")
+
+# Frequent words that carry no spec-specific signal
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "the", "to", "with", "this", "that", "all", "any",
+}
+
+
+_ES_PLURAL_ENDINGS = ("sses", "shes", "ches", "xes", "zes")
+_NOT_PLURAL_ENDINGS = ("ss", "us", "is")
+
+
+def stem(token: str) -> str:
+    """
+    Light plural stripping so table entries ("Smartphones", "Laptops",
+    "Watches", "Accessories") match singular queries: -ies -> -y, -es after
+    s/sh/ch/x/z, else a trailing -s. Short words, numbers and words ending
+    in ss/us/is are kept as they are.
+    """
+    if len(token) <= 3 or any(ch.isdigit() for ch in token) or not token.endswith("s"):
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(_ES_PLURAL_ENDINGS):
+        return token[:-2]
+    if token.endswith(_NOT_PLURAL_ENDINGS):
+        return token
+    return token[:-1]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased, plural-stripped word tokens (same rules for chunks and
+    queries). Underscore codes are kept whole and also split, so
+    "ELECTRONIC_PRODUCTS_TN" matches both the exact code and "electronic".
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if "_" in token:
+            tokens.append(token)
+            tokens.extend(stem(part) for part in token.split("_") if part not in STOPWORDS)
+        elif token not in STOPWORDS:
+            tokens.append(stem(token))
+    return tokens
+
+
+def chunk_key(metadata: Dict[str, Any]) -> Tuple[str, int]:
+    """Identity of a chunk shared by the dense and keyword indexes."""
+    return metadata.get("file_name", ""), int(metadata.get("chunk_index", 0))
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index: term -> [(chunk row, term frequency)]."""
+
+    def __init__(self, texts: List[str], metadatas: List[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        self.texts = texts
+        self.metadatas = metadatas
+        self.k1 = k1
+        self.b = b
+
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((row, tf))
+
+        n = len(texts)
+        self.avg_length = (sum(self.doc_lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(posts) + 0.5) / (len(posts) + 0.5))
+            for term, posts in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def search_with_scores(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for row, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[row] / (self.avg_length or 1))
+                scores[row] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(
+            (row for row in scores if match_filter(self.metadatas[row], filter)),
+            key=lambda row: (-scores[row], row),
+        )[:k]
+        return [
+            (Document(page_content=self.texts[row], metadata=dict(self.metadatas[row])), scores[row])
+            for row in ranked
+        ]
+
+    def search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return [doc for doc, _ in self.search_with_scores(query, k=k, filter=filter)]
+
+
+def reciprocal_rank_fusion(result_lists: Iterable[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """
+    Fuse ranked lists: score(chunk) = sum over lists of 1 / (rrf_k + rank).
+    Chunks are matched by (file_name, chunk_index); the first copy seen is kept.
+    """
+    scores: Dict[Tuple[str, int], float] = defaultdict(float)
+    docs: Dict[Tuple[str, int], Document] = {}
+    order: Dict[Tuple[str, int], int] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = chunk_key(doc.metadata)
+            scores[key] += 1.0 / (rrf_k + rank)
+            if key not in docs:
+                docs[key] = doc
+                order[key] = len(order)
+    ranked = sorted(scores, key=lambda key: (-scores[key], order[key]))
+    return [docs[key] for key in ranked[:k]]
@@ -4,28 +4,46 @@ from pathlib import Path
 import json
 from typing import List, Dict
 import os
-import torch
+import sys
+import time
 
 from dotenv import load_dotenv
 from tqdm import tqdm
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_pinecone import PineconeVectorStore
 
-from pinecone import Pinecone as PineconeClient, ServerlessSpec
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from ai_agent.rag.vector_store import LocalVectorStore, get_backend_name, get_local_store_dir
+from ai_agent.rag.spec_metadata import spec_metadata
+from ai_agent.rag.kb_alias import live_slot, local_slot_dir, standby_slot, switch_alias
+from ai_agent.rag.embedding_store import EmbeddingStore, evict_stale_models, get_embedding_store_dir
+from ai_agent.rag.kb_builder import CollectingUpserter, StreamingIndexBuilder, pinecone_upserter
+from ai_agent.rag.kb_manifest import load_manifest, plan_update, save_manifest, updated_manifest
+from ai_agent.rag.spec_catalog import compile_catalog, get_catalog_path, versioned_catalog_path
+from ai_agent.rag.spec_chunker import MAX_CHUNK_TOKENS, chunk_spec, get_token_counter
+from ai_agent.rag.embedding_backends import EMBEDDING_BACKENDS, backend_dimension, backend_model_id, create_embeddings, get_backend_id
 
 load_dotenv()
 
-INPUT_FILE = Path("C:\\Users\\rouam\\OneDrive\\Bureau\\Automation\\ai_agent\\rag\\knowledge_base\\extracted\\documents.jsonl")
+INPUT_FILE = Path(os.getenv(
+    "KB_DOCUMENTS_FILE",
+    str(Path(__file__).parent / "knowledge_base" / "extracted" / "documents.jsonl"),
+))
 PINECONE_INDEX_NAME = "insurance-product-specs"  
+EMBEDDING_BACKEND = get_backend_id()
+EMBEDDING_MODEL = backend_model_id(EMBEDDING_BACKEND)
+
+
+# bge / ONNX backends share the BERT tokenizer of their base model
+EMBEDDING_TOKENIZER = EMBEDDING_BACKENDS[EMBEDDING_BACKEND]["model"]
 
+# Content-hash manifests of remote indexes (local stores keep theirs inside the store dir)
+MANIFEST_DIR = Path(__file__).parent / "knowledge_base" / "manifests"
 
-CHUNK_SIZE = 3000        
-CHUNK_OVERLAP = 200     
-BATCH_SIZE = 100         
+EMBEDDING_DIMENSION = backend_dimension(EMBEDDING_BACKEND)
 
-EMBEDDING_DIMENSION = 1024  
+# Share of validation queries that must find their spec before a new slot goes live
+KB_MIN_HIT_RATE = float(os.getenv("KB_MIN_HIT_RATE", "0.75"))
 
 def load_documents() -> List[Dict]:
     """Load extracted documents from JSONL file"""
@@ -43,8 +61,8 @@ def load_documents() -> List[Dict]:
 
 
 def chunk_documents(documents: List[Dict]) -> List[Dict]:
-    """Split documents, but try to keep product specs together"""
-    print("\n Chunking documents (keeping specs together)...")
+    """Split each spec along its numbered sections, within the embedding model's token window"""
+    print("\n Chunking documents (one chunk per spec section)...")
 
     # First group pages by document
     docs_by_file = {}
@@ -60,71 +78,61 @@ def chunk_documents(documents: List[Dict]) -> List[Dict]:
     for file_name in docs_by_file:
         docs_by_file[file_name].sort(key=lambda x: x["page"])
     
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        length_function=len,
-        separators=["\n\n\n", "\n\n", "\n", ". ", " ", ""],  
-    )
+    count_tokens = get_token_counter(EMBEDDING_TOKENIZER)
 
     chunked_docs: List[Dict] = []
     
     for file_name, pages in tqdm(docs_by_file.items(), desc="Chunking specs"):
-        # Combine all pages of this document
-        full_text = ""
-        for page in pages:
-            full_text += f"\n\n--- Page {page['page']} ---\n\n{page['text']}"
+        full_text = "\n".join(page["text"] for page in pages)
         
-        # Check if document can fit in one or two chunks
-        if len(full_text) <= CHUNK_SIZE * 1.5:  # Allow 50% overflow
-            # Keep as single chunk
-            chunks = [full_text]
-            is_complete = True
-        else:
-            # Split into multiple chunks
-            chunks = splitter.split_text(full_text)
-            is_complete = False
+        # market / spec_family / risk_profile are properties of the whole
+        # spec, so every chunk of it carries them (used as query filters)
+        spec_meta = spec_metadata(file_name, full_text)
         
-        for i, chunk_text in enumerate(chunks):
-            # Extract page numbers from chunk for metadata
-            page_lines = [line for line in chunk_text.split('\n') if '--- Page' in line]
-            page_numbers = []
-            for line in page_lines:
-                try:
-                    page_num = line.split('--- Page ')[1].split(' ---')[0]
-                    page_numbers.append(float(page_num))
-                except:
-                    pass
-            
-            page_range = f"{min(page_numbers):g}-{max(page_numbers):g}" if page_numbers else "1"
-            
-            
-            category = pages[0]["category"] if pages else "N/A"
-            
+        chunks = chunk_spec(pages, count_tokens, max_tokens=MAX_CHUNK_TOKENS)
+        
+        for i, chunk in enumerate(chunks):
             chunked_docs.append({
-                "text": chunk_text,
+                "text": chunk["text"],
                 "metadata": {
                     "doc_id": pages[0]["doc_id"] if pages else "",
                     "file_name": file_name,
-                    "category": category,
-                    "page_range": page_range,
+                    "category": pages[0]["category"] if pages else "N/A",
+                    "page_range": chunk["page_range"],
                     "chunk_index": i,
                     "total_chunks": len(chunks),
-                    "is_complete": is_complete,  
+                    "is_complete": len(chunks) == 1,  
                     "source": pages[0]["source_path"] if pages else "",
+                    "section": chunk["section"],
+                    "section_title": chunk["section_title"],
+                    "section_number": chunk["section_number"],
+                    "section_part": chunk["section_part"],
+                    "section_parts": chunk["section_parts"],
+                    **spec_meta,
                 },
             })
 
+    token_counts = [count_tokens(c["text"]) for c in chunked_docs]
     print(f"\n Created {len(chunked_docs)} chunks")
-    print(f"   Complete documents (single chunk): {sum(1 for c in chunked_docs if c['metadata']['is_complete'])}")
     print(f"   Average chunks per document: {len(chunked_docs) / len(docs_by_file):.1f}")
+    print(f"   Tokens per chunk: max {max(token_counts, default=0)}, "
+          f"avg {sum(token_counts) / max(len(token_counts), 1):.0f} (limit {MAX_CHUNK_TOKENS})")
+    untagged = sorted({c["metadata"]["file_name"] for c in chunked_docs
+                       if "market" not in c["metadata"] or "spec_family" not in c["metadata"]})
+    if untagged:
+        print(f"   ⚠️  No market/spec_family for: {', '.join(untagged)}")
 
     return chunked_docs
 
 
 
-def initialize_pinecone() -> PineconeClient:
-    """Initialize Pinecone client and ensure index exists"""
+def initialize_pinecone(recreate: bool = False):
+    """
+    Initialize Pinecone client and ensure index exists.
+    recreate=True deletes the whole index first (all slots: downtime until rebuilt).
+    """
+    from pinecone import Pinecone as PineconeClient, ServerlessSpec
+
     print("\n Initializing Pinecone...")
 
     api_key = os.getenv("PINECONE_API_KEY")
@@ -135,8 +143,16 @@ def initialize_pinecone() -> PineconeClient:
 
     existing_indexes = pc.list_indexes().names()
 
-   
     if PINECONE_INDEX_NAME in existing_indexes:
+        if not recreate:
+            dimension = pc.describe_index(PINECONE_INDEX_NAME).dimension
+            if dimension != EMBEDDING_DIMENSION:
+                raise RuntimeError(
+                    f"Index {PINECONE_INDEX_NAME} has dimension {dimension}, "
+                    f"{EMBEDDING_MODEL} needs {EMBEDDING_DIMENSION}: run with --recreate-index"
+                )
+            print(f" ✓ Using existing index: {PINECONE_INDEX_NAME}")
+            return pc
         print(f"  Deleting existing index: {PINECONE_INDEX_NAME}")
         pc.delete_index(PINECONE_INDEX_NAME)
     
@@ -150,54 +166,239 @@ def initialize_pinecone() -> PineconeClient:
             region="us-east-1",
         ),
     )
-    print(" ✓ Index created successfully")
     
-    
-    import time
     print(" Waiting for index to be ready...")
-    time.sleep(5)
+    while not pc.describe_index(PINECONE_INDEX_NAME).status["ready"]:
+        time.sleep(1)
+    print(" ✓ Index created successfully")
 
     return pc
 
 
 
-def embed_and_store_pinecone(chunks: List[Dict]):
-    """Embed text chunks and store them in Pinecone"""
-    print("\n Embedding and storing vectors...")
-    print(" Loading BAAI/bge-large-en-v1.5 model on GPU...")
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+def load_embedding_model():
+    """Document embedding model (EMBEDDING_BACKEND, must match the retriever's)"""
+    print(f" Loading {EMBEDDING_MODEL} model ({EMBEDDING_BACKEND})...")
+    embeddings, _ = create_embeddings(EMBEDDING_BACKEND)
+    return embeddings
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name="BAAI/bge-large-en-v1.5",
-        model_kwargs={
-            'device': device,
-        },
-        encode_kwargs={
-            'normalize_embeddings': True,
-            "batch_size": 32 if device == "cuda" else 8,
-        }
-    )
 
-    print(f" Model loaded on {device.upper()}")
 
-    # Initialize Pinecone
-    pc = initialize_pinecone()
+def pinecone_manifest_path(slot: str) -> Path:
+    return MANIFEST_DIR / f"pinecone_{PINECONE_INDEX_NAME}_{slot}.json"
 
-    texts = [c["text"] for c in chunks]
-    metadatas = [c["metadata"] for c in chunks]
 
-    print(f" Uploading {len(texts)} chunks to Pinecone...")
-    
-    # Use PineconeVectorStore with progress bar
-    vectorstore = PineconeVectorStore.from_texts(
-        texts=texts,
-        embedding=embeddings,
+def local_manifest_path(slot: str) -> Path:
+    return local_slot_dir(get_local_store_dir(), slot) / "manifest.json"
+
+
+def _print_plan(to_upsert, to_delete, total: int):
+    print(f" Changes: {len(to_upsert)} new/changed, {len(to_delete)} removed, "
+          f"{total - len(to_upsert)} unchanged (of {total} chunks)")
+
+
+
+def get_vector_cache() -> EmbeddingStore:
+    """Embedding store of the current model; stores of models idle for 30+ days are evicted."""
+    root = get_embedding_store_dir()
+    evicted = evict_stale_models(root, keep_models=[EMBEDDING_MODEL])
+    if evicted:
+        print(f" Evicted stored embeddings of {', '.join(evicted)}")
+    store = EmbeddingStore(root, EMBEDDING_MODEL)
+    print(f" Embedding store: {len(store)} vectors of {EMBEDDING_MODEL} ({store.path})")
+    return store
+
+
+
+def _print_build_metrics(metrics: Dict):
+    if not metrics.get("chunks"):
+        return
+    print(f" ✓ Stored {metrics['chunks']} chunks ({metrics['encoded']} encoded, {metrics['reused']} reused) "
+          f"in {metrics['elapsed_s']:.1f}s "
+          f"({metrics['chunks_per_s']:.1f} chunks/s; encode busy {metrics['encode_busy_s']:.1f}s, "
+          f"upsert busy {metrics['upsert_busy_s']:.1f}s)")
+
+
+
+def validate_index(vectorstore, k: int = 3, min_hit_rate: float = KB_MIN_HIT_RATE) -> Dict:
+    """
+    Run the spec queries (test_retrieval's and one per spec family) against a
+    freshly built slot before it goes live.
+
+    Returns:
+        {"passed", "queries", "hit_rate", "empty", "failed": [queries without a relevant hit]}
+    """
+    from ai_agent.rag.benchmark_embeddings import SPEC_QUERIES, is_relevant
+
+    hits, empty, failed = 0, 0, []
+    for query, spec_family, market in SPEC_QUERIES:
+        docs = vectorstore.similarity_search(query, k=k)
+        if not docs:
+            empty += 1
+        if any(is_relevant(doc.metadata, spec_family, market) for doc in docs):
+            hits += 1
+        else:
+            failed.append(query)
+
+    hit_rate = hits / len(SPEC_QUERIES)
+    report = {
+        "passed": empty == 0 and hit_rate >= min_hit_rate,
+        "queries": len(SPEC_QUERIES),
+        "hit_rate": round(hit_rate, 3),
+        "min_hit_rate": min_hit_rate,
+        "empty": empty,
+        "failed": failed,
+    }
+    status = "✓" if report["passed"] else "✗"
+    print(f" {status} Validation: hit@{k} {hit_rate:.0%} (min {min_hit_rate:.0%}), {empty} empty result(s)")
+    for query in failed:
+        print(f"     no relevant spec for: {query}")
+    return report
+
+
+
+def _go_live(backend: str, slot: str, vectorstore, kb_version: str, catalog_version: str = None) -> Dict:
+    """
+    Validate the standby slot and publish it with its spec catalog version in
+    the KB registry (the live slot is left alone on failure). Running
+    processes pick the new release up without a restart.
+    """
+    report = validate_index(vectorstore)
+    if not report["passed"]:
+        live = live_slot(backend)
+        raise RuntimeError(
+            f"Validation of {backend} slot {slot!r} failed: alias not switched, "
+            f"retrieval keeps using {live or 'the previous index'!r}"
+        )
+    switch_alias(backend, slot, kb_version, validation=report, catalog_version=catalog_version)
+    print(f" ✓ Alias switched: {backend} -> {slot} (KB version {kb_version}, spec catalog {catalog_version})")
+    return report
+
+
+
+def embed_and_store_pinecone(
+    chunks: List[Dict],
+    rebuild: bool = False,
+    embeddings=None,
+    recreate_index: bool = False,
+    catalog_version: str = None,
+):
+    """
+    Embed new / changed chunks into the standby namespace, delete removed
+    ones, validate it and switch the alias to it.
+    """
+    from langchain_pinecone import PineconeVectorStore
+
+    pc = initialize_pinecone(recreate=recreate_index)
+    index = pc.Index(PINECONE_INDEX_NAME)
+    slot = standby_slot("pinecone")
+    print(f"\n Embedding and storing vectors in namespace {slot!r} (live: {live_slot('pinecone')!r})...")
+
+    manifest_path = pinecone_manifest_path(slot)
+    manifest = load_manifest(manifest_path)
+    if rebuild and not recreate_index and slot in index.describe_index_stats().get("namespaces", {}):
+        print(f" Clearing namespace {slot!r}...")
+        index.delete(delete_all=True, namespace=slot)
+    if rebuild or recreate_index:
+        manifest = {}
+    to_upsert, to_delete, new_hashes = plan_update(manifest, chunks, EMBEDDING_MODEL)
+    _print_plan(to_upsert, to_delete, len(chunks))
+
+    if to_upsert:
+        print(f" Embedding and uploading {len(to_upsert)} chunks to Pinecone...")
+        builder = StreamingIndexBuilder(
+            pinecone_upserter(index, namespace=slot),
+            backend=EMBEDDING_BACKEND,
+            embeddings=embeddings,
+            vector_cache=get_vector_cache(),
+        )
+        _print_build_metrics(builder.run(iter(to_upsert), total=len(to_upsert)))
+    if to_delete:
+        print(f" Deleting {len(to_delete)} removed chunks...")
+        index.delete(ids=to_delete, namespace=slot)
+
+    manifest = updated_manifest(manifest, new_hashes, EMBEDDING_MODEL, f"pinecone:{PINECONE_INDEX_NAME}/{slot}",
+                                upserted=len(to_upsert), deleted=len(to_delete))
+    save_manifest(manifest_path, manifest)
+
+    # Writes are eventually consistent: validate once the namespace holds every chunk
+    deadline = time.time() + 120
+    while True:
+        namespaces = index.describe_index_stats().get("namespaces", {})
+        count = namespaces.get(slot, {}).get("vector_count", 0)
+        if count == len(chunks) or time.time() > deadline:
+            break
+        time.sleep(2)
+    if count != len(chunks):
+        raise RuntimeError(f"Namespace {slot!r} holds {count} vectors, expected {len(chunks)}: alias not switched")
+
+    # Query-side model, loaded after the encoder processes are gone
+    vectorstore = PineconeVectorStore(
         index_name=PINECONE_INDEX_NAME,
-        metadatas=metadatas,
-        batch_size=BATCH_SIZE,
+        embedding=embeddings or load_embedding_model(),
+        namespace=slot,
+        pinecone_api_key=os.getenv("PINECONE_API_KEY"),
     )
+    _go_live("pinecone", slot, vectorstore, manifest["kb_version"], catalog_version)
+    return vectorstore
+
+
 
-    print(" ✓ Embeddings successfully stored in Pinecone")
+def embed_and_store_local(
+    chunks: List[Dict],
+    rebuild: bool = False,
+    embeddings=None,
+    catalog_version: str = None,
+) -> LocalVectorStore:
+    """Embed new / changed chunks into the standby local store, validate it and switch the alias to it"""
+    slot = standby_slot("local")
+    store_dir = local_slot_dir(get_local_store_dir(), slot)
+    print(f"\n Embedding and storing vectors in {store_dir} (live: {live_slot('local')!r})...")
+
+    manifest_path = local_manifest_path(slot)
+    manifest = {} if rebuild else load_manifest(manifest_path)
+    to_upsert, to_delete, new_hashes = plan_update(manifest, chunks, EMBEDDING_MODEL)
+    _print_plan(to_upsert, to_delete, len(chunks))
+
+    collected = CollectingUpserter()
+    if to_upsert:
+        builder = StreamingIndexBuilder(
+            collected,
+            backend=EMBEDDING_BACKEND,
+            embeddings=embeddings,
+            vector_cache=get_vector_cache(),
+        )
+        _print_build_metrics(builder.run(iter(to_upsert), total=len(to_upsert)))
+
+    if rebuild:
+        LocalVectorStore.build(
+            store_dir,
+            texts=collected.texts,
+            metadatas=collected.metadatas,
+            embedding=None,
+            model_name=EMBEDDING_MODEL,
+            ids=collected.ids,
+            vectors=collected.matrix(),
+        )
+    else:
+        LocalVectorStore.update(
+            store_dir,
+            ids=collected.ids,
+            texts=collected.texts,
+            metadatas=collected.metadatas,
+            delete_ids=to_delete,
+            embedding=None,
+            model_name=EMBEDDING_MODEL,
+            vectors=collected.matrix(),
+        )
+
+    manifest = updated_manifest(manifest, new_hashes, EMBEDDING_MODEL, f"local:{store_dir}",
+                                upserted=len(to_upsert), deleted=len(to_delete))
+    save_manifest(manifest_path, manifest)
+
+    vectorstore = LocalVectorStore(store_dir, embedding=embeddings or load_embedding_model())
+    print(f" ✓ {len(vectorstore)} embeddings stored locally (KB version {manifest['kb_version']})")
+    _go_live("local", slot, vectorstore, manifest["kb_version"], catalog_version)
     return vectorstore
 
 
@@ -234,30 +435,60 @@ def test_retrieval(vectorstore):
 
 
 
-def main():
+def main(rebuild: bool = False, recreate_index: bool = False):
     print("=" * 60)
     print(" GARANTY AFFINITY RAG KNOWLEDGE BASE BUILDER")
     print("=" * 60)
-    print(f"Index name: {PINECONE_INDEX_NAME}")
-    print(f"Chunk size: {CHUNK_SIZE} characters")
-    print(f"Strategy: Keep product specs together")
+    backend = get_backend_name()
+    print(f"Backend: {backend}")
+    print(f"Index name: {PINECONE_INDEX_NAME if backend == 'pinecone' else get_local_store_dir()}")
+    print(f"Chunk size: <= {MAX_CHUNK_TOKENS} tokens")
+    print(f"Strategy: One chunk per spec section")
+    print(f"Mode: {'full rebuild' if rebuild else 'incremental'} (standby slot: {standby_slot(backend)})")
     print("=" * 60)
 
     documents = load_documents()
+
+    # Typed facts (markets, buckets, caps...) used by classification and pricing.
+    # The versioned copy goes live with the index; the plain file (fallback
+    # when no alias exists) is only replaced once the release validated.
+    catalog = compile_catalog(documents)
+    catalog.save(versioned_catalog_path(catalog.version))
+    print(f" ✓ Spec catalog {catalog.version}: {len(catalog)} risk profiles -> {versioned_catalog_path(catalog.version)}")
+
     chunks = chunk_documents(documents)
-    vectorstore = embed_and_store_pinecone(chunks)
+    if backend == "local":
+        vectorstore = embed_and_store_local(chunks, rebuild=rebuild, catalog_version=catalog.version)
+    else:
+        vectorstore = embed_and_store_pinecone(
+            chunks, rebuild=rebuild, recreate_index=recreate_index, catalog_version=catalog.version
+        )
+    # Reached only when _go_live validated and published the release
+    catalog.save()
+    print(f" ✓ Spec catalog {catalog.version} is the latest -> {get_catalog_path()}")
     test_retrieval(vectorstore)
 
     print("\n" + "=" * 60)
     print(" RAG KNOWLEDGE BASE READY!")
     print("=" * 60)
-    print(f"Index: {PINECONE_INDEX_NAME}")
+    print(f"Index: {PINECONE_INDEX_NAME if backend == 'pinecone' else get_local_store_dir()} "
+          f"(live slot: {live_slot(backend)})")
     print(f"Total chunks: {len(chunks)}")
     print(f"Complete specs: {sum(1 for c in chunks if c['metadata']['is_complete'])}")
-    print(f"Model: BAAI/bge-large-en-v1.5")
+    print(f"Model: {EMBEDDING_MODEL}")
     print("=" * 60)
     
    
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build / update the spec knowledge base index")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Clear the standby slot and re-upload every chunk (default: incremental)")
+    parser.add_argument("--recreate-index", action="store_true",
+                        help="Delete and recreate the whole Pinecone index (e.g. new embedding dimension; "
+                             "retrieval is down until the build finishes)")
+    args = parser.parse_args()
+
+    main(rebuild=args.rebuild, recreate_index=args.recreate_index)
\ No newline at end of file
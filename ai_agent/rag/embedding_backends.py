@@ -0,0 +1,186 @@
+"""
+Embedding backends.
+
+EMBEDDING_BACKEND picks the model used both to build the index
+(embedding.py) and to encode queries (retriever.py):
+
+    hf-large   BAAI/bge-large-en-v1.5 via sentence-transformers (default, 1024-d)
+    hf-base    BAAI/bge-base-en-v1.5  (768-d)
+    hf-small   BAAI/bge-small-en-v1.5 (384-d)
+    onnx-int8  bge-large exported to ONNX and dynamically quantized to int8,
+               run with ONNX Runtime on CPU (1024-d, needs optimum[onnxruntime])
+
+Vectors of different backends are not comparable: rebuild the index after
+switching (the backend id is stored with the local store and in the query
+cache key).
+
+Run `python ai_agent/rag/benchmark_embeddings.py` to compare recall, latency
+and memory before switching.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+
+DEFAULT_BACKEND = "hf-large"
+
+EMBEDDING_BACKENDS: Dict[str, Dict] = {
+    "hf-large": {"kind": "hf", "model": "BAAI/bge-large-en-v1.5", "dimension": 1024},
+    "hf-base": {"kind": "hf", "model": "BAAI/bge-base-en-v1.5", "dimension": 768},
+    "hf-small": {"kind": "hf", "model": "BAAI/bge-small-en-v1.5", "dimension": 384},
+    "onnx-int8": {"kind": "onnx", "model": "BAAI/bge-large-en-v1.5", "dimension": 1024},
+}
+
+ONNX_CACHE_DIR = Path(os.getenv(
+    "ONNX_EMBEDDING_DIR",
+    str(Path(__file__).parent / "knowledge_base" / "onnx"),
+))
+
+
+def get_backend_id() -> str:
+    backend = os.getenv("EMBEDDING_BACKEND", DEFAULT_BACKEND).strip().lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise RuntimeError(
+            f"Unknown EMBEDDING_BACKEND: {backend!r} (options: {', '.join(EMBEDDING_BACKENDS)})"
+        )
+    return backend
+
+
+def backend_model_id(backend: str) -> str:
+    """Identifier of the vectors a backend produces (index / cache compatibility key)."""
+    config = EMBEDDING_BACKENDS[backend]
+    return config["model"] if config["kind"] == "hf" else f"{config['model']}#{backend}"
+
+
+def backend_dimension(backend: str) -> int:
+    return EMBEDDING_BACKENDS[backend]["dimension"]
+
+
+def _get_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def create_embeddings(backend: str = None, batch_size: int = None, remote: bool = True) -> Tuple[Embeddings, str]:
+    """
+    Build the embedding model for a backend (EMBEDDING_BACKEND when omitted).
+    `batch_size` overrides the encoder batch size (default 32 on GPU, 8 on CPU).
+
+    With EMBEDDING_SERVER_URL set (and `remote`), a client of the shared
+    embedding server is returned instead, if it serves the same model; the
+    model is only loaded in-process when the server is unavailable.
+
+    Returns:
+        (embeddings, model_id) - model_id as in backend_model_id()
+    """
+    backend = backend or get_backend_id()
+    config = EMBEDDING_BACKENDS[backend]
+
+    if remote:
+        from ai_agent.rag.embedding_server import RemoteEmbeddings, get_server_url, server_health
+
+        url = get_server_url()
+        health = server_health(url) if url else None
+        if health and health.get("model") == backend_model_id(backend):
+            print(f"🔌 Embedding server: {url} ({health['model']})")
+            fallback = lambda: create_embeddings(backend, batch_size=batch_size, remote=False)[0]
+            return RemoteEmbeddings(url, backend_model_id(backend), fallback), backend_model_id(backend)
+        if url:
+            served = health.get("model") if health else "no answer"
+            print(f"⚠️  Embedding server {url} unusable ({served}): loading {config['model']} in-process")
+
+    if config["kind"] == "onnx":
+        return OnnxEmbeddings(config["model"], batch_size=batch_size or 16), backend_model_id(backend)
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    device = _get_device()
+    print(f"🖥️ Device: {device} ({config['model']})")
+    embeddings = HuggingFaceEmbeddings(
+        model_name=config["model"],
+        model_kwargs={"device": device},
+        encode_kwargs={
+            "normalize_embeddings": True,
+            "batch_size": batch_size or (32 if device == "cuda" else 8)
+        }
+    )
+    return embeddings, backend_model_id(backend)
+
+
+# ---------------------------------------------------------------------------
+# ONNX INT8
+# ---------------------------------------------------------------------------
+
+def export_onnx_int8(model_name: str, output_dir: Path) -> Path:
+    """
+    Export `model_name` to ONNX and quantize it to int8 (dynamic, per-tensor).
+    Only needed once per node; the result is reused from output_dir.
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    output_dir = Path(output_dir)
+    fp32_dir = output_dir / "fp32"
+    print(f"📦 Exporting {model_name} to ONNX ({output_dir})...")
+
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    model.save_pretrained(fp32_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+
+    quantizer = ORTQuantizer.from_pretrained(fp32_dir)
+    qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=qconfig)
+    print("   ✓ int8 model written")
+    return output_dir
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    bge encoder on ONNX Runtime (int8): CLS pooling + L2 normalisation,
+    i.e. the same vectors sentence-transformers produces for bge, up to
+    quantization error.
+    """
+
+    def __init__(self, model_name: str, model_dir: Path = None, batch_size: int = 16, max_length: int = 512):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        model_dir = Path(model_dir) if model_dir else ONNX_CACHE_DIR / model_name.replace("/", "__")
+
+        if not (model_dir / "model_quantized.onnx").exists():
+            export_onnx_int8(model_name, model_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name="model_quantized.onnx")
+        print(f"🖥️ ONNX Runtime int8: {model_dir}")
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = self.tokenizer(
+                texts[start:start + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            hidden = self.model(**batch).last_hidden_state
+            hidden = np.asarray(hidden)[:, 0]
+            hidden = hidden / np.linalg.norm(hidden, axis=1, keepdims=True)
+            vectors.extend(hidden.astype(np.float32).tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
@@ -0,0 +1,172 @@
+"""
+LRU cache for query embeddings.
+
+Retrieval queries repeat constantly (the family-scoped classify query is the
+same for every product of a family), and each bge-large encode costs
+hundreds of milliseconds on CPU. CachedQueryEmbeddings wraps an embedding
+model and memoizes embed_query; document embedding is passed through.
+"""
+
+import atexit
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_query(text: str) -> str:
+    """Cache key text: surrounding / repeated whitespace does not change the query."""
+    return " ".join(text.split())
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Bounded, thread-safe LRU of query vectors keyed by (model name, normalized text).
+
+    Args:
+        embeddings: wrapped embedding model
+        model_name: part of the cache key, so a model change never reuses vectors
+        max_size: max cached queries (least recently used are evicted)
+        persist_path: optional .npz file loaded at start and written by save()
+            (and at interpreter exit)
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        max_size: int = 1024,
+        persist_path: Optional[Path] = None,
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_size = max_size
+        self.persist_path = Path(persist_path) if persist_path else None
+
+        self._cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.persist_path:
+            self.load()
+            atexit.register(self.save)
+
+    # --------------- Embeddings interface ---------------
+
+    def embed_query(self, text: str) -> List[float]:
+        key = (self.model_name, normalize_query(text))
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return list(vector)
+            self.misses += 1
+
+        # Encode outside the lock: a slow miss must not block cache hits
+        vector = self.embeddings.embed_query(key[1])
+        self._put(key, vector)
+        return list(vector)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Batch embed_query: cached queries are served from the LRU, the
+        remaining (distinct) ones are encoded in one batched forward pass.
+        """
+        keys = [(self.model_name, normalize_query(text)) for text in texts]
+        vectors: Dict[Tuple[str, str], List[float]] = {}
+        with self._lock:
+            for key in keys:
+                if key in vectors:
+                    continue
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    vectors[key] = vector
+            self.hits += sum(1 for key in keys if key in vectors)
+            self.misses += sum(1 for key in keys if key not in vectors)
+
+        missing = list(dict.fromkeys(key for key in keys if key not in vectors))
+        if missing:
+            # bge encodes queries and documents identically (no query instruction)
+            encoded = self.embeddings.embed_documents([text for _, text in missing])
+            for key, vector in zip(missing, encoded):
+                self._put(key, vector)
+                vectors[key] = vector
+
+        return [list(vectors[key]) for key in keys]
+
+    # --------------- cache management ---------------
+
+    def _put(self, key: Tuple[str, str], vector: List[float]):
+        with self._lock:
+            self._cache[key] = list(vector)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def save(self):
+        """Write the cache (this model's entries, LRU order) to persist_path."""
+        if not self.persist_path:
+            return
+        with self._lock:
+            items = [(text, vector) for (model, text), vector in self._cache.items() if model == self.model_name]
+        if not items:
+            return
+
+        self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.persist_path.with_name(self.persist_path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            np.savez(
+                f,
+                model=np.array(self.model_name),
+                queries=np.array(json.dumps([text for text, _ in items])),
+                vectors=np.asarray([vector for _, vector in items], dtype=np.float32),
+            )
+        os.replace(tmp_path, self.persist_path)
+
+    def load(self):
+        """Load entries saved by save() for the same model (others are ignored)."""
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            with np.load(self.persist_path) as data:
+                if str(data["model"]) != self.model_name:
+                    print(f"⚠️  Query embedding cache {self.persist_path} is for another model, ignoring")
+                    return
+                queries = json.loads(str(data["queries"]))
+                vectors = data["vectors"]
+        except Exception as e:
+            print(f"⚠️  Could not load query embedding cache {self.persist_path}: {e}")
+            return
+
+        for text, vector in zip(queries, vectors):
+            self._put((self.model_name, text), vector.tolist())
+        print(f"📂 Loaded {len(queries)} cached query embeddings")
@@ -0,0 +1,296 @@
+"""
+Shared embedding-model server.
+
+Every process that embeds (backend, CLIs, Streamlit, KB builds) otherwise
+loads its own copy of the model. This localhost HTTP service loads it once
+per node and micro-batches the texts of concurrent clients into shared
+forward passes:
+
+    python ai_agent/rag/embedding_server.py --port 8765
+
+Clients opt in with EMBEDDING_SERVER_URL=http://127.0.0.1:8765:
+create_embeddings() then returns RemoteEmbeddings instead of loading the
+model, and falls back to the in-process model when the server is down or
+serves another model.
+
+API:
+    POST /embed   {"texts": [...]} -> {"model", "dimension", "vectors"}
+                  vectors: base64 of little-endian float32 rows
+    GET  /health  {"model", "dimension", "stats"}
+"""
+
+import base64
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Texts per forward pass, and how long the first request of a batch waits for others
+MAX_BATCH = int(os.getenv("EMBEDDING_SERVER_MAX_BATCH", "64"))
+MAX_WAIT_MS = float(os.getenv("EMBEDDING_SERVER_MAX_WAIT_MS", "5"))
+
+CLIENT_TIMEOUT_S = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "60"))
+# After a failed call, clients use the in-process model this long before retrying the server
+CLIENT_RETRY_S = float(os.getenv("EMBEDDING_SERVER_RETRY_S", "30"))
+
+
+def get_server_url() -> Optional[str]:
+    url = os.getenv("EMBEDDING_SERVER_URL", "").strip()
+    return url.rstrip("/") or None
+
+
+def encode_vectors(vectors: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(vectors, dtype="<f4").tobytes()).decode("ascii")
+
+
+def decode_vectors(data: str, dimension: int) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype="<f4").reshape(-1, dimension)
+
+
+# ---------------------------------------------------------------------------
+# MICRO-BATCHING
+# ---------------------------------------------------------------------------
+
+class MicroBatcher:
+    """
+    Single encoder thread: requests queued within MAX_WAIT_MS of each other
+    (up to MAX_BATCH texts) are encoded in one embed_documents call.
+    bge encodes queries and documents identically, so both share batches.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.encode_s = 0.0
+        self._thread = threading.Thread(target=self._run, daemon=True, name="embedding-batcher")
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait_s
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._encode(batch)
+
+    def _encode(self, batch: List[Tuple[List[str], Future]]):
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        t0 = time.perf_counter()
+        try:
+            vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32) if texts else None
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.requests += len(batch)
+            self.texts += len(texts)
+            self.batches += 1
+            self.encode_s += time.perf_counter() - t0
+
+        start = 0
+        for request_texts, future in batch:
+            future.set_result(vectors[start:start + len(request_texts)] if texts else np.zeros((0, 0), np.float32))
+            start += len(request_texts)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "texts_per_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "encode_s": round(self.encode_s, 3),
+                "queued": self._queue.qsize(),
+            }
+
+
+# ---------------------------------------------------------------------------
+# SERVER
+# ---------------------------------------------------------------------------
+
+def make_handler(batcher: MicroBatcher, model_id: str, dimension: int):
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, payload: Dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._reply(404, {"error": f"unknown path {self.path}"})
+            self._reply(200, {"model": model_id, "dimension": dimension, "stats": batcher.stats()})
+
+        def do_POST(self):
+            if self.path != "/embed":
+                return self._reply(404, {"error": f"unknown path {self.path}"})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                texts = request["texts"]
+                if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                    raise ValueError("'texts' must be a list of strings")
+            except (KeyError, ValueError) as e:
+                return self._reply(400, {"error": f"bad request: {e}"})
+            try:
+                vectors = batcher.submit(texts).result()
+            except Exception as e:
+                return self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+            self._reply(200, {"model": model_id, "dimension": dimension, "vectors": encode_vectors(vectors)})
+
+        def log_message(self, format, *args):
+            pass                                    # one line per request is too noisy
+
+    return EmbeddingHandler
+
+
+class EmbeddingHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Every worker of every process may connect at once (default backlog: 5)
+    request_queue_size = 128
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, backend: str = None):
+    """Load the model once and serve it until interrupted."""
+    from ai_agent.rag.embedding_backends import create_embeddings, get_backend_id
+
+    backend = backend or get_backend_id()
+    t0 = time.perf_counter()
+    embeddings, model_id = create_embeddings(backend, remote=False)
+    dimension = len(embeddings.embed_query("warm-up"))
+    print(f"🧠 {model_id} loaded in {time.perf_counter() - t0:.1f}s ({dimension}-d)")
+
+    batcher = MicroBatcher(embeddings)
+    server = EmbeddingHTTPServer((host, port), make_handler(batcher, model_id, dimension))
+    print(f"🚀 Embedding server on http://{host}:{port} "
+          f"(batches of <= {batcher.max_batch} texts, {MAX_WAIT_MS:g} ms window)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"🛑 Embedding server stopped: {batcher.stats()}")
+
+
+# ---------------------------------------------------------------------------
+# CLIENT
+# ---------------------------------------------------------------------------
+
+def server_health(url: str, timeout: float = 2.0) -> Optional[Dict]:
+    """Health of the server at `url`, None if it does not answer."""
+    try:
+        with urllib.request.urlopen(f"{url}/health", timeout=timeout) as response:
+            return json.loads(response.read())
+    except (OSError, ValueError):
+        return None
+
+
+class RemoteEmbeddings(Embeddings):
+    """
+    Embeddings served by the embedding server. When a call fails, it is
+    answered by `fallback()` (the in-process model, loaded once on first
+    need) and the server is retried after CLIENT_RETRY_S.
+
+    Args:
+        url: server base URL
+        model_id: model the vectors must come from (checked on every reply)
+        fallback: factory of the in-process embeddings
+    """
+
+    def __init__(self, url: str, model_id: str, fallback: Callable[[], Embeddings], timeout: float = CLIENT_TIMEOUT_S):
+        self.url = url
+        self.model_id = model_id
+        self.timeout = timeout
+        self._fallback_factory = fallback
+        self._fallback: Optional[Embeddings] = None
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+
+    def _local(self) -> Embeddings:
+        if self._fallback is None:
+            with self._lock:
+                if self._fallback is None:
+                    self._fallback = self._fallback_factory()
+        return self._fallback
+
+    def _post(self, texts: List[str]) -> List[List[float]]:
+        request = urllib.request.Request(
+            f"{self.url}/embed",
+            data=json.dumps({"texts": texts}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            reply = json.loads(response.read())
+        if reply["model"] != self.model_id:
+            raise RuntimeError(f"embedding server now serves {reply['model']}, expected {self.model_id}")
+        return decode_vectors(reply["vectors"], reply["dimension"]).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        if not texts:
+            return []
+        if time.monotonic() >= self._retry_at:
+            try:
+                return self._post(texts)
+            except (OSError, RuntimeError, ValueError) as e:
+                if time.monotonic() >= self._retry_at:
+                    print(f"⚠️  Embedding server {self.url} failed ({e}): "
+                          f"in-process model for the next {CLIENT_RETRY_S:g}s")
+                self._retry_at = time.monotonic() + CLIENT_RETRY_S
+        return self._local().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the embedding model to local processes")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--backend", default=None, help="EMBEDDING_BACKEND to serve (default: env)")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.backend)
@@ -0,0 +1,227 @@
+"""
+Content-addressed on-disk store of document embeddings.
+
+Vectors are keyed by (model, sha1 of the text), so any text embedded once -
+by a rebuild, a local vector store or a cache - is never encoded again by
+the same model. One directory per model:
+
+    vectors.f16   raw float16 rows (dim * 2 bytes each), append-only,
+                  memory-mapped read-only (shared page cache across processes)
+    keys.npy      sha1 digests (uint8, 20 per row) in row order: the offset index
+                  (row i starts at byte i * dim * 2 of vectors.f16)
+    meta.json     model id, dimension, row count, last use
+
+Single writer (the KB builder); any number of readers. keys.npy is replaced
+atomically after the rows are written, so readers only ever see complete rows.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+DEFAULT_STORE_DIR = Path(__file__).parent / "knowledge_base" / "embedding_store"
+
+VECTORS_FILE = "vectors.f16"
+KEYS_FILE = "keys.npy"
+META_FILE = "meta.json"
+KEY_BYTES = 20
+
+
+def get_embedding_store_dir() -> Path:
+    return Path(os.getenv("EMBEDDING_STORE_DIR", str(DEFAULT_STORE_DIR)))
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def _model_dir_name(model_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "__", model_id)
+
+
+class EmbeddingStore:
+    """
+    Vectors of one model.
+
+    Args:
+        root: store root directory (one sub-directory per model)
+        model_id: embedding model id (backend_model_id)
+    """
+
+    def __init__(self, root: Path, model_id: str):
+        self.model_id = model_id
+        self.path = Path(root) / _model_dir_name(model_id)
+        self.dimension: Optional[int] = None
+        self._keys: List[bytes] = []
+        self._rows: Dict[bytes, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._flushed = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _load(self):
+        meta_path = self.path / META_FILE
+        if not meta_path.exists():
+            return
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("model") != self.model_id:
+            raise RuntimeError(f"Embedding store {self.path} holds {meta.get('model')}, not {self.model_id}")
+        self.dimension = meta["dimension"]
+
+        # uint8 rather than "S20": numpy strips trailing NUL bytes from S-strings
+        keys = np.load(self.path / KEYS_FILE) if (self.path / KEYS_FILE).exists() else np.zeros((0, KEY_BYTES), np.uint8)
+        self._keys = [row.tobytes() for row in keys]
+        self._rows = {k: i for i, k in enumerate(self._keys)}
+        self._flushed = len(self._keys)
+        self._map()
+
+    def _map(self):
+        """(Re)map the rows covered by the index; rows beyond it are ignored."""
+        if not self._keys:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(
+            self.path / VECTORS_FILE, dtype=np.float16, mode="r", shape=(len(self._keys), self.dimension)
+        )
+
+    # --------------- read ---------------
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        vectors = self.get_many([text])
+        return vectors[0]
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """float32 vector per text, None where the text was never stored."""
+        with self._lock:
+            rows = [self._rows.get(text_key(text)) for text in texts]
+            vectors = self._vectors
+        return [vectors[row].astype(np.float32) if row is not None else None for row in rows]
+
+    # --------------- write ---------------
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray):
+        """Append vectors of texts not stored yet (visible to other processes after flush())."""
+        vectors = np.asarray(vectors, dtype=np.float16)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected {self.dimension}-d vectors for {self.model_id}, got {vectors.shape[1]}")
+
+            new_keys, new_rows = [], []
+            for i, text in enumerate(texts):
+                key = text_key(text)
+                if key not in self._rows:
+                    self._rows[key] = len(self._keys) + len(new_keys)
+                    new_keys.append(key)
+                    new_rows.append(i)
+            if not new_keys:
+                return
+
+            self.path.mkdir(parents=True, exist_ok=True)
+            vectors_path = self.path / VECTORS_FILE
+            row_bytes = self.dimension * 2
+            # Write after the last indexed row: drops rows of an interrupted, unflushed run
+            with vectors_path.open("r+b" if vectors_path.exists() else "wb") as f:
+                f.seek(len(self._keys) * row_bytes)
+                f.write(np.ascontiguousarray(vectors[new_rows]).tobytes())
+                f.truncate()
+            self._keys.extend(new_keys)
+            self._map()
+
+    def flush(self):
+        """Publish the offset index and metadata (atomic replace)."""
+        with self._lock:
+            if self.dimension is None or self._flushed == len(self._keys):
+                self._touch()
+                return
+            tmp = self.path / (KEYS_FILE + ".tmp")
+            with tmp.open("wb") as f:
+                np.save(f, np.frombuffer(b"".join(self._keys), dtype=np.uint8).reshape(-1, KEY_BYTES))
+            os.replace(tmp, self.path / KEYS_FILE)
+            self._flushed = len(self._keys)
+            self._touch()
+
+    def _touch(self):
+        if self.dimension is None:
+            return
+        tmp = self.path / (META_FILE + ".tmp")
+        tmp.write_text(json.dumps({
+            "model": self.model_id,
+            "dimension": self.dimension,
+            "dtype": "float16",
+            "count": self._flushed,
+            "last_used": time.time(),
+        }, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path / META_FILE)
+
+
+# ---------------------------------------------------------------------------
+# EVICTION
+# ---------------------------------------------------------------------------
+
+def evict_stale_models(root: Path, keep_models: Sequence[str], max_idle_days: float = 30) -> List[str]:
+    """
+    Delete the stores of models not in `keep_models` and unused for
+    `max_idle_days`. Returns the evicted model ids.
+    """
+    root = Path(root)
+    keep = {_model_dir_name(model) for model in keep_models}
+    cutoff = time.time() - max_idle_days * 86400
+    evicted = []
+    if not root.exists():
+        return evicted
+
+    for model_dir in root.iterdir():
+        if not model_dir.is_dir() or model_dir.name in keep:
+            continue
+        try:
+            meta = json.loads((model_dir / META_FILE).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            meta = {}
+        if meta.get("last_used", 0) < cutoff:
+            shutil.rmtree(model_dir, ignore_errors=True)
+            evicted.append(meta.get("model", model_dir.name))
+    return evicted
+
+
+# ---------------------------------------------------------------------------
+# EMBEDDINGS WRAPPER
+# ---------------------------------------------------------------------------
+
+class StoredEmbeddings(Embeddings):
+    """
+    Embeddings that read vectors from an EmbeddingStore and only encode
+    (and store) the texts it does not have yet.
+    """
+
+    def __init__(self, embeddings: Embeddings, store: EmbeddingStore):
+        self.embeddings = embeddings
+        self.store = store
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.store.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = np.asarray(self.embeddings.embed_documents([texts[i] for i in missing]), dtype=np.float32)
+            self.store.put_many([texts[i] for i in missing], encoded)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+        return [vector.tolist() for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.store.get(text)
+        return vector.tolist() if vector is not None else self.embeddings.embed_query(text)
@@ -0,0 +1,110 @@
+"""
+Blue-green slots of the knowledge-base index, and the KB version registry.
+
+The index exists twice per backend - Pinecone namespaces or local store
+sub-directories named "blue" and "green". embedding.py always writes to the
+standby slot, validates it, then points the alias at it; the retriever
+follows the alias, so classification keeps querying a complete index while
+specs are rebuilt and switches over without a restart.
+
+The alias file (KB_ALIAS_FILE, default knowledge_base/kb_alias.json) is also
+the registry running processes watch to hot-swap the knowledge base:
+
+    {"pinecone": {"slot": "green", "kb_version": "...", "catalog_version": "...",
+                  "switched_at": "...", "previous_slot": "blue", "validation": {...}},
+     "local": {...}}
+
+release_id() of an entry is the shared version id caches key on.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+SLOTS = ("blue", "green")
+
+DEFAULT_ALIAS_FILE = Path(__file__).parent / "knowledge_base" / "kb_alias.json"
+
+
+def get_alias_path() -> Path:
+    return Path(os.getenv("KB_ALIAS_FILE", str(DEFAULT_ALIAS_FILE)))
+
+
+def read_alias(path: Optional[Path] = None) -> Dict:
+    path = Path(path) if path else get_alias_path()
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        print(f"⚠️  Unreadable KB alias file {path}: {e}")
+        return {}
+
+
+def alias_signature(path: Optional[Path] = None) -> Optional[Tuple[int, int]]:
+    """Cheap change check (mtime, size) without parsing the file."""
+    try:
+        stat = (Path(path) if path else get_alias_path()).stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def live_slot(backend: str, path: Optional[Path] = None) -> Optional[str]:
+    """Slot the retriever reads, None before the first blue-green build."""
+    return read_alias(path).get(backend, {}).get("slot")
+
+
+def release_id(entry: Dict) -> Optional[str]:
+    """
+    Version id of a published release: slot, index and spec catalog versions
+    ("green:3f2a9c01d4e5:8937bd807de3"). None before the first release.
+    """
+    if not entry.get("slot"):
+        return None
+    return ":".join([entry["slot"], entry.get("kb_version") or "-", entry.get("catalog_version") or "-"])
+
+
+def standby_slot(backend: str, path: Optional[Path] = None) -> str:
+    """Slot the next build writes to: never the live one."""
+    live = live_slot(backend, path)
+    return SLOTS[1] if live == SLOTS[0] else SLOTS[0]
+
+
+def local_slot_dir(store_dir: Path, slot: Optional[str]) -> Path:
+    """Directory of a local slot (the store dir itself for stores built before slots)."""
+    return Path(store_dir) / slot if slot else Path(store_dir)
+
+
+def switch_alias(
+    backend: str,
+    slot: str,
+    kb_version: str,
+    validation: Optional[Dict] = None,
+    path: Optional[Path] = None,
+    catalog_version: Optional[str] = None,
+) -> Dict:
+    """Point `backend` at `slot` (atomic replace: readers see the old or the new alias)."""
+    if slot not in SLOTS:
+        raise ValueError(f"Unknown slot {slot!r} (use {', '.join(SLOTS)})")
+    path = Path(path) if path else get_alias_path()
+    alias = read_alias(path)
+    previous = alias.get(backend, {})
+    alias[backend] = {
+        "slot": slot,
+        "kb_version": kb_version,
+        "catalog_version": catalog_version,
+        "switched_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "previous_slot": previous.get("slot"),
+        "previous_kb_version": previous.get("kb_version"),
+        "validation": validation or {},
+    }
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(alias, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return alias[backend]
@@ -0,0 +1,375 @@
+"""
+Streaming knowledge-base builder.
+
+Embedding and upserting used to run one after the other: every chunk was
+embedded first (single process, batch size 8 on CPU), then everything was
+uploaded. StreamingIndexBuilder pipelines the two stages:
+
+    chunks (any iterable) -> embedding store lookup (embedding_store.py)
+                          -> encode the misses on a process pool
+                          -> bounded queue -> N upsert threads
+
+The queue is bounded, so a slow writer back-pressures the encoder instead of
+piling vectors up in memory, and a rebuild takes roughly as long as the
+slower stage rather than the sum of both.
+
+Tuning (env):
+    KB_ENCODE_WORKERS     encoder processes (default: half the CPUs, max 4;
+                          1 = encode in this process, always the case on GPU)
+    KB_ENCODE_BATCH_SIZE  texts per encode batch (default 32)
+    KB_UPSERT_WORKERS     concurrent upsert threads (default 4)
+    KB_UPSERT_QUEUE_SIZE  encoded batches waiting for upsert (default 8)
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+# (ids, texts, metadatas, vectors) -> None
+UpsertFn = Callable[[List[str], List[str], List[Dict[str, Any]], np.ndarray], None]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def _cuda_available() -> bool:
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+def default_encode_workers() -> int:
+    from ai_agent.rag.embedding_server import get_server_url
+
+    # One GPU, or a shared embedding server doing the encoding: no encoder processes
+    if get_server_url() or _cuda_available():
+        return 1
+    return _env_int("KB_ENCODE_WORKERS", max(1, min(4, (os.cpu_count() or 2) // 2)))
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ---------------------------------------------------------------------------
+# ENCODER PROCESSES
+# ---------------------------------------------------------------------------
+
+_encoder = None
+
+
+def _init_encoder(backend: str, batch_size: int, threads: int):
+    """Pool initializer: one model per process, CPU threads split between processes."""
+    global _encoder
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    from ai_agent.rag.embedding_backends import create_embeddings
+    _encoder, _ = create_embeddings(backend, batch_size=batch_size)
+
+
+def _encode_batch(texts: List[str]) -> Tuple[np.ndarray, float]:
+    t0 = time.perf_counter()
+    vectors = np.asarray(_encoder.embed_documents(texts), dtype=np.float32)
+    return vectors, time.perf_counter() - t0
+
+
+# ---------------------------------------------------------------------------
+# METRICS
+# ---------------------------------------------------------------------------
+
+class BuildMetrics:
+    """Thread-safe counters and timings of one build, printed as progress."""
+
+    def __init__(self, total: Optional[int] = None, report_every: float = 2.0):
+        self.total = total
+        self.report_every = report_every
+        self.started = time.perf_counter()
+        self.encoded = 0
+        self.cached = 0
+        self.upserted = 0
+        self.batches = 0
+        self.encode_seconds = 0.0
+        self.upsert_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def add_encoded(self, count: int, seconds: float):
+        with self._lock:
+            self.encoded += count
+            self.batches += 1
+            self.encode_seconds += seconds
+
+    def add_cached(self, count: int):
+        with self._lock:
+            self.cached += count
+
+    def add_upserted(self, count: int, seconds: float):
+        with self._lock:
+            self.upserted += count
+            self.upsert_seconds += seconds
+        self.report()
+
+    def add_queue_wait(self, seconds: float):
+        with self._lock:
+            self.queue_wait_seconds += seconds
+
+    def report(self, force: bool = False):
+        now = time.perf_counter()
+        with self._lock:
+            if not force and now - self._last_report < self.report_every:
+                return
+            self._last_report = now
+            elapsed = now - self.started
+            total = f"/{self.total}" if self.total else ""
+            rate = self.upserted / elapsed if elapsed else 0.0
+            print(f"   ⏳ encoded {self.encoded}, reused {self.cached}, upserted {self.upserted}{total} "
+                  f"({rate:.1f} chunks/s, {elapsed:.1f}s)")
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            return {
+                "chunks": self.upserted,
+                "encoded": self.encoded,
+                "reused": self.cached,
+                "batches": self.batches,
+                "elapsed_s": round(elapsed, 3),
+                "chunks_per_s": round(self.upserted / elapsed, 2) if elapsed else 0.0,
+                # Summed over workers: close to elapsed = that stage is the bottleneck
+                "encode_busy_s": round(self.encode_seconds, 3),
+                "upsert_busy_s": round(self.upsert_seconds, 3),
+                "encoder_blocked_s": round(self.queue_wait_seconds, 3),
+            }
+
+
+# ---------------------------------------------------------------------------
+# BUILDER
+# ---------------------------------------------------------------------------
+
+class StreamingIndexBuilder:
+    """
+    Encode (id, chunk) pairs and hand the vectors to `upsert` while later
+    batches are still encoding.
+
+    Args:
+        upsert: writes one batch, called from several threads at once
+        backend: embedding backend id for the encoder processes
+        embeddings: in-process embedding model instead of a process pool
+        encode_workers / batch_size / upsert_workers / queue_size: see module doc
+        vector_cache: EmbeddingStore of the model; only texts missing from it are
+            encoded, and newly encoded vectors are added to it
+    """
+
+    def __init__(
+        self,
+        upsert: UpsertFn,
+        backend: Optional[str] = None,
+        embeddings=None,
+        encode_workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        upsert_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        vector_cache=None,
+    ):
+        self.upsert = upsert
+        self.backend = backend
+        self.embeddings = embeddings
+        self.encode_workers = 1 if embeddings is not None else (encode_workers or default_encode_workers())
+        self.batch_size = batch_size or _env_int("KB_ENCODE_BATCH_SIZE", 32)
+        self.upsert_workers = upsert_workers or _env_int("KB_UPSERT_WORKERS", 4)
+        self.queue_size = queue_size or _env_int("KB_UPSERT_QUEUE_SIZE", 8)
+        self.vector_cache = vector_cache
+
+    # --------------- encoding ---------------
+
+    def _lookup(self, batch: List[Tuple[str, Dict]]) -> Tuple[List[Optional[np.ndarray]], List[str]]:
+        """Vectors already in the embedding store (None = to encode) and the texts to encode."""
+        texts = [c["text"] for _, c in batch]
+        if self.vector_cache is None:
+            return [None] * len(batch), texts
+        cached = self.vector_cache.get_many(texts)
+        return cached, [text for text, vector in zip(texts, cached) if vector is None]
+
+    def _merge(self, batch, cached, encoded: Optional[np.ndarray], metrics: BuildMetrics) -> np.ndarray:
+        """Fill the encoded rows in, store them for the next build."""
+        metrics.add_cached(len(batch) - (len(encoded) if encoded is not None else 0))
+        if encoded is not None and len(encoded):
+            if self.vector_cache is not None:
+                self.vector_cache.put_many([c["text"] for (_, c), v in zip(batch, cached) if v is None], encoded)
+            rows = iter(encoded)
+            cached = [v if v is not None else next(rows) for v in cached]
+        return np.asarray(cached, dtype=np.float32)
+
+    def _encoded_batches(self, batches: Iterator[List[Tuple[str, Dict]]], metrics: BuildMetrics):
+        """Yield (batch, vectors) in input order."""
+        if self.encode_workers <= 1:
+            embeddings = self.embeddings
+            for batch in batches:
+                cached, texts = self._lookup(batch)
+                encoded = None
+                if texts:
+                    if embeddings is None:
+                        from ai_agent.rag.embedding_backends import create_embeddings
+                        embeddings, _ = create_embeddings(self.backend, batch_size=self.batch_size)
+                    t0 = time.perf_counter()
+                    encoded = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+                    metrics.add_encoded(len(texts), time.perf_counter() - t0)
+                yield batch, self._merge(batch, cached, encoded, metrics)
+            return
+
+        threads = max(1, (os.cpu_count() or 1) // self.encode_workers)
+        print(f"   🧵 {self.encode_workers} encoder processes x {threads} threads, batch {self.batch_size}")
+        # spawn: the parent already runs upsert threads, which fork does not copy safely.
+        # Processes start (and load the model) on the first submit only.
+        with ProcessPoolExecutor(
+            max_workers=self.encode_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_encoder,
+            initargs=(self.backend, self.batch_size, threads),
+        ) as pool:
+            # A couple of batches in flight per worker keeps every process busy
+            in_flight: deque = deque()
+            for batch in batches:
+                cached, texts = self._lookup(batch)
+                future = pool.submit(_encode_batch, texts) if texts else None
+                in_flight.append((batch, cached, future))
+                if len(in_flight) >= self.encode_workers * 2:
+                    yield self._collect(in_flight.popleft(), metrics)
+            while in_flight:
+                yield self._collect(in_flight.popleft(), metrics)
+
+    def _collect(self, item, metrics: BuildMetrics):
+        batch, cached, future = item
+        encoded = None
+        if future is not None:
+            encoded, seconds = future.result()
+            metrics.add_encoded(len(encoded), seconds)
+        return batch, self._merge(batch, cached, encoded, metrics)
+
+    # --------------- upserting ---------------
+
+    def _upsert_worker(self, pending: "queue.Queue", metrics: BuildMetrics, errors: List[BaseException]):
+        while True:
+            item = pending.get()
+            try:
+                if item is None:
+                    return
+                if errors:
+                    continue                # drain without writing after a failure
+                batch, vectors = item
+                t0 = time.perf_counter()
+                self.upsert(
+                    [cid for cid, _ in batch],
+                    [c["text"] for _, c in batch],
+                    [c["metadata"] for _, c in batch],
+                    vectors,
+                )
+                metrics.add_upserted(len(batch), time.perf_counter() - t0)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                pending.task_done()
+
+    # --------------- run ---------------
+
+    def run(self, chunks: Iterable[Tuple[str, Dict]], total: Optional[int] = None) -> Dict[str, float]:
+        """
+        Embed and upsert (id, {"text", "metadata"}) pairs, streamed from `chunks`.
+
+        Returns:
+            metrics summary (chunks, elapsed_s, chunks_per_s, stage busy times)
+        """
+        metrics = BuildMetrics(total=total)
+        pending: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        errors: List[BaseException] = []
+
+        writers = [
+            threading.Thread(target=self._upsert_worker, args=(pending, metrics, errors), daemon=True)
+            for _ in range(self.upsert_workers)
+        ]
+        for writer in writers:
+            writer.start()
+
+        try:
+            for item in self._encoded_batches(iter_batches(chunks, self.batch_size), metrics):
+                if errors:
+                    break
+                t0 = time.perf_counter()
+                pending.put(item)           # blocks while the writers are behind
+                metrics.add_queue_wait(time.perf_counter() - t0)
+        finally:
+            for _ in writers:
+                pending.put(None)
+            for writer in writers:
+                writer.join()
+
+        if errors:
+            raise RuntimeError(f"Upsert failed after {metrics.upserted} chunks: {errors[0]}") from errors[0]
+
+        if self.vector_cache is not None:
+            self.vector_cache.flush()
+        metrics.report(force=True)
+        return metrics.summary()
+
+
+# ---------------------------------------------------------------------------
+# UPSERT TARGETS
+# ---------------------------------------------------------------------------
+
+def pinecone_upserter(index, namespace: str = "", text_key: str = "text") -> UpsertFn:
+    """
+    Upsert into a Pinecone index namespace in the layout PineconeVectorStore
+    reads (chunk text stored in metadata[text_key]).
+    """
+    def upsert(ids, texts, metadatas, vectors):
+        index.upsert(vectors=[
+            {"id": cid, "values": vector.tolist(), "metadata": {**metadata, text_key: text}}
+            for cid, text, metadata, vector in zip(ids, texts, metadatas, vectors)
+        ], namespace=namespace)
+    return upsert
+
+
+class CollectingUpserter:
+    """Collects encoded batches in memory (local store: written in one atomic step)."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.vectors: List[np.ndarray] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, ids, texts, metadatas, vectors):
+        with self._lock:
+            self.ids.extend(ids)
+            self.texts.extend(texts)
+            self.metadatas.extend(metadatas)
+            self.vectors.append(np.asarray(vectors, dtype=np.float32))
+
+    def matrix(self) -> Optional[np.ndarray]:
+        return np.vstack(self.vectors) if self.vectors else None
@@ -0,0 +1,117 @@
+"""
+Content-hash manifest for incremental knowledge-base indexing.
+
+Each chunk gets a stable id (spec file + chunk position) and a content hash
+(text + indexed metadata + embedding model). The manifest stored next to an
+index records the hash of every chunk it holds, so a rebuild only embeds and
+upserts chunks whose hash changed, and deletes ids that disappeared.
+
+The knowledge-base version id is a hash over all (id, content hash) pairs:
+identical content always gives the same version, any edit a new one.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+MANIFEST_VERSION = 1
+
+# Metadata that changes between extractions without the spec changing
+# (doc_id carries a random suffix, source is a machine-local path)
+VOLATILE_METADATA = ("doc_id", "source")
+
+
+def chunk_id(metadata: Dict) -> str:
+    """Stable vector id of a chunk: spec file name + chunk position."""
+    key = f"{metadata.get('file_name', '')}|{metadata.get('chunk_index', 0)}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+
+
+def content_hash(text: str, metadata: Dict, model_id: str) -> str:
+    """Changes whenever the embedded text, the indexed metadata or the model changes."""
+    stable = {k: v for k, v in metadata.items() if k not in VOLATILE_METADATA}
+    payload = json.dumps({"model": model_id, "text": text, "metadata": stable}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def kb_version(hashes: Dict[str, str]) -> str:
+    digest = hashlib.sha256()
+    for cid in sorted(hashes):
+        digest.update(f"{cid}:{hashes[cid]}\n".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def load_manifest(path: Path) -> Dict:
+    path = Path(path)
+    if not path.exists():
+        return {"manifest_version": MANIFEST_VERSION, "kb_version": None, "model": None, "chunks": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_manifest(path: Path, manifest: Dict):
+    """Write atomically: readers never see a half-written manifest."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def plan_update(
+    manifest: Dict,
+    chunks: List[Dict],
+    model_id: str,
+) -> Tuple[List[Tuple[str, Dict]], List[str], Dict[str, str]]:
+    """
+    Compare the current chunks with the manifest.
+
+    Args:
+        manifest: loaded manifest of the target index
+        chunks: [{"text", "metadata"}] as produced by chunk_documents
+        model_id: embedding model id (a different model invalidates every chunk)
+
+    Returns:
+        (to_upsert [(id, chunk)], to_delete [id], new hashes {id: hash})
+    """
+    old_hashes: Dict[str, str] = manifest.get("chunks", {}) if manifest.get("model") == model_id else {}
+
+    new_hashes: Dict[str, str] = {}
+    to_upsert: List[Tuple[str, Dict]] = []
+    for chunk in chunks:
+        cid = chunk_id(chunk["metadata"])
+        if cid in new_hashes:
+            raise ValueError(f"Duplicate chunk id for {chunk['metadata'].get('file_name')}")
+        digest = content_hash(chunk["text"], chunk["metadata"], model_id)
+        new_hashes[cid] = digest
+        if old_hashes.get(cid) != digest:
+            to_upsert.append((cid, chunk))
+
+    # After a model change the old manifest is ignored, but its ids still
+    # exist in the index and must go if they are not overwritten
+    previous_ids = set(manifest.get("chunks", {}))
+    to_delete = sorted(previous_ids - set(new_hashes))
+    return to_upsert, to_delete, new_hashes
+
+
+def updated_manifest(
+    manifest: Dict,
+    new_hashes: Dict[str, str],
+    model_id: str,
+    target: str,
+    upserted: int,
+    deleted: int,
+) -> Dict:
+    return {
+        "manifest_version": MANIFEST_VERSION,
+        "kb_version": kb_version(new_hashes),
+        "previous_kb_version": manifest.get("kb_version"),
+        "model": model_id,
+        "target": target,
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "last_update": {"upserted": upserted, "deleted": deleted, "total": len(new_hashes)},
+        "chunks": new_hashes,
+    }
@@ -1,7 +1,11 @@
 from pathlib import Path
-import pdfplumber
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
 import json
-import uuid
+import os
+import time
+
+import pdfplumber
 
 # -----------------------------
 # INPUT PATHS (folders OR files)
@@ -12,14 +16,22 @@ INPUT_DIRS = [
     r"C:\Users\rouam\Downloads\ASSURMAX – SIMPLIFIED PLAN (UAE).pdf",
 ]
 
+# PDF_INPUT_DIRS (os.pathsep-separated) overrides the list above
+if os.getenv("PDF_INPUT_DIRS"):
+    INPUT_DIRS = [p for p in os.getenv("PDF_INPUT_DIRS").split(os.pathsep) if p.strip()]
+
 # -----------------------------
 # OUTPUT
 # -----------------------------
-OUTPUT_DIR = Path("knowledge_base/extracted")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+OUTPUT_DIR = Path(__file__).parent / "knowledge_base" / "extracted"
 
 OUTPUT_FILE = OUTPUT_DIR / "documents.jsonl"
 
+# Per-PDF content hash, doc_id and page count of the last extraction
+MANIFEST_FILE = OUTPUT_DIR / "extract_manifest.json"
+
+MAX_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+
 
 def collect_pdfs(input_paths):
     """Collect PDFs from folders and single-file paths"""
@@ -29,7 +41,7 @@ def collect_pdfs(input_paths):
         p = Path(path)
 
         if p.is_dir():
-            pdfs.extend(p.glob("*.pdf"))
+            pdfs.extend(sorted(p.glob("*.pdf")))
 
         elif p.is_file() and p.suffix.lower() == ".pdf":
             pdfs.append(p)
@@ -40,44 +52,213 @@ def collect_pdfs(input_paths):
     return pdfs
 
 
-def extract_pdfs():
-    pdf_files = collect_pdfs(INPUT_DIRS)
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stable_doc_id(pdf_path, sha256):
+    """Same PDF content -> same doc_id on every run (a changed PDF gets a new one)"""
+    return f"{pdf_path.stem}_{sha256[:8]}"
+
+
+def load_manifest():
+    if not MANIFEST_FILE.exists():
+        return {}
+    return json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+
+
+def _write_atomic(path, write):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def extract_pdf(pdf_path, doc_id, category):
+    """
+    Extract the non-empty pages of one PDF (runs in a worker process).
+
+    Returns:
+        (records, error message or None)
+    """
+    pdf_path = Path(pdf_path)
+    records = []
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            for page_num, page in enumerate(pdf.pages, start=1):
+                text = page.extract_text()
+
+                if not text or not text.strip():
+                    continue
+
+                records.append({
+                    "doc_id": doc_id,
+                    "file_name": pdf_path.name,
+                    "source_path": str(pdf_path),
+                    "category": category,
+                    "page": page_num,
+                    "text": text.strip(),
+                })
+    except Exception as e:
+        return [], str(e)
+    return records, None
+
+
+def plan_extraction(pdf_files, manifest, force=False):
+    """
+    Split PDFs into unchanged (manifest entry reused) and to-extract.
+    Size + mtime unchanged -> trusted without hashing; otherwise the content
+    hash decides (a touched but identical file is not re-extracted).
 
+    Returns:
+        (to_extract [(path, sha256)], entries {source_path: manifest entry})
+    """
+    to_extract = []
+    entries = {}
+
+    for pdf_path in pdf_files:
+        key = str(pdf_path)
+        stat = pdf_path.stat()
+        previous = manifest.get(key)
+
+        if not force and previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+            entries[key] = previous
+            continue
+
+        sha256 = file_sha256(pdf_path)
+        if not force and previous and previous["sha256"] == sha256:
+            entries[key] = {**previous, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            continue
+
+        to_extract.append((pdf_path, sha256))
+
+    return to_extract, entries
+
+
+def _same_dir(a, b):
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def removed_sources(known_sources, collected, input_paths):
+    """
+    Sources whose PDF was deleted: the source lives directly in one of the
+    input folders scanned in this run, and that scan did not find it.
+    Anything else (other folders, single-file inputs, paths of another
+    machine such as C:\\... on Linux) is kept as it is.
+    """
+    scanned_dirs = [p for p in input_paths if Path(p).is_dir()]
+    return sorted(
+        source for source in set(known_sources)
+        if source not in collected
+        and Path(source).is_absolute()
+        and any(_same_dir(Path(source).parent, d) for d in scanned_dirs)
+    )
+
+
+def load_records_by_source():
+    """Current documents.jsonl grouped by source_path, in file order"""
+    grouped = {}
+    if not OUTPUT_FILE.exists():
+        return grouped
+    with OUTPUT_FILE.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                grouped.setdefault(record["source_path"], []).append(record)
+    return grouped
+
+
+def extract_pdfs(force=False):
+    t0 = time.perf_counter()
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    pdf_files = collect_pdfs(INPUT_DIRS)
     print(f"\n📄 Found {len(pdf_files)} PDFs\n")
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as out:
-        for pdf_path in pdf_files:
-            doc_id = f"{pdf_path.stem}_{uuid.uuid4().hex[:8]}"
-            category = pdf_path.parent.name
+    manifest = load_manifest()
+    existing = load_records_by_source()
+    to_extract, entries = plan_extraction(pdf_files, manifest, force=force)
 
-            print(f"➡️ Extracting {pdf_path.name}")
+    # Unchanged PDFs whose pages are missing from documents.jsonl are re-extracted too
+    for key in [key for key in entries if key not in existing]:
+        pdf_path = Path(key)
+        to_extract.append((pdf_path, entries.pop(key).get("sha256") or file_sha256(pdf_path)))
 
-            try:
-                with pdfplumber.open(pdf_path) as pdf:
-                    for page_num, page in enumerate(pdf.pages, start=1):
-                        text = page.extract_text()
+    print(f"🔎 {len(to_extract)} new/changed, {len(entries)} unchanged")
 
-                        if not text or not text.strip():
-                            continue
+    extracted = {}
+    jobs = [
+        (pdf_path, stable_doc_id(pdf_path, sha256), pdf_path.parent.name, sha256)
+        for pdf_path, sha256 in to_extract
+    ]
+    workers = max(1, min(MAX_WORKERS, len(jobs)))
 
-                        record = {
-                            "doc_id": doc_id,
-                            "file_name": pdf_path.name,
-                            "source_path": str(pdf_path),
-                            "category": category,
-                            "page": page_num,
-                            "text": text.strip(),
-                        }
+    def record_result(pdf_path, doc_id, sha256, records, error):
+        if error:
+            print(f"❌ Failed {pdf_path.name}: {error}")
+            return
+        print(f"➡️ Extracted {pdf_path.name} ({len(records)} pages)")
+        stat = pdf_path.stat()
+        extracted[str(pdf_path)] = records
+        entries[str(pdf_path)] = {
+            "sha256": sha256,
+            "doc_id": doc_id,
+            "pages": len(records),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
 
-                        out.write(
-                            json.dumps(record, ensure_ascii=False) + "\n"
-                        )
+    if workers == 1:
+        # One or two files: not worth starting worker processes
+        for pdf_path, doc_id, category, sha256 in jobs:
+            record_result(pdf_path, doc_id, sha256, *extract_pdf(pdf_path, doc_id, category))
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (pdf_path, doc_id, sha256, pool.submit(extract_pdf, str(pdf_path), doc_id, category))
+                for pdf_path, doc_id, category, sha256 in jobs
+            ]
+            for pdf_path, doc_id, sha256, future in futures:
+                record_result(pdf_path, doc_id, sha256, *future.result())
 
-            except Exception as e:
-                print(f"❌ Failed {pdf_path.name}: {e}")
+    # PDFs deleted from a folder scanned in this run are dropped; every other
+    # source (other folders, unreachable drives, other machines) is kept
+    collected = {str(p) for p in pdf_files}
+    removed = removed_sources(set(existing) | set(manifest), collected, INPUT_DIRS)
+    kept = [source for source in existing if source not in collected and source not in removed]
+    for source in kept:
+        if source in manifest:
+            entries[source] = manifest[source]
 
-    print(f"\n✅ Done. Output saved to:\n{OUTPUT_FILE.absolute()}")
+    def write_documents(out):
+        pages = 0
+        for source in [str(p) for p in pdf_files] + kept:
+            records = extracted.get(source)
+            if records is None:
+                # Failed re-extraction keeps the previous pages
+                records = existing.get(source, [])
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                pages += 1
+        print(f"📝 {pages} pages written")
+
+    _write_atomic(OUTPUT_FILE, write_documents)
+    _write_atomic(MANIFEST_FILE, lambda f: json.dump(entries, f, indent=2, ensure_ascii=False))
+
+    if removed:
+        print(f"🗑️ Removed {len(removed)} deleted PDFs")
+    print(f"\n✅ Done in {time.perf_counter() - t0:.1f}s. Output saved to:\n{OUTPUT_FILE.absolute()}")
 
 
 if __name__ == "__main__":
-    extract_pdfs()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract spec PDFs to documents.jsonl")
+    parser.add_argument("--force", action="store_true", help="Re-extract every PDF, even unchanged ones")
+    args = parser.parse_args()
+
+    extract_pdfs(force=args.force)
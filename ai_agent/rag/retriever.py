@@ -1,75 +1,477 @@
-from typing import List  
+from typing import Callable, Dict, List, Sequence, Union
 import os
-import torch
+import threading
+import time
 from dotenv import load_dotenv
-from langchain_pinecone import PineconeVectorStore
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document  
 
+from ai_agent.rag.vector_store import get_backend_name, get_local_store_dir
+from ai_agent.rag.spec_metadata import build_filter
+
 load_dotenv()
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"🖥️ Device: {device}")
+# Heavy resources (torch, bge-large, Pinecone client) are created on first use,
+# not at import, so CLIs / tests / server reloads that never retrieve stay fast.
+_embeddings = None
+_vectorstore = None
+_keyword_index = None
+_lock = threading.Lock()
+
+# Knowledge-base release (see kb_alias) the shared vector store / BM25 index /
+# spec catalog were opened on. The registry is re-checked at most every
+# KB_ALIAS_CHECK_INTERVAL seconds - by the request path, or by the watcher
+# thread of long-running processes (start_kb_watcher). A new release is opened
+# next to the current one and swapped in atomically: requests in flight finish
+# on the resources they hold, new ones see the new release, caches are re-warmed.
+KB_ALIAS_CHECK_INTERVAL = float(os.getenv("KB_ALIAS_CHECK_INTERVAL", "5"))
+_kb_slot = None
+_kb_release: Dict = {}
+_alias_signature = None
+_alias_checked_at = 0.0
+_kb_switch_listeners: List[Callable[[], None]] = []
+_refresh_lock = threading.Lock()
+_watcher = None
+
+# RETRIEVAL_MODE: dense (vector store only), bm25 (keyword only) or hybrid
+# (both, fused by reciprocal rank). Hybrid pulls this many candidates per side.
+RETRIEVAL_MODES = ("dense", "bm25", "hybrid")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+
+
+def get_retrieval_mode() -> str:
+    mode = os.getenv("RETRIEVAL_MODE", "dense").strip().lower()
+    if mode not in RETRIEVAL_MODES:
+        raise RuntimeError(f"Unknown RETRIEVAL_MODE: {mode!r} (use {', '.join(RETRIEVAL_MODES)})")
+    return mode
+
+
+def get_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def get_embeddings():
+    """
+    Shared query-embedding model (loaded once, thread-safe), wrapped in an
+    LRU cache of query vectors (QUERY_EMBEDDING_CACHE_SIZE entries, persisted
+    to QUERY_EMBEDDING_CACHE_PATH when set). EMBEDDING_BACKEND selects the
+    model (see embedding_backends).
+    """
+    global _embeddings
+    if _embeddings is None:
+        with _lock:
+            if _embeddings is None:
+                from ai_agent.rag.embedding_backends import create_embeddings
+                from ai_agent.rag.embedding_cache import CachedQueryEmbeddings
+
+                model, model_id = create_embeddings()
+                _embeddings = CachedQueryEmbeddings(
+                    model,
+                    model_name=model_id,
+                    max_size=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")),
+                    persist_path=os.getenv("QUERY_EMBEDDING_CACHE_PATH") or None,
+                )
+    return _embeddings
+
 
-embeddings = HuggingFaceEmbeddings(
-    model_name="BAAI/bge-large-en-v1.5",
-    model_kwargs={"device": device},
-    encode_kwargs={
-        "normalize_embeddings": True,
-        "batch_size": 32 if device == "cuda" else 8
+def query_cache_stats() -> dict:
+    """Hit-rate metrics of the query-embedding cache (empty before first use)."""
+    return _embeddings.stats() if _embeddings is not None else {}
+
+
+def add_kb_switch_listener(callback: Callable[[], None]):
+    """Call `callback` after a new knowledge-base release went live (e.g. to re-warm memos)."""
+    if callback not in _kb_switch_listeners:
+        _kb_switch_listeners.append(callback)
+
+
+def refresh_kb(force: bool = False) -> bool:
+    """
+    Go live on the release published in the KB registry, if it changed.
+
+    The new slot's vector store / BM25 index (those already in use) and its
+    spec catalog are opened first, while requests keep using the current
+    ones; then all references are swapped under the lock and the switch
+    listeners run. If opening fails the current release stays live and the
+    registry is re-read on the next check.
+
+    Returns:
+        True if a new release went live
+    """
+    global _vectorstore, _keyword_index, _kb_slot, _kb_release, _alias_signature, _alias_checked_at
+    from ai_agent.rag.kb_alias import alias_signature, read_alias, release_id
+    from ai_agent.rag.spec_catalog import load_catalog, loaded_spec_catalog, set_spec_catalog
+
+    now = time.monotonic()
+    if not force and now - _alias_checked_at < KB_ALIAS_CHECK_INTERVAL:
+        return False
+    _alias_checked_at = now
+
+    signature = alias_signature()
+    if not force and signature == _alias_signature:
+        return False
+    if not _refresh_lock.acquire(blocking=False):
+        return False                    # another thread is opening the new release
+    try:
+        entry = read_alias().get(get_backend_name(), {})
+        if release_id(entry) == release_id(_kb_release):
+            _alias_signature = signature
+            return False
+
+        slot = entry.get("slot")
+        in_use = _vectorstore is not None or _keyword_index is not None
+        try:
+            vectorstore = _open_vectorstore(slot) if _vectorstore is not None else None
+            keyword_index = _open_keyword_index(slot) if _keyword_index is not None else None
+            current_catalog = loaded_spec_catalog()
+            catalog = load_catalog(entry.get("catalog_version")) if current_catalog is not None else None
+        except Exception as e:
+            print(f"⚠️  KB release {release_id(entry)} not opened, keeping {release_id(_kb_release)}: {e}")
+            return False
+
+        with _lock:
+            _kb_slot, _kb_release = slot, entry
+            _vectorstore, _keyword_index = vectorstore, keyword_index
+            if catalog is not None:
+                set_spec_catalog(catalog)
+            _alias_signature = signature
+    finally:
+        _refresh_lock.release()
+
+    if in_use or catalog is not None:
+        print(f"🔀 Knowledge base switched to {release_id(entry)}")
+        for callback in list(_kb_switch_listeners):
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️  KB switch listener failed: {e}")
+    return True
+
+
+def _check_kb_alias():
+    # With a watcher running, requests never pay for opening a release
+    if _watcher is None:
+        refresh_kb()
+
+
+def start_kb_watcher(interval: float = None) -> threading.Thread:
+    """Watch the KB registry from a daemon thread (long-running processes; idempotent)."""
+    global _watcher
+    interval = KB_ALIAS_CHECK_INTERVAL if interval is None else interval
+
+    def watch():
+        while True:
+            try:
+                refresh_kb(force=False)
+            except Exception as e:
+                print(f"⚠️  KB watcher: {e}")
+            time.sleep(interval)
+
+    with _lock:
+        if _watcher is None:
+            _watcher = threading.Thread(target=watch, daemon=True, name="kb-watcher")
+            _watcher.start()
+    return _watcher
+
+
+def get_kb_slot():
+    """Live blue-green slot the retriever reads (None: index built without slots)."""
+    _check_kb_alias()
+    return _kb_slot
+
+
+def get_kb_version():
+    """Id of the live KB release (slot + index + catalog versions) for caches to key on."""
+    from ai_agent.rag.kb_alias import release_id
+
+    _check_kb_alias()
+    return release_id(_kb_release)
+
+
+def kb_status() -> dict:
+    """Live KB release, for health checks."""
+    from ai_agent.rag.kb_alias import release_id
+
+    return {
+        "version": release_id(_kb_release),
+        "slot": _kb_slot,
+        "kb_version": _kb_release.get("kb_version"),
+        "catalog_version": _kb_release.get("catalog_version"),
+        "switched_at": _kb_release.get("switched_at"),
+        "watching": _watcher is not None,
     }
-)
 
-vectorstore = PineconeVectorStore(
-    index_name=os.getenv("PINECONE_INDEX_NAME", "insurance-product-specs"),
-    embedding=embeddings,
-    pinecone_api_key=os.getenv("PINECONE_API_KEY")
-)
 
-def retrieve_specs_raw(query: str, k: int = 3, market: str = None) -> List[Document]:
+def _open_vectorstore(slot):
+    backend = get_backend_name()
+    embeddings = get_embeddings()
+    if backend == "local":
+        from ai_agent.rag.kb_alias import local_slot_dir
+        from ai_agent.rag.vector_store import LocalVectorStore
+
+        store_dir = local_slot_dir(get_local_store_dir(), slot)
+        store = LocalVectorStore(store_dir, embedding=embeddings)
+        print(f"📂 Local vector store: {store_dir} ({len(store)} chunks)")
+        built_with = store.info.get("model")
+        if built_with and built_with != embeddings.model_name:
+            raise RuntimeError(
+                f"Local vector store was built with {built_with}, queries use "
+                f"{embeddings.model_name}: rebuild it or change EMBEDDING_BACKEND"
+            )
+        return store
+    if backend == "pinecone":
+        from langchain_pinecone import PineconeVectorStore
+
+        return PineconeVectorStore(
+            index_name=os.getenv("PINECONE_INDEX_NAME", "insurance-product-specs"),
+            embedding=embeddings,
+            namespace=slot,
+            pinecone_api_key=os.getenv("PINECONE_API_KEY")
+        )
+    raise RuntimeError(f"Unknown VECTOR_STORE_BACKEND: {backend!r} (use 'pinecone' or 'local')")
+
+
+def _open_keyword_index(slot):
+    from ai_agent.rag.bm25 import BM25Index
+
+    if get_backend_name() == "local":
+        from ai_agent.rag.kb_alias import local_slot_dir
+        from ai_agent.rag.vector_store import load_local_chunks
+        texts, metadatas = load_local_chunks(local_slot_dir(get_local_store_dir(), slot))
+    else:
+        from ai_agent.rag.embedding import load_documents, chunk_documents
+        chunks = chunk_documents(load_documents())
+        texts = [c["text"] for c in chunks]
+        metadatas = [c["metadata"] for c in chunks]
+    index = BM25Index(texts, metadatas)
+    print(f"🔤 BM25 index: {len(index)} chunks")
+    return index
+
+
+def get_vectorstore():
     """
-    Retrieve raw document objects with MARKET FILTERING.
+    Shared vector store (created once, thread-safe), opened on the live
+    blue-green slot and swapped when a new KB release goes live.
+    VECTOR_STORE_BACKEND picks Pinecone (default) or the local NumPy store.
+    """
+    global _vectorstore
+    _check_kb_alias()
+    if _vectorstore is None:
+        get_embeddings()
+        with _lock:
+            if _vectorstore is None:
+                _vectorstore = _open_vectorstore(_kb_slot)
+    return _vectorstore
+
+def get_keyword_index():
+    """
+    Shared BM25 index over the same chunks as the dense index (built once,
+    thread-safe): the local store's chunks, or documents.jsonl chunked the
+    way embedding.py chunks it for Pinecone.
+    """
+    global _keyword_index
+    _check_kb_alias()
+    if _keyword_index is None:
+        with _lock:
+            if _keyword_index is None:
+                _keyword_index = _open_keyword_index(_kb_slot)
+    return _keyword_index
+
+
+def search_specs(
+    query: str,
+    k: int,
+    filter: dict = None,
+    mode: str = None,
+    vectorstore=None,
+    keyword_index=None,
+) -> List[Document]:
+    """
+    Top-k chunks for `query` in the given retrieval mode (RETRIEVAL_MODE by
+    default), on the shared indexes unless others are passed (benchmarks).
+    """
+    mode = mode or get_retrieval_mode()
+    # `is None`: an empty index defines __len__ and is falsy
+    if vectorstore is None and mode in ("dense", "hybrid"):
+        vectorstore = get_vectorstore()
+    if keyword_index is None and mode in ("bm25", "hybrid"):
+        keyword_index = get_keyword_index()
+    if mode == "dense":
+        return vectorstore.similarity_search(query, k=k, filter=filter)
+    if mode == "bm25":
+        return keyword_index.search(query, k=k, filter=filter)
+    if mode == "hybrid":
+        from ai_agent.rag.bm25 import reciprocal_rank_fusion
+
+        candidates = max(k, HYBRID_CANDIDATES)
+        dense = vectorstore.similarity_search(query, k=candidates, filter=filter)
+        keyword = keyword_index.search(query, k=candidates, filter=filter)
+        return reciprocal_rank_fusion([dense, keyword], k=k)
+    raise ValueError(f"Unknown retrieval mode: {mode!r}")
+
+
+def retrieve_specs_raw(
+    query: str,
+    k: int = 3,
+    market: str = None,
+    spec_family: str = None,
+    mode: str = None,
+    sections: Sequence[str] = None,
+) -> List[Document]:
+    """
+    Retrieve raw document objects with MARKET / SPEC FAMILY FILTERING.
+
+    The filters run inside the vector query on the chunk metadata written at
+    index time (see spec_metadata), so exactly the top k matching chunks come
+    back and another market's spec is never substituted.
     
     Args:
         query: Search query
-        k: Number of documents to retrieve (will retrieve k*2 then filter)
-        market: "UAE" or "Tunisia" - filters documents by market
+        k: Number of documents to retrieve
+        market: "UAE" or "Tunisia" - only chunks of that market
+        spec_family: e.g. "ELECTRONICS" - only chunks of that spec family
+        mode: "dense", "bm25" or "hybrid" (default: RETRIEVAL_MODE)
+        sections: only these spec sections (e.g. ["eligible_products", "exclusions"])
     
     Returns:
-        List of Document objects (market-filtered)
+        List of Document objects (may be fewer than k, or empty)
     """
     try:
-        # Retrieve more docs to account for filtering
-        docs = vectorstore.similarity_search(query, k=k*3)
-        
-        if not market:
-            return docs[:k]
-        
-        # CRITICAL: Filter by market
-        market_docs = []
-        for doc in docs:
-            filename = doc.metadata.get('file_name', '').lower()
-            
-            if market == "UAE":
-                # UAE specs: contain "uae" or "essential" but NOT "tunisia" or "_tn"
-                is_uae = ("uae" in filename or "essential" in filename) and \
-                         "tunisia" not in filename and "_tn." not in filename
-                if is_uae:
-                    market_docs.append(doc)
-                    
-            elif market == "Tunisia":
-                # Tunisia specs: contain "tunisia" or "_tn"
-                is_tunisia = "tunisia" in filename or "_tn." in filename
-                if is_tunisia:
-                    market_docs.append(doc)
-        
-        # Return top k market-specific docs
-        return market_docs[:k] if market_docs else docs[:k]
+        return search_specs(
+            query, k=k, filter=build_filter(market=market, spec_family=spec_family, sections=sections), mode=mode
+        )
         
     except Exception as e:
         print(f"❌ Error retrieving raw specs: {e}")
         return []
 
+def _dense_search_many(queries: List[str], k: int, filter: dict = None) -> List[List[Document]]:
+    """Dense top-k for several queries: one batched encode, then one search call per backend."""
+    store = get_vectorstore()
+    embeddings = get_embeddings()
+    vectors = embeddings.embed_queries(queries)
+
+    if hasattr(store, "similarity_search_by_vectors"):
+        return store.similarity_search_by_vectors(vectors, k=k, filter=filter)
+
+    # Remote stores have no multi-vector query: issue the calls concurrently
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(8, len(vectors))) as pool:
+        return list(pool.map(
+            lambda vector: store.similarity_search_by_vector(vector, k=k, filter=filter),
+            vectors,
+        ))
+
+
+def search_specs_many(queries: List[str], k: int, filter: dict = None, mode: str = None) -> List[List[Document]]:
+    """search_specs for several queries sharing one filter; results aligned with `queries`."""
+    if not queries:
+        return []
+    mode = mode or get_retrieval_mode()
+    if mode == "dense":
+        return _dense_search_many(queries, k, filter)
+    if mode == "bm25":
+        index = get_keyword_index()
+        return [index.search(query, k=k, filter=filter) for query in queries]
+    if mode == "hybrid":
+        from ai_agent.rag.bm25 import reciprocal_rank_fusion
+
+        candidates = max(k, HYBRID_CANDIDATES)
+        dense = _dense_search_many(queries, candidates, filter)
+        index = get_keyword_index()
+        return [
+            reciprocal_rank_fusion([dense_docs, index.search(query, k=candidates, filter=filter)], k=k)
+            for query, dense_docs in zip(queries, dense)
+        ]
+    raise ValueError(f"Unknown retrieval mode: {mode!r}")
+
+
+def retrieve_specs_raw_many(
+    queries: List[str],
+    k: int = 3,
+    market: Union[str, Sequence[str], None] = None,
+    spec_family: Union[str, Sequence[str], None] = None,
+    mode: str = None,
+    sections: Sequence[str] = None,
+) -> List[List[Document]]:
+    """
+    Batched retrieve_specs_raw: all queries are encoded in one forward pass
+    and searched together, instead of one encode + one vector query each.
+
+    Args:
+        queries: Search queries
+        k: Number of documents per query
+        market: one market for all queries, or one per query
+        spec_family: one spec family for all queries, or one per query
+        mode: "dense", "bm25" or "hybrid" (default: RETRIEVAL_MODE)
+        sections: only these spec sections, for every query
+
+    Returns:
+        One list of Document objects per query, in input order
+        (an empty list for queries whose retrieval failed)
+    """
+    n = len(queries)
+
+    def per_query(value):
+        if value is None or isinstance(value, str):
+            return [value] * n
+        if len(value) != n:
+            raise ValueError(f"Expected {n} values, got {len(value)}")
+        return list(value)
+
+    markets, families = per_query(market), per_query(spec_family)
+
+    # Queries with the same filter are searched as one batch
+    groups: Dict[tuple, List[int]] = {}
+    for i in range(n):
+        groups.setdefault((markets[i], families[i]), []).append(i)
+
+    results: List[List[Document]] = [[] for _ in range(n)]
+    for (group_market, group_family), indexes in groups.items():
+        try:
+            docs = search_specs_many(
+                [queries[i] for i in indexes],
+                k=k,
+                filter=build_filter(market=group_market, spec_family=group_family, sections=sections),
+                mode=mode,
+            )
+            for i, group_docs in zip(indexes, docs):
+                results[i] = group_docs
+        except Exception as e:
+            print(f"❌ Error retrieving raw specs ({group_market}/{group_family}): {e}")
+    return results
+
+
+def merge_chunks_by_file(docs: List[Document]) -> List[Document]:
+    """
+    One Document per spec file from its retrieved section chunks, in
+    document order. Files keep the rank of their best chunk.
+    """
+    by_file: Dict[str, List[Document]] = {}
+    for doc in docs:
+        by_file.setdefault(doc.metadata.get("file_name", ""), []).append(doc)
+
+    merged = []
+    for file_name, chunks in by_file.items():
+        chunks.sort(key=lambda d: d.metadata.get("chunk_index", 0))
+        metadata = dict(chunks[0].metadata)
+        metadata["sections"] = [d.metadata.get("section") for d in chunks if d.metadata.get("section")]
+        for key in ("chunk_index", "section", "section_title", "section_number", "section_part", "section_parts"):
+            metadata.pop(key, None)
+        # Every chunk starts with the same "[spec title]" line: keep it once
+        header = chunks[0].page_content.split("\n", 1)[0]
+        bodies = [chunks[0].page_content] + [
+            d.page_content.split("\n", 1)[-1] if d.page_content.startswith(header + "\n") else d.page_content
+            for d in chunks[1:]
+        ]
+        merged.append(Document(
+            page_content="\n\n".join(bodies),
+            metadata=metadata,
+        ))
+    return merged
+
+
 def retrieve_product_specs(query: str, k: int = 5) -> str:
     """
     Retrieve product specification documents from Pinecone.
@@ -88,7 +490,7 @@ def retrieve_product_specs(query: str, k: int = 5) -> str:
         enhanced_query = f"{query} insurance specification coverage"
         
         # Retrieve documents
-        docs = vectorstore.similarity_search(enhanced_query, k=k)
+        docs = search_specs(enhanced_query, k=k)
         
         if not docs:
             return "No relevant product specifications found."
@@ -171,7 +573,8 @@ if __name__ == "__main__":
     print("="*80)
     print("PRODUCT SPECIFICATION RETRIEVER")
     print("="*80)
-    print(f"Device: {device}")
+    print(f"Device: {get_device()}")
+    print(f"Backend: {get_backend_name()} ({get_retrieval_mode()})")
     print(f"Index: {os.getenv('PINECONE_INDEX_NAME', 'insurance-product-specs')}")
     print("="*80)
     
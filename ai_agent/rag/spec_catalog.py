@@ -0,0 +1,562 @@
+"""
+Spec compiler: documents.jsonl -> typed, versioned spec catalog.
+
+Specs reach the agent as free text through RAG, while their hard facts
+(markets, currencies, value buckets, caps, brand restrictions...) are needed
+deterministically by classification and pricing. This module parses every
+spec once into a SpecRecord per risk profile and stores them in one JSON
+artifact (SPEC_CATALOG_FILE, default knowledge_base/spec_catalog.json):
+
+    {"schema_version": 1, "version": "<content hash>", "compiled_at": ...,
+     "records": {"<risk profile>": {...}}}
+
+SpecCatalog gives O(1) lookups by risk profile and by (spec family, market).
+
+Usage:
+    python ai_agent/rag/spec_catalog.py            # compile and write
+    python ai_agent/rag/spec_catalog.py --show ELECTRONIC_PRODUCTS_TN
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from ai_agent.rag.spec_chunker import section_label, split_sections
+from ai_agent.rag.spec_metadata import (
+    MARKET_TUNISIA,
+    MARKET_UAE,
+    infer_market,
+    infer_risk_profile,
+    infer_spec_family,
+)
+
+
+SCHEMA_VERSION = 1
+
+DEFAULT_CATALOG_FILE = Path(__file__).parent / "knowledge_base" / "spec_catalog.json"
+DEFAULT_DOCUMENTS_FILE = Path(__file__).parent / "knowledge_base" / "extracted" / "documents.jsonl"
+
+MARKET_CURRENCIES = {MARKET_UAE: "AED", MARKET_TUNISIA: "TND"}
+
+
+def get_catalog_path() -> Path:
+    return Path(os.getenv("SPEC_CATALOG_FILE", str(DEFAULT_CATALOG_FILE)))
+
+
+# ---------------------------------------------------------------------------
+# RECORDS
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ValueBucket:
+    code: str
+    min_value: float
+    max_value: float
+    is_cap: bool = False
+    # Premium rate per duration when the spec states it ({"12m": 0.05, "24m": 0.085})
+    rates: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class CoverageModule:
+    name: str
+    core: bool = False
+    optional: bool = False
+    items: List[str] = field(default_factory=list)
+    details: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class SpecRecord:
+    risk_profile: str
+    spec_family: Optional[str]
+    market: Optional[str]
+    currency: Optional[str]
+    file_name: str
+    title: str
+    usage: Optional[str] = None
+    brand_restriction: Optional[str] = None
+    # category -> products, in spec order
+    eligible_products: Dict[str, List[str]] = field(default_factory=dict)
+    excluded_products: List[str] = field(default_factory=list)
+    value_buckets: List[ValueBucket] = field(default_factory=list)
+    coverage_modules: List[CoverageModule] = field(default_factory=list)
+    exclusions: List[str] = field(default_factory=list)
+    conditions: List[str] = field(default_factory=list)
+    commission_rates: List[float] = field(default_factory=list)
+    # Other "Key: value" facts (plan terms, caps, durations), numbers parsed
+    terms: Dict[str, object] = field(default_factory=dict)
+    content_hash: str = ""
+
+    @property
+    def value_cap(self) -> Optional[float]:
+        """Highest insurable value (top of the bucket the spec marks "(cap)"), None without one."""
+        return max((b.max_value for b in self.value_buckets if b.is_cap), default=None)
+
+    def bucket_for(self, value: float) -> Optional[ValueBucket]:
+        for bucket in self.value_buckets:
+            if bucket.min_value <= value <= bucket.max_value:
+                return bucket
+        # Above an open last bucket (no cap): still that bucket
+        last = max(self.value_buckets, key=lambda b: b.max_value, default=None)
+        if last is not None and not last.is_cap and value > last.max_value:
+            return last
+        return None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SpecRecord":
+        data = dict(data)
+        data["value_buckets"] = [ValueBucket(**b) for b in data.get("value_buckets", [])]
+        data["coverage_modules"] = [CoverageModule(**m) for m in data.get("coverage_modules", [])]
+        return cls(**data)
+
+
+# ---------------------------------------------------------------------------
+# PARSING HELPERS
+# ---------------------------------------------------------------------------
+
+_NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_PERCENT_RE = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+_KV_RE = re.compile(r"^-?\s*([A-Za-z0-9][\w /&()'-]{0,40}?)\s*:\s*(.+)$")
+_BUCKET_RE = re.compile(
+    r"^([A-Z]{1,3}):\s*(\d[\d,.]*)\s*[–-]\s*(\d[\d,.]*)\s*(?:AED|TND)?\s*(\(cap\))?", re.IGNORECASE
+)
+_TABLE_BUCKET_RE = re.compile(r"Bucket\s+([A-Z]{1,3})\s*\((\d[\d,.]*)\s*[–-]\s*(\d[\d,.]*)\)")
+_DURATION_RATES_RE = re.compile(r"^(\d+)\s*months?\s+(.*%.*)$", re.IGNORECASE)
+_SUBSECTION_RE = re.compile(r"^\d+\.\d+\s+(.+)$")
+_HEADER_CURRENCY_RE = re.compile(r"[–-]\s*(AED|TND)\s*$")
+
+
+def parse_number(text: str) -> Optional[float]:
+    match = _NUMBER_RE.search(text)
+    return float(match.group(0).replace(",", "")) if match else None
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses."""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(0, depth - 1)
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+def _bullet(line: str) -> Optional[str]:
+    stripped = line.strip()
+    return stripped[1:].strip() if stripped.startswith(("-", "•")) else None
+
+
+def _term_value(text: str):
+    """'5,000 AED total' -> 5000.0, '11% of pack cap' -> 0.11, anything else as text."""
+    percent = _PERCENT_RE.match(text.strip())
+    if percent:
+        return round(float(percent.group(1)) / 100, 6)
+    if re.match(r"^\d", text.strip()):
+        return parse_number(text)
+    return text.strip()
+
+
+def _split_category_row(row: str) -> Tuple[Optional[str], List[str]]:
+    """
+    'Tablets & Computers Tablets, Laptops' -> ('Tablets & Computers', ['Tablets', 'Laptops']).
+    The category is the text before the last capitalized word of the first item.
+    """
+    items = _split_top_level(row)
+    words = items[0].split()
+    starts = [i for i, word in enumerate(words) if i > 0 and word[:1].isupper()]
+    if not starts:
+        return None, items
+    split_at = starts[-1]
+    return " ".join(words[:split_at]), [" ".join(words[split_at:])] + items[1:]
+
+
+# ---------------------------------------------------------------------------
+# SECTION PARSERS
+# ---------------------------------------------------------------------------
+
+def _parse_scope(lines: List[str], record: SpecRecord):
+    for line in lines:
+        match = _KV_RE.match(line)
+        if not match:
+            continue
+        key, value = _slug(match.group(1)), match.group(2).strip()
+        if key == "usage":
+            record.usage = value
+        elif key == "brand_restriction":
+            record.brand_restriction = re.sub(r"\s+only$", "", value, flags=re.IGNORECASE).strip()
+        elif key not in ("risk_profile", "market"):
+            record.terms[key] = _term_value(value)
+
+
+def _parse_eligible(lines: List[str], record: SpecRecord):
+    category = "General"
+    for line in lines:
+        item = _bullet(line)
+        if item is not None:
+            record.eligible_products.setdefault(category, []).append(item.split(" (")[0].strip())
+            continue
+        match = _KV_RE.match(line)
+        if match and _slug(match.group(1)) == "category":
+            category = match.group(2).strip()
+            continue
+        if match or line.endswith(":"):
+            continue                                # e.g. "Included Products:"
+        if line.startswith("Category ") and "Products" in line:
+            continue                                # table header
+        if line[:1].islower() and record.eligible_products:
+            # Wrapped table row: continues the previous category
+            record.eligible_products[category].extend(_split_top_level(line))
+            continue
+        row_category, products = _split_category_row(line)
+        category = row_category or category
+        record.eligible_products.setdefault(category, []).extend(products)
+
+
+def _parse_buckets(lines: List[str], record: SpecRecord):
+    for line in lines:
+        match = _BUCKET_RE.match(line.strip())
+        if match:
+            record.value_buckets.append(ValueBucket(
+                code=match.group(1).upper(),
+                min_value=parse_number(match.group(2)),
+                max_value=parse_number(match.group(3)),
+                is_cap=bool(match.group(4)),
+            ))
+
+
+def _parse_coverage(lines: List[str], title: str, record: SpecRecord):
+    module: Optional[CoverageModule] = None
+    for line in lines:
+        if "|" in line:
+            cells = [c.strip() for c in line.split("|")]
+            if set(cells[0]) <= set("-") or cells[0].lower().startswith("coverage type"):
+                continue
+            record.coverage_modules.append(CoverageModule(
+                name=cells[0], items=[c.strip() for c in _split_top_level(cells[1])] if len(cells) > 1 else []
+            ))
+            continue
+
+        subsection = _SUBSECTION_RE.match(line)
+        if subsection:
+            heading = subsection.group(1).strip()
+            upper = heading.upper()
+            module = CoverageModule(
+                name=re.split(r"\s+[–-]\s+|\s+\(", heading)[0].strip(),
+                core="CORE" in upper,
+                optional="OPTIONAL" in upper,
+            )
+            record.coverage_modules.append(module)
+            continue
+
+        if module is None:
+            # No sub-modules ("3. Covered Events"): the section is one module
+            module = CoverageModule(name=title)
+            record.coverage_modules.append(module)
+        item = _bullet(line)
+        if item is not None:
+            module.items.append(item)
+            continue
+        match = _KV_RE.match(line)
+        if match:
+            module.details[_slug(match.group(1))] = match.group(2).strip()
+
+
+def _parse_pricing(lines: List[str], record: SpecRecord):
+    buckets: List[ValueBucket] = []
+    for line in lines:
+        if line.lower().startswith("example"):
+            break                                   # worked examples, not terms
+        table = _TABLE_BUCKET_RE.findall(line)
+        if table:
+            buckets = [
+                ValueBucket(code=code, min_value=parse_number(low), max_value=parse_number(high))
+                for code, low, high in table
+            ]
+            continue
+        rates = _DURATION_RATES_RE.match(line.strip())
+        if rates and buckets:
+            values = [float(p) / 100 for p in _PERCENT_RE.findall(rates.group(2))]
+            for bucket, rate in zip(buckets, values):
+                bucket.rates[f"{rates.group(1)}m"] = round(rate, 6)
+            continue
+        item = _bullet(line)
+        match = _KV_RE.match(line)
+        if match and not match.group(2).strip().endswith(":"):
+            record.terms[_slug(match.group(1))] = _term_value(match.group(2))
+        elif item is not None:
+            record.conditions.append(item)
+
+    if buckets and not record.value_buckets:
+        # Pricing-table buckets state no cap: the last one stays open
+        record.value_buckets = buckets
+
+
+def _parse_commission(lines: List[str], record: SpecRecord):
+    rates = []
+    for line in lines:
+        if line.lower().startswith("example"):
+            break
+        rates.extend(float(p) / 100 for p in _PERCENT_RE.findall(line))
+    record.commission_rates = sorted({round(r, 6) for r in rates})
+
+
+def _parse_other(lines: List[str], record: SpecRecord):
+    for line in lines:
+        if line.lower().startswith("example"):
+            break
+        match = _KV_RE.match(line)
+        if match:
+            record.terms.setdefault(_slug(match.group(1)), _term_value(match.group(2)))
+
+
+# ---------------------------------------------------------------------------
+# COMPILER
+# ---------------------------------------------------------------------------
+
+def compile_spec(pages: List[Dict]) -> SpecRecord:
+    """One spec (its documents.jsonl pages) -> SpecRecord."""
+    pages = sorted(pages, key=lambda p: p["page"])
+    file_name = pages[0]["file_name"]
+    text = "\n".join(p["text"] for p in pages)
+
+    lines = [(line.strip(), page["page"]) for page in pages for line in page["text"].splitlines() if line.strip()]
+    preamble, sections = split_sections(lines)
+
+    spec_family = infer_spec_family(file_name)
+    market = infer_market(file_name, text)
+    currency = re.search(r"Currency:\s*(AED|TND)", text)
+    header_currency = next((m.group(1) for m in map(_HEADER_CURRENCY_RE.search, preamble) if m), None)
+
+    record = SpecRecord(
+        # Plans without a risk profile line (ASSURMAX) are keyed by their family
+        risk_profile=infer_risk_profile(text) or spec_family or Path(file_name).stem.upper(),
+        spec_family=spec_family,
+        market=market,
+        currency=currency.group(1) if currency else header_currency or MARKET_CURRENCIES.get(market),
+        file_name=file_name,
+        title=" – ".join(preamble[:2]),
+        content_hash=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+    )
+
+    for section in sections:
+        heading = section["lines"][0][0]
+        body = [line for line, _ in section["lines"][1:]]
+        label = section_label(section["title"])
+        if label == "scope":
+            _parse_scope(body, record)
+        elif label == "eligible_products":
+            _parse_eligible(body, record)
+        elif label == "excluded_products":
+            record.excluded_products.extend(item for item in map(_bullet, body) if item)
+        elif label == "value_buckets":
+            _parse_buckets(body, record)
+        elif label == "coverage_modules":
+            _parse_coverage(body, section["title"], record)
+        elif label == "exclusions":
+            record.exclusions.extend(item for item in map(_bullet, body) if item)
+        elif label == "pricing":
+            _parse_pricing(body, record)
+        elif label == "commission":
+            _parse_commission(body, record)
+        elif heading:
+            _parse_other(body, record)
+
+    return record
+
+
+def catalog_version(records: Dict[str, SpecRecord]) -> str:
+    payload = json.dumps({k: asdict(v) for k, v in sorted(records.items())}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def compile_catalog(documents: Iterable[Dict]) -> "SpecCatalog":
+    """documents.jsonl records (pages of every spec) -> SpecCatalog."""
+    by_file: Dict[str, List[Dict]] = {}
+    for doc in documents:
+        by_file.setdefault(doc["file_name"], []).append(doc)
+
+    records: Dict[str, SpecRecord] = {}
+    for file_name, pages in by_file.items():
+        record = compile_spec(pages)
+        if record.risk_profile in records:
+            raise ValueError(
+                f"Risk profile {record.risk_profile} defined twice "
+                f"({records[record.risk_profile].file_name}, {file_name})"
+            )
+        records[record.risk_profile] = record
+
+    return SpecCatalog(
+        records,
+        version=catalog_version(records),
+        compiled_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    )
+
+
+def load_documents(path: Path = None) -> List[Dict]:
+    path = Path(path) if path else Path(os.getenv("KB_DOCUMENTS_FILE", str(DEFAULT_DOCUMENTS_FILE)))
+    with path.open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ---------------------------------------------------------------------------
+# CATALOG
+# ---------------------------------------------------------------------------
+
+class SpecCatalog:
+    """Spec records indexed by risk profile and by (spec family, market)."""
+
+    def __init__(self, records: Dict[str, SpecRecord], version: str, compiled_at: str = ""):
+        self.records = records
+        self.version = version
+        self.compiled_at = compiled_at
+        self._by_family_market: Dict[Tuple[Optional[str], Optional[str]], List[SpecRecord]] = {}
+        for record in records.values():
+            self._by_family_market.setdefault((record.spec_family, record.market), []).append(record)
+            self._by_family_market.setdefault((record.spec_family, None), []).append(record)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, risk_profile: str) -> bool:
+        return risk_profile in self.records
+
+    def get(self, risk_profile: str) -> Optional[SpecRecord]:
+        return self.records.get(risk_profile)
+
+    def find(self, spec_family: str, market: Optional[str] = None) -> List[SpecRecord]:
+        """Records of a spec family (in one market, or all markets when None)."""
+        return list(self._by_family_market.get((spec_family, market), []))
+
+    def to_dict(self) -> Dict:
+        return {
+            "schema_version": SCHEMA_VERSION,
+            "version": self.version,
+            "compiled_at": self.compiled_at,
+            "records": {key: asdict(record) for key, record in sorted(self.records.items())},
+        }
+
+    def save(self, path: Path = None):
+        """Write the artifact atomically."""
+        path = Path(path) if path else get_catalog_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path = None) -> "SpecCatalog":
+        path = Path(path) if path else get_catalog_path()
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("schema_version") != SCHEMA_VERSION:
+            raise ValueError(f"Spec catalog {path} has schema {data.get('schema_version')}, expected {SCHEMA_VERSION}")
+        records = {key: SpecRecord.from_dict(value) for key, value in data["records"].items()}
+        return cls(records, version=data["version"], compiled_at=data.get("compiled_at", ""))
+
+
+def versioned_catalog_path(version: str) -> Path:
+    """Immutable copy of one catalog version, referenced by the KB registry (kb_alias)."""
+    path = get_catalog_path()
+    return path.with_name(f"{path.stem}.{version}{path.suffix}")
+
+
+def load_catalog(version: Optional[str] = None) -> SpecCatalog:
+    """
+    Catalog `version` (as published in the KB registry) when given and
+    available, else the current artifact, else compiled from documents.jsonl.
+    """
+    if version and versioned_catalog_path(version).exists():
+        return SpecCatalog.load(versioned_catalog_path(version))
+    path = get_catalog_path()
+    if path.exists():
+        catalog = SpecCatalog.load(path)
+    else:
+        print(f"⚠️  No spec catalog at {path}, compiling from documents.jsonl")
+        catalog = compile_catalog(load_documents())
+    if version and catalog.version != version:
+        print(f"⚠️  Spec catalog {version} not found, using {catalog.version}")
+    return catalog
+
+
+_catalog: Optional[SpecCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_spec_catalog() -> SpecCatalog:
+    """
+    Shared catalog (loaded once, thread-safe): the version of the live KB
+    release, replaced by the retriever when a new release goes live.
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                from ai_agent.rag.kb_alias import read_alias
+                from ai_agent.rag.vector_store import get_backend_name
+
+                live = read_alias().get(get_backend_name(), {})
+                _catalog = load_catalog(live.get("catalog_version"))
+                print(f"📚 Spec catalog {_catalog.version}: {len(_catalog)} risk profiles")
+    return _catalog
+
+
+def loaded_spec_catalog() -> Optional[SpecCatalog]:
+    """The shared catalog if a caller already loaded it (no loading)."""
+    return _catalog
+
+
+def set_spec_catalog(catalog: SpecCatalog):
+    """Swap the shared catalog (callers holding the previous one keep using it)."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = catalog
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile the spec catalog from documents.jsonl")
+    parser.add_argument("--documents", default=None, help="documents.jsonl (default: KB_DOCUMENTS_FILE)")
+    parser.add_argument("--output", default=None, help="catalog file (default: SPEC_CATALOG_FILE)")
+    parser.add_argument("--show", default=None, help="print one compiled risk profile and exit")
+    args = parser.parse_args()
+
+    catalog = compile_catalog(load_documents(args.documents))
+    if args.show:
+        record = catalog.get(args.show)
+        print(json.dumps(asdict(record), indent=2, ensure_ascii=False) if record else f"Unknown risk profile {args.show}")
+        return
+
+    catalog.save(args.output)
+    print(f"\n{'Risk profile':<28} {'Family':<16} {'Market':<8} {'Cur':<4} {'Prod':>4} {'Buckets':<14} {'Modules':>7}")
+    print("-" * 88)
+    for key, record in sorted(catalog.records.items()):
+        products = sum(len(p) for p in record.eligible_products.values())
+        buckets = "/".join(b.code for b in record.value_buckets) or "-"
+        print(f"{key:<28} {record.spec_family or '-':<16} {record.market or '-':<8} {record.currency or '-':<4} "
+              f"{products:>4} {buckets:<14} {len(record.coverage_modules):>7}")
+    print(f"\n✅ Spec catalog {catalog.version} ({len(catalog)} risk profiles) -> {args.output or get_catalog_path()}")
+
+
+if __name__ == "__main__":
+    main()
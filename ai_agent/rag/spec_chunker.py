@@ -0,0 +1,200 @@
+"""
+Section- and token-aware chunking of spec documents.
+
+Specs are short documents with numbered sections ("1. Scope",
+"2. Eligible Products", "3. Value Buckets (TND)", "4. Coverage Modules",
+"5. General Exclusions", ...). Each section becomes a chunk labelled with a
+canonical section name, prefixed with the spec title so it still embeds in
+context, and split further along line boundaries (word boundaries for an
+over-long line) when it would exceed the embedding model's token window
+(bge: 512 tokens). Every chunk is therefore
+embedded in full, and callers can retrieve only the sections they need.
+"""
+
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Room for [CLS]/[SEP] and tokenizer differences below bge's 512
+MAX_CHUNK_TOKENS = 480
+
+# Heading keyword -> canonical section label (first match wins)
+SECTION_LABELS: List[Tuple[str, str]] = [
+    ("explicitly excluded", "excluded_products"),
+    ("eligible", "eligible_products"),
+    ("value bucket", "value_buckets"),
+    ("coverage module", "coverage_modules"),
+    ("covered event", "coverage_modules"),
+    ("exclusion", "exclusions"),
+    ("commission", "commission"),
+    ("pricing", "pricing"),
+    ("limits", "pricing"),
+    ("scope", "scope"),
+    ("overview", "scope"),
+]
+
+# "1. Scope", "3. Value Buckets (TND)" - top-level only ("3.1 Accidental ..." stays inside)
+_SECTION_RE = re.compile(r"^\s*(\d+)\.\s+([A-Za-z][^\n]{0,80})$")
+_RULE_RE = re.compile(r"^\s*[=\-_]{10,}\s*$")
+
+
+def section_label(heading: str) -> str:
+    lowered = heading.lower()
+    for keyword, label in SECTION_LABELS:
+        if keyword in lowered:
+            return label
+    return re.sub(r"[^a-z0-9]+", "_", lowered).strip("_") or "other"
+
+
+# ---------------------------------------------------------------------------
+# TOKEN COUNTING
+# ---------------------------------------------------------------------------
+
+_tokenizers: Dict[str, Optional[object]] = {}
+_tokenizer_lock = threading.Lock()
+
+
+def get_token_counter(model_name: str) -> Callable[[str], int]:
+    """
+    Token counter of the embedding model's tokenizer. Falls back to a
+    conservative estimate (1 token per 3 characters) without transformers.
+    """
+    with _tokenizer_lock:
+        if model_name not in _tokenizers:
+            try:
+                from transformers import AutoTokenizer
+                _tokenizers[model_name] = AutoTokenizer.from_pretrained(model_name)
+            except Exception as e:
+                print(f"⚠️  Tokenizer for {model_name} unavailable ({e}); estimating tokens")
+                _tokenizers[model_name] = None
+        tokenizer = _tokenizers[model_name]
+
+    if tokenizer is None:
+        return lambda text: (len(text) + 2) // 3
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+
+# ---------------------------------------------------------------------------
+# SECTION SPLITTING
+# ---------------------------------------------------------------------------
+
+def split_sections(lines: List[Tuple[str, float]]) -> Tuple[List[str], List[Dict]]:
+    """
+    Split (line, page) pairs at top-level numbered headings.
+
+    Returns:
+        (preamble lines, sections) - each section is
+        {"number", "title", "lines": [(line, page)]}; decorative rules dropped
+    """
+    preamble: List[str] = []
+    sections: List[Dict] = []
+    for text, page in lines:
+        if _RULE_RE.match(text):
+            continue
+        match = _SECTION_RE.match(text)
+        # A heading number must follow the previous one (ignores numbered list items)
+        expected = int(sections[-1]["number"]) + 1 if sections else 1
+        if match and int(match.group(1)) == expected:
+            sections.append({"number": match.group(1), "title": match.group(2).strip(), "lines": [(text, page)]})
+        elif sections:
+            sections[-1]["lines"].append((text, page))
+        else:
+            preamble.append(text)
+    return preamble, sections
+
+
+def _page_range(pages: List[float]) -> str:
+    return f"{min(pages):g}-{max(pages):g}" if pages else "1"
+
+
+def chunk_spec(
+    pages: List[Dict],
+    count_tokens: Callable[[str], int],
+    max_tokens: int = MAX_CHUNK_TOKENS,
+) -> List[Dict]:
+    """
+    Chunk one spec (its pages, in order) into section chunks.
+
+    Returns:
+        [{"text", "section", "section_title", "section_number", "section_part",
+          "section_parts", "page_range"}] in document order
+    """
+    lines = [(line, page["page"]) for page in pages for line in page["text"].splitlines() if line.strip()]
+    preamble, sections = split_sections(lines)
+
+    title = " – ".join(preamble[:2]) if preamble else pages[0].get("file_name", "")
+    header = f"[{title}]"
+
+    if not sections:
+        sections = [{"number": "0", "title": "Document", "lines": [(line, page) for line, page in lines]}]
+        preamble = []
+
+    chunks: List[Dict] = []
+    for i, section in enumerate(sections):
+        body = list(section["lines"])
+        # The preamble (title, market, currency, intro) goes with the first section
+        if i == 0 and preamble:
+            body = [(line, section["lines"][0][1]) for line in preamble] + body
+
+        label = section_label(section["title"])
+        parts = _split_to_budget(body, header, section["lines"][0][0], count_tokens, max_tokens)
+        for part_index, part in enumerate(parts):
+            chunks.append({
+                "text": header + "\n" + "\n".join(line for line, _ in part),
+                "section": label,
+                "section_title": section["title"],
+                "section_number": section["number"],
+                "section_part": part_index + 1,
+                "section_parts": len(parts),
+                "page_range": _page_range([page for _, page in part]),
+            })
+    return chunks
+
+
+def _split_to_budget(
+    lines: List[Tuple[str, float]],
+    header: str,
+    heading: str,
+    count_tokens: Callable[[str], int],
+    max_tokens: int,
+) -> List[List[Tuple[str, float]]]:
+    """Greedy line packing so header + lines stays within max_tokens per part."""
+    # One token per line break, on top of each line's own tokens
+    budget = max_tokens - count_tokens(header) - 1
+    # A line too long for a part (after the repeated heading) is cut into pieces that fit
+    line_budget = max(1, budget - count_tokens(heading) - 2)
+    lines = [(piece, page) for line, page in lines for piece in _split_line(line, count_tokens, line_budget)]
+    parts: List[List[Tuple[str, float]]] = []
+    current: List[Tuple[str, float]] = []
+    used = 0
+    for line, page in lines:
+        cost = count_tokens(line) + 1
+        if current and used + cost > budget:
+            parts.append(current)
+            current, used = [], 0
+            # Keep the section heading visible on continuation parts
+            if line != heading:
+                current, used = [(heading, page)], count_tokens(heading) + 1
+        current.append((line, page))
+        used += cost
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _split_line(line: str, count_tokens: Callable[[str], int], max_tokens: int) -> List[str]:
+    """Split a line on word boundaries into pieces of at most max_tokens (a single longer word stays whole)."""
+    if count_tokens(line) <= max_tokens:
+        return [line]
+    pieces: List[str] = []
+    current = ""
+    for word in line.split():
+        candidate = f"{current} {word}" if current else word
+        if current and count_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            candidate = word
+        current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
@@ -0,0 +1,94 @@
+"""
+Index-time metadata for spec documents.
+
+Every chunk is tagged with the market, spec family and risk profile of the
+spec it comes from, so retrieval can filter on exact values inside the
+vector query instead of guessing from file names afterwards.
+"""
+
+import re
+from typing import Any, Dict, Optional, Sequence
+
+
+MARKET_UAE = "UAE"
+MARKET_TUNISIA = "Tunisia"
+
+# File-name token -> spec family used by classify_product routing.
+# Checked in order: longer / more specific tokens first.
+FILE_SPEC_FAMILIES = [
+    ("ASSURMAX", "ASSURMAX"),
+    ("TEXTILE_FOOTWEAR", "TEXTILES"),
+    ("OPULENCIA", "LUXURY"),
+    ("BAGS_LUGGAGE", "BAGS_LUGGAGE"),
+    ("LIVING_FURNITURE", "FURNITURE"),
+    ("FURNITURE", "FURNITURE"),
+    ("HOME_APPLIANCES", "HOME_APPLIANCES"),
+    ("MICROMOBILITY", "MICROMOBILITY"),
+    ("HEALTH_WELLNESS", "HEALTH_WELLNESS"),
+    ("OPTICAL_HEARING", "OPTICAL"),
+    ("ELECTRONICS", "ELECTRONICS"),
+    ("PERSONAL_CARE", "PERSONAL_CARE"),
+    ("SOUND_MUSIC", "SOUND_MUSIC"),
+    ("SPORT_OUTDOOR", "SPORT_OUTDOOR"),
+    ("GARDEN_DIY", "GARDEN_DIY"),
+    ("BABY", "BABY"),
+]
+
+_RISK_PROFILE_RE = re.compile(r"Risk profile:\s*([A-Z0-9_]+)")
+_CURRENCY_RE = re.compile(r"Currency:\s*(AED|TND)")
+
+
+def infer_market(file_name: str, text: str = "") -> Optional[str]:
+    """Market of a spec: file name first (_TN / TUNISIA / UAE), then its stated currency."""
+    name = file_name.upper()
+    if "TUNISIA" in name or re.search(r"_TN(_|\.|$)", name):
+        return MARKET_TUNISIA
+    if "UAE" in name:
+        return MARKET_UAE
+
+    match = _CURRENCY_RE.search(text or "")
+    if match:
+        return MARKET_TUNISIA if match.group(1) == "TND" else MARKET_UAE
+    return None
+
+
+def infer_spec_family(file_name: str) -> Optional[str]:
+    name = file_name.upper().replace(" ", "_")
+    for token, family in FILE_SPEC_FAMILIES:
+        if token in name:
+            return family
+    return None
+
+
+def infer_risk_profile(text: str) -> Optional[str]:
+    match = _RISK_PROFILE_RE.search(text or "")
+    return match.group(1) if match else None
+
+
+def spec_metadata(file_name: str, text: str) -> Dict[str, str]:
+    """
+    market / spec_family / risk_profile for one spec document (full text).
+    Unknown values are left out: Pinecone metadata cannot hold nulls.
+    """
+    values = {
+        "market": infer_market(file_name, text),
+        "spec_family": infer_spec_family(file_name),
+        "risk_profile": infer_risk_profile(text),
+    }
+    return {key: value for key, value in values.items() if value}
+
+
+def build_filter(
+    market: Optional[str] = None,
+    spec_family: Optional[str] = None,
+    sections: Optional[Sequence[str]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Metadata filter for the vector query (None when nothing to filter on)."""
+    flt: Dict[str, Any] = {}
+    if market:
+        flt["market"] = market
+    if spec_family:
+        flt["spec_family"] = spec_family
+    if sections:
+        flt["section"] = {"$in": list(sections)}
+    return flt or None
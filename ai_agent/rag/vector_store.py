@@ -0,0 +1,387 @@
+"""
+Pluggable vector stores for spec retrieval.
+
+`VECTOR_STORE_BACKEND` selects the implementation used by the retriever:
+    pinecone (default) - remote Pinecone index (langchain PineconeVectorStore)
+    local              - LocalVectorStore below, built from documents.jsonl
+
+Both expose similarity_search(query, k, filter) and return langchain
+Document objects, so retriever callers do not see which one is in use.
+"""
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import json
+import os
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+DEFAULT_LOCAL_STORE_DIR = Path(__file__).parent / "knowledge_base" / "vector_store"
+
+MATRIX_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.jsonl"
+INFO_FILE = "store.json"
+
+
+def get_backend_name() -> str:
+    return os.getenv("VECTOR_STORE_BACKEND", "pinecone").strip().lower()
+
+
+def get_local_store_dir() -> Path:
+    return Path(os.getenv("LOCAL_VECTOR_STORE_DIR", str(DEFAULT_LOCAL_STORE_DIR)))
+
+
+class VectorStore(ABC):
+    """Minimal interface the retriever needs from a vector store."""
+
+    @abstractmethod
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Document]:
+        ...
+
+    @abstractmethod
+    def similarity_search_by_vector(
+        self,
+        embedding: Sequence[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Document]:
+        ...
+
+
+# ---------------------------------------------------------------------------
+# METADATA FILTERS (Pinecone syntax subset)
+# ---------------------------------------------------------------------------
+# {"market": "UAE"}, {"market": {"$in": ["UAE", "ALL"]}},
+# {"$and": [...]}, {"$or": [...]}, plus $eq / $ne / $nin / $gt / $gte / $lt / $lte
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$eq":
+            ok = value == operand
+        elif op == "$ne":
+            ok = value != operand
+        elif op == "$in":
+            ok = value in operand
+        elif op == "$nin":
+            ok = value not in operand
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            ok = {
+                "$gt": value > operand,
+                "$gte": value >= operand,
+                "$lt": value < operand,
+                "$lte": value <= operand,
+            }[op]
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def match_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """True if `metadata` satisfies a Pinecone-style metadata filter."""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(match_filter(metadata, f) for f in condition):
+                return False
+        elif key == "$or":
+            if not any(match_filter(metadata, f) for f in condition):
+                return False
+        elif not _match_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+# ---------------------------------------------------------------------------
+# LOCAL STORE
+# ---------------------------------------------------------------------------
+
+def load_local_chunks(path: Path) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Chunk texts and metadata of a local store, in matrix row order."""
+    texts: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    with (Path(path) / CHUNKS_FILE).open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                texts.append(row["text"])
+                metadatas.append(row["metadata"])
+    return texts, metadatas
+
+
+def load_local_ids(path: Path) -> List[str]:
+    """Vector ids of a local store, in matrix row order (row numbers for old stores)."""
+    ids: List[str] = []
+    with (Path(path) / CHUNKS_FILE).open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                ids.append(json.loads(line).get("id", str(len(ids))))
+    return ids
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Exact cosine search over an in-process NumPy matrix.
+
+    On disk (one directory):
+        embeddings.npy  float32 (n, dim), rows L2-normalised, memory-mapped on load
+        chunks.jsonl    one {"text", "metadata"} per row, same order
+        store.json      model name, dimension, row count
+
+    The corpus is a few dozen chunks, so a brute-force dot product is both
+    exact and far below a millisecond.
+    """
+
+    def __init__(self, path: Path, embedding=None):
+        self.path = Path(path)
+        self.embedding = embedding
+
+        info_path = self.path / INFO_FILE
+        self.info = json.loads(info_path.read_text(encoding="utf-8")) if info_path.exists() else {}
+
+        self.matrix = np.load(self.path / MATRIX_FILE, mmap_mode="r")
+        self.texts, self.metadatas = load_local_chunks(self.path)
+
+        if len(self.texts) != self.matrix.shape[0]:
+            raise RuntimeError(
+                f"Local vector store at {self.path} is inconsistent: "
+                f"{self.matrix.shape[0]} vectors, {len(self.texts)} chunks"
+            )
+
+        # Filters repeat (one per market / family), so row masks are cached
+        self._masks: Dict[str, np.ndarray] = {}
+        self._masks_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @staticmethod
+    def _embed(texts: List[str], embedding, vectors=None) -> np.ndarray:
+        """Embed `texts` (or take precomputed `vectors`) as L2-normalised float32 rows."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if vectors is None:
+            vectors = embedding.embed_documents(texts)
+        vectors = np.array(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(texts):
+            raise ValueError(f"Unexpected embedding shape {vectors.shape} for {len(texts)} texts")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        return vectors
+
+    @staticmethod
+    def _write(
+        path: Path,
+        ids: List[str],
+        vectors: np.ndarray,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        model_name: str,
+    ):
+        """Write all store files, each via a temp file + rename."""
+        path.mkdir(parents=True, exist_ok=True)
+
+        tmp = path / (MATRIX_FILE + ".tmp")
+        with tmp.open("wb") as f:
+            np.save(f, vectors)
+        os.replace(tmp, path / MATRIX_FILE)
+
+        tmp = path / (CHUNKS_FILE + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for cid, text, metadata in zip(ids, texts, metadatas):
+                f.write(json.dumps({"id": cid, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+        os.replace(tmp, path / CHUNKS_FILE)
+
+        tmp = path / (INFO_FILE + ".tmp")
+        tmp.write_text(json.dumps({
+            "model": model_name,
+            "dimension": int(vectors.shape[1]) if vectors.size else 0,
+            "count": int(vectors.shape[0]),
+        }, indent=2), encoding="utf-8")
+        os.replace(tmp, path / INFO_FILE)
+
+    @classmethod
+    def build(
+        cls,
+        path: Path,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        embedding,
+        model_name: str = "",
+        ids: Optional[List[str]] = None,
+        vectors: Optional[Sequence[Sequence[float]]] = None,
+    ) -> "LocalVectorStore":
+        """
+        Embed `texts` and write a new store to `path` (replacing any previous one).
+        `vectors`, when given, are used instead of embedding the texts here.
+        """
+        path = Path(path)
+        ids = ids or [str(i) for i in range(len(texts))]
+        vectors = cls._embed(texts, embedding, vectors)
+        cls._write(path, ids, vectors, texts, metadatas, model_name)
+        return cls(path, embedding=embedding)
+
+    @classmethod
+    def update(
+        cls,
+        path: Path,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        delete_ids: List[str],
+        embedding,
+        model_name: str = "",
+        vectors: Optional[Sequence[Sequence[float]]] = None,
+    ) -> "LocalVectorStore":
+        """
+        Incremental update: embed only the given (new / changed) chunks
+        (or take their precomputed `vectors`), replace rows with the same id,
+        drop `delete_ids`, keep the rest as is.
+        """
+        path = Path(path)
+        keep_ids: List[str] = []
+        keep_vectors = None
+        keep_texts: List[str] = []
+        keep_metadatas: List[Dict[str, Any]] = []
+
+        if (path / MATRIX_FILE).exists():
+            old_ids = load_local_ids(path)
+            old_texts, old_metadatas = load_local_chunks(path)
+            old_matrix = np.load(path / MATRIX_FILE)
+            replaced = set(ids) | set(delete_ids)
+            rows = [i for i, cid in enumerate(old_ids) if cid not in replaced]
+            keep_ids = [old_ids[i] for i in rows]
+            keep_texts = [old_texts[i] for i in rows]
+            keep_metadatas = [old_metadatas[i] for i in rows]
+            keep_vectors = old_matrix[rows] if rows else None
+
+        new_vectors = cls._embed(texts, embedding, vectors)
+        parts = [v for v in (keep_vectors, new_vectors) if v is not None and v.size]
+        vectors = np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+        cls._write(
+            path,
+            keep_ids + list(ids),
+            vectors,
+            keep_texts + list(texts),
+            keep_metadatas + list(metadatas),
+            model_name,
+        )
+        return cls(path, embedding=embedding)
+
+    def _mask(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if not filter:
+            return None
+        key = json.dumps(filter, sort_keys=True)
+        with self._masks_lock:
+            mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter((match_filter(m, filter) for m in self.metadatas), dtype=bool, count=len(self))
+            with self._masks_lock:
+                self._masks[key] = mask
+        return mask
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Document]:
+        if self.embedding is None:
+            raise RuntimeError("LocalVectorStore needs an embedding model for text queries")
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: Sequence[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[tuple]:
+        if k <= 0 or not len(self):
+            return []
+        q = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+
+        scores = self.matrix @ q
+        mask = self._mask(filter)
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            if not candidates.size:
+                return []
+            scores = scores[candidates]
+        else:
+            candidates = None
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        rows = candidates[top] if candidates is not None else top
+
+        return [
+            (Document(page_content=self.texts[i], metadata=dict(self.metadatas[i])), float(scores[j]))
+            for i, j in zip(rows, top)
+        ]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: Sequence[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)]
+
+    def similarity_search_by_vectors(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Document]]:
+        """Top-k for several query vectors with one matrix product; results in input order."""
+        if not len(embeddings):
+            return []
+        if k <= 0 or not len(self):
+            return [[] for _ in embeddings]
+
+        queries = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+
+        mask = self._mask(filter)
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            if not candidates.size:
+                return [[] for _ in embeddings]
+            scores = self.matrix[candidates] @ queries.T      # (candidates, queries)
+        else:
+            candidates = np.arange(len(self))
+            scores = self.matrix @ queries.T
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]                 # (k, queries)
+        order = np.argsort(-np.take_along_axis(scores, top, axis=0), axis=0, kind="stable")
+        top = np.take_along_axis(top, order, axis=0)
+
+        return [
+            [
+                Document(page_content=self.texts[i], metadata=dict(self.metadatas[i]))
+                for i in candidates[top[:, col]]
+            ]
+            for col in range(queries.shape[0])
+        ]
@@ -1,9 +1,9 @@
 from langchain_core.tools import tool
 from typing import Union, List, Dict
 from langchain_core.documents import Document
-from langchain_openai import ChatOpenAI
 import os
 import json
+import threading
 import dotenv
 
 import sys
@@ -13,12 +13,24 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 dotenv.load_dotenv()
 
+_llm = None
+_llm_lock = threading.Lock()
+
+
 def _get_llm():
-    return ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0,
-        openai_api_key=os.getenv("OPENAI_API_KEY"),
-    )
+    """Shared classifier LLM client, created on first use (thread-safe)."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from langchain_openai import ChatOpenAI
+
+                _llm = ChatOpenAI(
+                    model="gpt-4o-mini",
+                    temperature=0,
+                    openai_api_key=os.getenv("OPENAI_API_KEY"),
+                )
+    return _llm
 
 
 # ---------------------------------------------------------------------------
@@ -164,6 +176,113 @@ def route_to_spec_family(insurance_object: str) -> str | None:
     return None
 
 
+# ---------------------------------------------------------------------------
+# FAMILY-SCOPED RETRIEVAL MEMO
+# ---------------------------------------------------------------------------
+# The retrieval query depends only on (spec_family, market), so every product
+# of a family hits the vector store with the same query. Results are memoized
+# per pair; empty / failed lookups are not cached so they get retried.
+
+MARKETS = ("UAE", "Tunisia")
+
+# Spec sections the eligibility prompt needs (commission / pricing are left out)
+CLASSIFY_SECTIONS = (
+    "scope", "eligible_products", "excluded_products",
+    "value_buckets", "coverage_modules", "exclusions",
+)
+# Upper bound on section chunks per spec, to size the chunk-level k
+CHUNKS_PER_SPEC = 8
+
+_spec_memo: Dict[tuple, List[Document]] = {}
+_spec_memo_lock = threading.Lock()
+
+
+def retrieve_family_specs(spec_family: str, market: str, k: int = 3) -> List[Document]:
+    """
+    Retrieve the spec documents for one spec family in one market (memoized).
+    Only the CLASSIFY_SECTIONS chunks are fetched, then merged back into one
+    Document per spec file.
+
+    Args:
+        spec_family: Spec family (ELECTRONICS, TEXTILES, ...)
+        market: "UAE" or "Tunisia"
+        k: Number of spec documents to return
+
+    Returns:
+        List of Document objects
+    """
+    from ai_agent.rag.retriever import retrieve_specs_raw, merge_chunks_by_file
+
+    # Keyed by the live KB release: a switch never serves old specs
+    key = (_memo_version(), spec_family, market, k)
+    with _spec_memo_lock:
+        docs = _spec_memo.get(key)
+    if docs is not None:
+        return list(docs)
+
+    chunks = retrieve_specs_raw(
+        _family_query(spec_family, market),
+        k=k * CHUNKS_PER_SPEC,
+        market=market,
+        spec_family=spec_family,
+        sections=CLASSIFY_SECTIONS,
+    )
+    docs = merge_chunks_by_file(chunks)[:k]
+    if docs:
+        with _spec_memo_lock:
+            _spec_memo[key] = docs
+    return list(docs)
+
+
+def _memo_version():
+    from ai_agent.rag.retriever import add_kb_switch_listener, get_kb_version
+
+    add_kb_switch_listener(_rewarm_spec_memo)
+    return get_kb_version()
+
+
+def _family_query(spec_family: str, market: str) -> str:
+    # Query targets the spec family, not the product
+    return f"{spec_family} {market} insurance specification eligible products"
+
+
+def warm_spec_memo(k: int = 3) -> Dict[str, int]:
+    """
+    Fill the retrieval memo for every spec family × market with one batched
+    retrieval. Returns doc counts.
+    """
+    from ai_agent.rag.retriever import retrieve_specs_raw_many, merge_chunks_by_file
+
+    version = _memo_version()
+    pairs = [(family, market) for family in SPEC_INTERPRETATION_MODE for market in MARKETS]
+    results = retrieve_specs_raw_many(
+        [_family_query(family, market) for family, market in pairs],
+        k=k * CHUNKS_PER_SPEC,
+        market=[market for _, market in pairs],
+        spec_family=[family for family, _ in pairs],
+        sections=CLASSIFY_SECTIONS,
+    )
+
+    counts = {}
+    with _spec_memo_lock:
+        for (family, market), chunks in zip(pairs, results):
+            docs = merge_chunks_by_file(chunks)[:k]
+            if docs:
+                _spec_memo[(version, family, market, k)] = docs
+            counts[f"{family}/{market}"] = len(docs)
+    return counts
+
+
+def _rewarm_spec_memo() -> None:
+    """KB switch listener: drop the previous release's entries and warm the new one (for each k in use)."""
+    with _spec_memo_lock:
+        ks = {key[3] for key in _spec_memo}
+        _spec_memo.clear()
+    for k in ks:
+        counts = warm_spec_memo(k=k)
+        print(f"🔥 Spec memo re-warmed: {sum(1 for n in counts.values() if n)} family/market pairs (k={k})")
+
+
 def infer_insurance_object_with_llm(product_name: str, description: str, brand: str) -> str:
     """
     Normalize the product to its INSURANCE OBJECT — what it actually IS 
@@ -501,8 +620,6 @@ def classify_product(
     print(f"{'='*70}\n")
 
     # --------------- RAG retrieval — FAMILY-SCOPED ---------------
-    from ai_agent.rag.retriever import retrieve_specs_raw
-
     # Route to spec family
     spec_family = route_to_spec_family(category)
     
@@ -534,14 +651,10 @@ def classify_product(
     print(f"   Spec Family       : {spec_family}")
     print(f"   Interpretation    : {interpretation_mode}")
     
-    # Query targets the spec family, not the product
-    query = f"{spec_family} {market} insurance specification eligible products"
-
     print(f"🔎 Retrieving {spec_family} specs for {market}...")
-    print(f"   Query: {query}")
 
     try:
-        docs = retrieve_specs_raw(query, k=3, market=market)
+        docs = retrieve_family_specs(spec_family, market)
         print(f"   Retrieved {len(docs)} documents")
     except Exception as e:
         print(f"   ❌ Retrieval failed: {e}")
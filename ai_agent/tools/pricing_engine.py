@@ -0,0 +1,464 @@
+"""
+Vectorized pricing engine.
+
+price_batch() prices arrays of (risk_profile, product_value, market) in one
+pass with NumPy - STANDARD 12m / 24m / monthly and ASSURMAX for every row -
+and returns columns. pricing_result() turns one row into the dict
+calculate_pricing returns; the tool is a thin wrapper around it.
+
+Value buckets and caps come from the spec catalog (BucketTable): each row
+gets its bucket by binary search, and products above the cap their spec
+marks "(cap)" are rejected before any premium is computed. Premiums stay
+the linear CATEGORY_RATE_MATRIX rates.
+
+Amounts are rounded like Python's round(x, 2): NumPy rounding on x * 100,
+with the rare rows that sit on a rounding tie redone by round() itself.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+ASSURMAX_CONFIG = {
+    "UAE": {
+        "pack_cap": 5000,
+        "currency": "AED",
+        "premium": 550.0,
+        "max_products": 3,
+    }
+}
+
+CATEGORY_RATE_MATRIX = {
+    "BABY_EQUIPMENT_ESSENTIAL": (0.055, 1.25),
+    "BAGS_LUGGAGE_ESSENTIAL": (0.065, 1.25),
+    "APPLE_PRODUCTS": (0.11, 1.35),
+    "ELECTRONIC_PRODUCTS": (0.05, 1.25),
+    "HOME_APPLIANCES": (0.04, 1.2),
+    "LIVING_FURNITURE_ESSENTIAL": (0.05, 1.2),
+    "MICRO_MOBILITY_ESSENTIAL": (0.08, 1.25),
+    "OPTICAL_HEARING_ESSENTIAL": (0.05, 1.2),
+    "PERSONAL_CARE_DEVICES": (0.05, 1.24),
+    "OPULENCIA_PREMIUM": (0.065, 1.25),
+    "SOUND_MUSIC_ESSENTIAL": (0.05, 1.2),
+    "SPORT_OUTDOOR_ESSENTIAL": (0.04, 1.2),
+    "TEXTILE_FOOTWEAR_ZARA": (0.03, 1.2),
+    "ELECTRONIC_PRODUCTS_TN": (0.05, 1.25),
+    "BABY_EQUIPMENT_TN": (0.055, 1.25),
+    "HOME_APPLIANCES_TN": (0.04, 1.2),
+    "GARDEN_DIY_TN": (0.05, 1.25),
+    "HEALTH_WELLNESS_TN": (0.06, 1.25),
+    "FURNITURE_TN": (0.05, 1.2),
+    "SPORT_OUTDOOR_TN": (0.04, 1.2),
+}
+
+MONTHLY_LOADING = 1.05
+
+_PROFILES = list(CATEGORY_RATE_MATRIX)
+_PROFILE_INDEX = {profile: i for i, profile in enumerate(_PROFILES)}
+_RATE_12M = np.array([CATEGORY_RATE_MATRIX[p][0] for p in _PROFILES] + [np.nan])
+_FACTOR_24M = np.array([CATEGORY_RATE_MATRIX[p][1] for p in _PROFILES] + [np.nan])
+_UNKNOWN = len(_PROFILES)
+
+
+# ---------------------------------------------------------------------------
+# VALUE BUCKETS
+# ---------------------------------------------------------------------------
+
+class BucketTable:
+    """
+    Value buckets of every rate-matrix profile as sorted arrays, built once
+    per spec catalog version. Bucket i covers (upper[i-1], upper[i]]: the
+    bucket of a value is bisect_left(upper, value). The cap is the upper
+    bound of the bucket the spec marks "(cap)"; without one the last bucket
+    is open and values above it still fall in it. Bounds are in the spec's
+    currency: they only apply to products priced in that currency (a TN
+    profile returned for a UAE product is neither bucketed nor capped).
+
+    Args:
+        catalog: SpecCatalog (None: no buckets, linear pricing, no caps)
+    """
+
+    def __init__(self, catalog=None):
+        self.version = catalog.version if catalog is not None else None
+        slots = len(_PROFILES) + 1                  # + the unknown-profile slot
+        self.upper: List[List[float]] = [[] for _ in range(slots)]
+        self.codes: List[List[str]] = [[] for _ in range(slots)]
+        self.floor = np.full(slots, -np.inf)
+        self.cap = np.full(slots, np.inf)
+        self.currency = np.full(slots, None, dtype=object)
+
+        for i, profile in enumerate(_PROFILES):
+            record = catalog.get(profile) if catalog is not None else None
+            if record is None or not record.value_buckets:
+                continue
+            buckets = sorted(record.value_buckets, key=lambda b: b.max_value)
+            self.upper[i] = [b.max_value for b in buckets]
+            self.codes[i] = [b.code for b in buckets]
+            self.floor[i] = buckets[0].min_value
+            self.currency[i] = record.currency
+            caps = [b.max_value for b in buckets if b.is_cap]
+            if caps:
+                self.cap[i] = max(caps)
+
+        self._upper_arrays = [np.asarray(u, dtype=np.float64) for u in self.upper]
+
+    def has_buckets(self, risk_profile: str) -> bool:
+        return bool(self.upper[_PROFILE_INDEX.get(risk_profile, _UNKNOWN)])
+
+    def applies(self, risk_profile: str, currency: Optional[str]) -> bool:
+        """Whether the profile's buckets and cap apply to a product priced in `currency` (None: any)."""
+        spec_currency = self.currency[_PROFILE_INDEX.get(risk_profile, _UNKNOWN)]
+        return spec_currency is not None and (currency is None or currency == spec_currency)
+
+    def cap_for(self, risk_profile: str, currency: Optional[str] = None) -> Optional[float]:
+        cap = self.cap[_PROFILE_INDEX.get(risk_profile, _UNKNOWN)]
+        if not np.isfinite(cap) or not self.applies(risk_profile, currency):
+            return None
+        return float(cap)
+
+    def bucket_for(self, risk_profile: str, value: float, currency: Optional[str] = None) -> Optional[str]:
+        """Bucket code of one product, None below the first bucket, over the cap, without buckets or in another currency."""
+        i = _PROFILE_INDEX.get(risk_profile, _UNKNOWN)
+        upper = self.upper[i]
+        if not upper or not self.applies(risk_profile, currency) or value < self.floor[i] or value > self.cap[i]:
+            return None
+        return self.codes[i][min(bisect_left(upper, value), len(upper) - 1)]
+
+    def assign(self, profile_idx: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Bucket code (or None) of every row: one searchsorted per profile present in the batch."""
+        codes = np.full(len(values), None, dtype=object)
+        for i in np.unique(profile_idx):
+            upper = self._upper_arrays[i]
+            if not len(upper):
+                continue
+            rows = np.flatnonzero(profile_idx == i)
+            # Past the last bound: over the cap, or still the last bucket when it is open
+            j = np.minimum(np.searchsorted(upper, values[rows], side="left"), len(upper) - 1)
+            with np.errstate(invalid="ignore"):
+                inside = ~(values[rows] < self.floor[i]) & ~(values[rows] > self.cap[i]) & ~np.isnan(values[rows])
+            codes[rows[inside]] = np.array(self.codes[i], dtype=object)[j[inside]]
+        return codes
+
+
+_bucket_table: Optional[BucketTable] = None
+_bucket_lock = threading.Lock()
+
+
+def get_bucket_table() -> BucketTable:
+    """
+    Shared BucketTable of the live spec catalog, rebuilt when the catalog
+    is swapped for a new KB release.
+    """
+    global _bucket_table
+    try:
+        from ai_agent.rag.spec_catalog import get_spec_catalog
+        catalog = get_spec_catalog()
+    except (OSError, ValueError) as e:
+        catalog = None
+        if _bucket_table is None:
+            print(f"⚠️  Spec catalog unavailable ({e}): pricing without value buckets or caps")
+
+    version = catalog.version if catalog is not None else None
+    table = _bucket_table
+    if table is None or table.version != version:
+        with _bucket_lock:
+            if _bucket_table is None or _bucket_table.version != version:
+                _bucket_table = BucketTable(catalog)
+            table = _bucket_table
+    return table
+
+
+def round2(values: np.ndarray) -> np.ndarray:
+    """Element-wise round(x, 2), identical to Python's for every float."""
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * 100
+    rounded = np.round(scaled) / 100
+    # Away from a .5 tie, rint(x * 100) / 100 is the double round() returns
+    with np.errstate(invalid="ignore"):
+        tie = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6
+    if tie.any():
+        rounded[tie] = [round(float(v), 2) for v in values[tie]]
+    return rounded
+
+
+def _parse_value(value) -> float:
+    try:
+        return float(value) if value else 0.0
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _parse_values(values: Sequence) -> np.ndarray:
+    array = np.asarray(values)
+    if array.dtype.kind in "fiub":
+        return array.astype(np.float64)
+    # Strings / None / mixed: the scalar rules, element by element
+    return np.array([_parse_value(v) for v in array.tolist()], dtype=np.float64)
+
+
+def _factorize(items) -> Tuple[List, np.ndarray]:
+    """(distinct items in first-seen order, index of each item among them)."""
+    codes: Dict = {}
+    inverse = np.fromiter((codes.setdefault(item, len(codes)) for item in items), dtype=np.int64)
+    return list(codes), inverse
+
+
+def standard_currency(market: str) -> str:
+    return "TND" if "tunisia" in market.lower() or "tn" in market.lower() else "AED"
+
+
+def price_batch(
+    risk_profiles: Sequence[str],
+    product_values: Sequence[Union[float, int, str]],
+    markets: Union[str, Sequence[str]] = "UAE",
+    buckets: Optional[BucketTable] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Price every row under STANDARD and ASSURMAX at once.
+
+    Args:
+        risk_profiles: risk profile per row ("" / unknown -> no STANDARD price)
+        product_values: product price per row (numbers or numeric strings)
+        markets: one market for all rows, or one per row
+        buckets: value buckets to use (default: the live spec catalog's)
+
+    Returns:
+        Columns (arrays of len(rows)):
+            risk_profile, market (upper-cased), product_value, valid_value,
+            profile_known, has_buckets, value_cap (inf without cap),
+            over_cap, value_bucket, currency, rate_12m, duration_factor_24m,
+            standard_12m, standard_24m, standard_monthly,
+            assurmax_market (UAE), assurmax_eligible (within the pack cap),
+            assurmax_annual, assurmax_24m, assurmax_monthly
+        Premiums are NaN where the row has no such price.
+    """
+    values = _parse_values(product_values)
+    n = len(values)
+    if isinstance(markets, str):
+        markets = [markets] * n
+    if len(risk_profiles) != n or len(markets) != n:
+        raise ValueError(f"Expected {n} risk profiles and markets, got {len(risk_profiles)} and {len(markets)}")
+
+    # Few distinct markets / profiles: resolve each once, then broadcast
+    unique_markets, market_idx = _factorize(markets)
+    market_upper = np.array([m.upper() for m in unique_markets] + [""], dtype=object)[market_idx]
+    currency = np.array([standard_currency(m) for m in unique_markets] + [""], dtype=object)[market_idx]
+    is_uae = np.array([m.upper() == "UAE" for m in unique_markets] + [False], dtype=bool)[market_idx]
+
+    unique_profiles, profile_inverse = _factorize(risk_profiles)
+    profiles = np.array(unique_profiles + [""], dtype=object)[profile_inverse]
+    profile_idx = np.array([_PROFILE_INDEX.get(p, _UNKNOWN) for p in unique_profiles] + [_UNKNOWN])[profile_inverse]
+    profile_known = profile_idx != _UNKNOWN
+    with np.errstate(invalid="ignore"):
+        valid_value = ~(values <= 0)                # NaN passes, as in the scalar check
+
+    # Over the cap: rejected, no premium. Buckets and caps are in the spec's
+    # currency, so rows priced in another one get neither.
+    table = buckets if buckets is not None else get_bucket_table()
+    in_spec_currency = table.currency[profile_idx] == currency
+    value_cap = np.where(in_spec_currency, table.cap[profile_idx], np.inf)
+    with np.errstate(invalid="ignore"):
+        over_cap = values > value_cap
+    value_bucket = table.assign(profile_idx, np.where(in_spec_currency, values, np.nan))
+    has_buckets = np.array([bool(u) for u in table.upper])[profile_idx] & in_spec_currency
+
+    rate_12m = _RATE_12M[profile_idx]
+    factor_24m = _FACTOR_24M[profile_idx]
+    standard_ok = valid_value & profile_known & ~over_cap
+    standard_12m = np.where(standard_ok, round2(values * rate_12m), np.nan)
+    standard_24m = np.where(standard_ok, round2(standard_12m * factor_24m), np.nan)
+    standard_monthly = np.where(standard_ok, round2(standard_12m * MONTHLY_LOADING / 12), np.nan)
+
+    config = ASSURMAX_CONFIG["UAE"]
+    with np.errstate(invalid="ignore"):
+        assurmax_eligible = valid_value & is_uae & ~(values > config["pack_cap"])
+    flat = float(config["premium"])
+    assurmax_monthly = round(flat * MONTHLY_LOADING / 12, 2)
+
+    return {
+        "risk_profile": profiles,
+        "market": market_upper,
+        "product_value": values,
+        "valid_value": valid_value,
+        "profile_known": profile_known,
+        "has_buckets": has_buckets,
+        "value_cap": value_cap,
+        "over_cap": over_cap,
+        "value_bucket": value_bucket,
+        "currency": currency,
+        "rate_12m": rate_12m,
+        "duration_factor_24m": factor_24m,
+        "standard_12m": standard_12m,
+        "standard_24m": standard_24m,
+        "standard_monthly": standard_monthly,
+        "assurmax_market": is_uae,
+        "assurmax_eligible": assurmax_eligible,
+        "assurmax_annual": np.where(assurmax_eligible, flat, np.nan),
+        "assurmax_24m": np.where(assurmax_eligible, flat * 2, np.nan),
+        "assurmax_monthly": np.where(assurmax_eligible, assurmax_monthly, np.nan),
+    }
+
+
+def pricing_result(batch: Dict[str, np.ndarray], i: int, plan: str = "STANDARD") -> Dict:
+    """Row `i` of a price_batch() result as the calculate_pricing dict for `plan`."""
+    value = float(batch["product_value"][i])
+    if not batch["valid_value"][i]:
+        return {"error": "Invalid product value"}
+
+    plan_upper = plan.upper()
+    market_upper = batch["market"][i]
+
+    if plan_upper == "ASSURMAX":
+        if not batch["assurmax_market"][i]:
+            return {
+                "error": "ASSURMAX is only available for UAE market",
+                "market": market_upper,
+            }
+
+        config = ASSURMAX_CONFIG["UAE"]
+        pack_cap, currency = config["pack_cap"], config["currency"]
+        if not batch["assurmax_eligible"][i]:
+            return {
+                "error": f"Product value ({value} {currency}) exceeds ASSURMAX pack cap ({pack_cap} {currency})",
+                "plan": "ASSURMAX",
+                "pack_cap": pack_cap,
+                "currency": currency,
+                "eligible": False,
+                "reason": f"Product price must be ≤ {pack_cap} {currency} for ASSURMAX",
+            }
+
+        return {
+            "plan": "ASSURMAX",
+            "market": market_upper,
+            "monthly": {
+                "monthly_premium": float(batch["assurmax_monthly"][i]),
+                "currency": currency,
+            },
+            "12_months": {
+                "annual_premium": float(batch["assurmax_annual"][i]),
+                "currency": currency,
+            },
+            "24_months": {
+                "total_premium": float(batch["assurmax_24m"][i]),
+                "currency": currency,
+            },
+            "assurmax_pack_cap": {
+                "pack_cap": pack_cap,
+                "currency": currency,
+                "max_products_covered": config["max_products"],
+            },
+            "product_value": value,
+            "flat_premium": True,
+        }
+
+    elif plan_upper == "STANDARD":
+        risk_profile = batch["risk_profile"][i]
+        if not risk_profile:
+            return {"error": "risk_profile is required for STANDARD pricing"}
+
+        if not batch["profile_known"][i]:
+            return {
+                "error": f"Risk profile '{risk_profile}' not found in rate matrix",
+                "valid_profiles": list(CATEGORY_RATE_MATRIX.keys()),
+                "risk_profile": risk_profile,
+            }
+
+        rate_12m, duration_factor_24m = CATEGORY_RATE_MATRIX[risk_profile]
+        currency = batch["currency"][i]
+        value_cap = float(batch["value_cap"][i])
+        if batch["over_cap"][i]:
+            return _over_cap_result(risk_profile, value, value_cap, currency)
+
+        result = {
+            "plan": "STANDARD",
+            "market": market_upper,
+            "monthly": {
+                "monthly_premium": float(batch["standard_monthly"][i]),
+                "currency": currency,
+            },
+            "12_months": {
+                "annual_premium": float(batch["standard_12m"][i]),
+                "currency": currency,
+            },
+            "24_months": {
+                "total_premium": float(batch["standard_24m"][i]),
+                "currency": currency,
+            },
+            "product_value": value,
+            "risk_profile": risk_profile,
+            "rate_12m_percent": round(rate_12m * 100, 2),
+            "duration_factor_24m": duration_factor_24m,
+        }
+        # Profiles without spec buckets keep the historical result exactly
+        if batch["has_buckets"][i]:
+            result["value_bucket"] = batch["value_bucket"][i]
+            result["value_cap"] = value_cap if np.isfinite(value_cap) else None
+        return result
+
+    else:
+        return {
+            "error": f"Invalid plan: {plan}. Valid options: ASSURMAX, STANDARD",
+            "valid_plans": {
+                "UAE": ["ASSURMAX", "STANDARD"],
+                "Tunisia": ["STANDARD"],
+            },
+        }
+
+
+def _over_cap_result(risk_profile: str, value: float, value_cap: float, currency: str) -> Dict:
+    return {
+        "error": f"Product value ({value} {currency}) exceeds the {risk_profile} cap ({value_cap} {currency})",
+        "plan": "STANDARD",
+        "risk_profile": risk_profile,
+        "value_cap": value_cap,
+        "currency": currency,
+        "eligible": False,
+        "over_cap": True,
+        "reason": f"Product price must be ≤ {value_cap} {currency} for {risk_profile}",
+    }
+
+
+def check_value_cap(risk_profile: str, product_value: Union[float, int, str], market: str = "UAE") -> Optional[Dict]:
+    """
+    The over-cap rejection of one product, None when it is within its
+    profile's cap (or the profile has none). Callers check this before
+    pricing so over-cap products cost no pricing call and no package write.
+    """
+    value = _parse_value(product_value)
+    currency = standard_currency(market)
+    value_cap = get_bucket_table().cap_for(risk_profile or "", currency)
+    if value_cap is None or not value > value_cap:
+        return None
+    return _over_cap_result(risk_profile, value, value_cap, currency)
+
+
+def value_bucket(risk_profile: str, product_value: Union[float, int, str], market: Optional[str] = None) -> Optional[str]:
+    """Bucket code of one product (None without buckets, below the first, over the cap or in another market's currency)."""
+    currency = standard_currency(market) if market else None
+    return get_bucket_table().bucket_for(risk_profile or "", _parse_value(product_value), currency)
+
+
+def price(
+    risk_profile: str = "",
+    product_value: Union[float, int, str] = 0,
+    market: str = "UAE",
+    plan: str = "STANDARD",
+) -> Dict:
+    """One product, one plan: the calculate_pricing result without the tool wrapper."""
+    batch = price_batch([risk_profile or ""], [_parse_value(product_value)], [market])
+    return pricing_result(batch, 0, plan)
+
+
+def price_plans(risk_profile: str, product_value: Union[float, int, str], market: str,
+                plans: Sequence[str] = ("STANDARD", "ASSURMAX")) -> Dict[str, Dict]:
+    """Several plans of one product from a single batch row."""
+    batch = price_batch([risk_profile or ""], [_parse_value(product_value)], [market])
+    return {plan: pricing_result(batch, 0, plan) for plan in plans}
+
+
+def pricing_results(batch: Dict[str, np.ndarray], plan: str = "STANDARD") -> List[Dict]:
+    """Every row of a batch as calculate_pricing dicts."""
+    return [pricing_result(batch, i, plan) for i in range(len(batch["product_value"]))]
@@ -1,5 +1,6 @@
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dataclasses import asdict
@@ -8,6 +9,7 @@ import time
 
 from backend.jobs import job_registry, JobStatus
 from backend.worker import pipeline_worker
+from backend.warmup import warmup_manager
 
 
 class CreateJobRequest(BaseModel):
@@ -25,19 +27,52 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def start_warmup():
+    # Models, clients and the DB pool load in the background; the server
+    # accepts requests right away and jobs queue until warm-up is over
+    warmup_manager.start()
+
+    # New knowledge-base releases (kb_alias registry) go live without a restart
+    from ai_agent.rag.retriever import start_kb_watcher
+    start_kb_watcher()
+
+
 @app.get("/")
 def root():
     return {"service": "pipeline-orchestrator", "status": "running"}
 
 
+@app.get("/ready")
+def ready():
+    from ai_agent.rag.retriever import kb_status, query_cache_stats
+
+    status = warmup_manager.status()
+    status["query_embedding_cache"] = query_cache_stats()
+    status["knowledge_base"] = kb_status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
 @app.post("/jobs")
 def create_job(req: CreateJobRequest):
     if not req.start_url.startswith(("http://", "https://")):
         raise HTTPException(400, "Invalid URL")
 
     job_id = job_registry.create_job(req.start_url, req.selected_categories)
-    pipeline_worker.start_job(job_id, req.start_url, req.selected_categories)
-    return {"job_id": job_id, "status": "started"}
+
+    def start():
+        if job_registry.should_stop(job_id):
+            job_registry.update_job(
+                job_id,
+                status=JobStatus.STOPPED,
+                completed_at=time.time(),
+                error="Stopped by user",
+            )
+            return
+        pipeline_worker.start_job(job_id, req.start_url, req.selected_categories)
+
+    started = warmup_manager.run_when_ready(start)
+    return {"job_id": job_id, "status": "started" if started else "queued"}
 
 
 @app.get("/jobs")
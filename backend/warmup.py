@@ -0,0 +1,179 @@
+
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from enum import Enum
+
+
+class ComponentState(str, Enum):
+    PENDING = "pending"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+
+# ---------------------------------------------------------------------------
+# WARM-UP STEPS (run in order: later steps reuse what earlier ones loaded)
+# ---------------------------------------------------------------------------
+
+def _warm_embeddings():
+    from ai_agent.rag.retriever import get_embeddings
+    # Load the weights and run one forward pass so the first real query
+    # does not pay for lazy kernel / tokenizer initialisation
+    get_embeddings().embed_query("warm-up")
+
+
+def _warm_vectorstore():
+    from ai_agent.rag.retriever import get_vectorstore
+    get_vectorstore()
+
+
+def _warm_llm():
+    from ai_agent.tools.classify_product import _get_llm
+    _get_llm()
+
+
+def _warm_retrieval_memo():
+    from ai_agent.tools.classify_product import warm_spec_memo
+    counts = warm_spec_memo()
+    empty = [key for key, n in counts.items() if n == 0]
+    if empty:
+        print(f"⚠️  Warm-up: no spec docs for {', '.join(empty)}")
+
+
+def _warm_db_pool():
+    from sqlalchemy import text
+    from database.models import get_engine
+
+    engine = get_engine()
+    # Check out pool_size connections at once so the pool opens them all,
+    # then hand them back: the first job finds them already established
+    connections = []
+    try:
+        for _ in range(engine.pool.size()):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            connections.append(conn)
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+WARMUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("embeddings", _warm_embeddings),
+    ("vectorstore", _warm_vectorstore),
+    ("llm", _warm_llm),
+    ("retrieval_memo", _warm_retrieval_memo),
+    ("db_pool", _warm_db_pool),
+]
+
+
+class WarmupManager:
+    """
+    Loads models / clients / pools in a background thread at startup.
+
+    Work submitted with run_when_ready() is held until warm-up has finished
+    (whether every component succeeded or not: a failed component is simply
+    created lazily by the first job, as before).
+    """
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], None]]] = WARMUP_STEPS):
+        self._steps = steps
+        self._components: Dict[str, Dict[str, Any]] = {
+            name: {"state": ComponentState.PENDING, "seconds": None, "error": None}
+            for name, _ in steps
+        }
+        self._done = threading.Event()
+        self._queue: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="warmup")
+        self._thread.start()
+
+    def _run(self):
+        print("🔥 Warm-up started")
+        try:
+            for name, step in self._steps:
+                self._set(name, state=ComponentState.WARMING)
+                t0 = time.time()
+                try:
+                    step()
+                    self._set(name, state=ComponentState.READY, seconds=round(time.time() - t0, 2))
+                    print(f"   ✅ {name} ready ({time.time() - t0:.2f}s)")
+                except Exception as e:
+                    self._set(
+                        name,
+                        state=ComponentState.FAILED,
+                        seconds=round(time.time() - t0, 2),
+                        error=f"{type(e).__name__}: {e}",
+                    )
+                    print(f"   ❌ {name} failed: {e}")
+                    traceback.print_exc()
+        finally:
+            self.finished_at = time.time()
+            with self._lock:
+                self._done.set()
+                queued, self._queue = self._queue, []
+            print(f"🔥 Warm-up finished in {self.finished_at - self.started_at:.2f}s")
+            for fn in queued:
+                self._call(fn)
+
+    def _set(self, name: str, **updates):
+        with self._lock:
+            self._components[name].update(updates)
+
+    @staticmethod
+    def _call(fn: Callable[[], None]):
+        try:
+            fn()
+        except Exception:
+            traceback.print_exc()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def run_when_ready(self, fn: Callable[[], None]) -> bool:
+        """
+        Run fn now if warm-up is over, otherwise queue it until it is.
+        Returns True if fn ran immediately.
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._queue.append(fn)
+                return False
+        self._call(fn)
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            components = {
+                name: {**info, "state": info["state"].value}
+                for name, info in self._components.items()
+            }
+            queued = len(self._queue)
+        return {
+            "ready": self._done.is_set() and all(
+                c["state"] == ComponentState.READY.value for c in components.values()
+            ),
+            "warmup_done": self._done.is_set(),
+            "components": components,
+            "queued_jobs": queued,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+warmup_manager = WarmupManager()
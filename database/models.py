@@ -2,6 +2,7 @@
 
 import os
 import uuid
+import threading
 from datetime import datetime
 from sqlalchemy import Column, String, Text, Numeric, Boolean, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
@@ -143,25 +144,64 @@ class InsurancePackage(Base):
 # ============================================================
 # DATABASE CONNECTION SETUP
 # ============================================================
+# The engine is created (and tables checked) on first use rather than at
+# import, so importing models/CRUD code never blocks on the database.
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL not set in .env file")
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Create the pooled engine and ensure tables exist (once, thread-safe)."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                database_url = os.getenv("DATABASE_URL")
+                if not database_url:
+                    raise RuntimeError("DATABASE_URL not set in .env file")
+
+                # Create engine with connection pooling
+                engine = create_engine(
+                    database_url,
+                    pool_size=10,           # Number of persistent connections
+                    max_overflow=20,        # Additional connections when pool is full
+                    pool_pre_ping=True,     # Test connections before using
+                    echo=False              # Set to True for SQL query logging
+                )
+
+                # Create all tables (if they don't exist)
+                Base.metadata.create_all(bind=engine)
+
+                _session_factory.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+
+class _LazySessionLocal:
+    """
+    Drop-in for the sessionmaker: calling it builds the engine on first use.
+    `SessionLocal()` keeps working everywhere it was used before.
+    """
+
+    def __call__(self, **kwargs):
+        get_engine()
+        return _session_factory(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(_session_factory, name)
 
-# Create engine with connection pooling
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=10,           # Number of persistent connections
-    max_overflow=20,        # Additional connections when pool is full
-    pool_pre_ping=True,     # Test connections before using
-    echo=False              # Set to True for SQL query logging
-)
 
 # Session factory for creating database sessions
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+SessionLocal = _LazySessionLocal()
+
 
-# Create all tables (if they don't exist)
-Base.metadata.create_all(bind=engine)
+def __getattr__(name):
+    # `from database.models import engine` still works (created lazily)
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ============================================================
@@ -65,8 +65,8 @@ try:
                 # ASSURMAX products
                 record['ASSURMAX 12M'] = pkg['plans']['ASSURMAX'].get('12_months', {}).get('annual_premium')
                 record['ASSURMAX 24M'] = pkg['plans']['ASSURMAX'].get('24_months', {}).get('total_premium')
-                record['ASSURMAX+ 12M'] = pkg['plans']['ASSURMAX+'].get('12_months', {}).get('annual_premium')
-                record['ASSURMAX+ 24M'] = pkg['plans']['ASSURMAX+'].get('24_months', {}).get('total_premium')
+                record['ASSURMAX+ 12M'] = pkg['plans'].get('ASSURMAX+', {}).get('12_months', {}).get('annual_premium')
+                record['ASSURMAX+ 24M'] = pkg['plans'].get('ASSURMAX+', {}).get('24_months', {}).get('total_premium')
         
         data.append(record)
     
@@ -1,14 +1,14 @@
 
 from database.load_to_db import load_products_from_json
 from database.models import SessionLocal, Product, InsurancePackage, Partner
-from ai_agent.agent import generate_packages
+from ai_agent.agent import generate_packages_batch
 from datetime import datetime
 from pathlib import Path
 import json
 import traceback
 from sqlalchemy import func 
 
-def run_workflow_from_json(json_path: str, max_products: int = 8) -> str:
+def run_workflow_from_json(json_path: str, max_products: int = 8, concurrency: int = 8) -> str:
     """
     Load products from JSON, process with AI agent, return results file.
     """
@@ -101,8 +101,8 @@ def run_workflow_from_json(json_path: str, max_products: int = 8) -> str:
         print(f"STEP 4: Processing {len(products)} products with AI agent...")
         print("="*70)
 
-        for idx, product in enumerate(products, 1):
-            product_dict = {
+        product_dicts = [
+            {
                 "product_name": product.product_name,
                 "brand": product.brand or "N/A",
                 "category": product.category or "N/A",
@@ -110,19 +110,30 @@ def run_workflow_from_json(json_path: str, max_products: int = 8) -> str:
                 "currency": product.currency,
                 "description": product.description or "N/A",
             }
-
+            for product in products
+        ]
+        processed_at = [None] * len(products)
+        done = 0
+
+        def report(idx: int, agent_output: dict):
+            nonlocal done
+            done += 1
+            processed_at[idx] = datetime.utcnow().isoformat()
+            eligible = bool(agent_output.get("eligible", False)) if isinstance(agent_output, dict) else False
+            print(f"\\n  [{done}/{len(products)}] {products[idx].product_name[:50]}...")
+            print(f"               Price: {products[idx].price} {products[idx].currency}")
+            print(f"               Result: {'✅ ELIGIBLE' if eligible else '❌ NOT ELIGIBLE'}")
+
+        # Products run concurrently; results come back in input order
+        outputs = generate_packages_batch(product_dicts, concurrency=concurrency, on_result=report)
+
+        for product, product_dict, agent_output, ts in zip(products, product_dicts, outputs, processed_at):
             try:
-                print(f"\\n  [{idx}/{len(products)}] {product.product_name[:50]}...")
-                print(f"               Price: {product.price} {product.currency}")
-                
-                agent_output = generate_packages(product_dict)
-
                 # Handle string response
                 if isinstance(agent_output, str):
                     agent_output = json.loads(agent_output)
 
                 eligible = bool(agent_output.get("eligible", False))
-                print(f"               Result: {'✅ ELIGIBLE' if eligible else '❌ NOT ELIGIBLE'}")
 
             except Exception as exc:
                 print(f"      AI agent error: {exc}")
@@ -138,9 +149,16 @@ def run_workflow_from_json(json_path: str, max_products: int = 8) -> str:
                 "product": product_dict,
                 "insurance_package": agent_output,
                 "eligible": eligible,
-                "processed_at": datetime.utcnow().isoformat()
+                "processed_at": ts or datetime.utcnow().isoformat()
             })
 
+            # Over the spec's value cap: no package written, the product is done
+            if agent_output.get("over_cap"):
+                product.processed = True
+                product.processing_status = 'completed'
+                product.processing_completed_at = datetime.utcnow()
+                continue
+
             # Save to database
             db.add(
                 InsurancePackage(
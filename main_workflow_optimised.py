@@ -20,9 +20,28 @@ from database.crud import (
 
 
 from ai_agent.tools.classify_product import classify_product
-from ai_agent.tools.calculate_pricing import calculate_pricing
+from ai_agent.tools.pricing_engine import check_value_cap, price
 
 
+def _mark_not_eligible(db, product: Product, response: Dict, write_package: bool = True, label: str = "Not eligible") -> Dict:
+    """
+    Close a product that gets no quote: store its not-eligible package (unless
+    write_package is False), mark it completed and print the reason.
+    """
+    if write_package:
+        create_insurance_package(
+            db=db,
+            partner_id=str(product.partner_id),
+            product_id=str(product.product_id),
+            package_data=response,
+            is_eligible=False
+        )
+    mark_product_completed(db, str(product.product_id))
+
+    print(f"  {label}: {product.product_name[:40]}")
+    print(f"      Reason: {response['reason'][:50]}")
+    return response
+
 
 def process_single_product_db(product_id: UUID) -> Dict:
     db = SessionLocal()
@@ -69,26 +88,30 @@ def process_single_product_db(product_id: UUID) -> Dict:
                 "coverage_modules": classification.get("coverage_modules", []),  
                 "exclusions": classification.get("exclusions", [])  
             }
-
-            create_insurance_package(
-                db=db,
-                partner_id=str(product.partner_id),
-                product_id=str(product.product_id),
-                package_data=response,
-                is_eligible=False
-            )
-            mark_product_completed(db, str(product.product_id))
-            
-            reason_short = response["reason"][:50]
-            print(f"  Not eligible: {product.product_name[:40]}")
-            print(f"      Reason: {reason_short}")
-            
-            return response
+            return _mark_not_eligible(db, product, response)
 
         # Eligible
         risk_profile = classification.get("risk_profile")
         product_value = float(product.price)
 
+        # Over the spec's value cap: rejected before pricing, no package written
+        over_cap = check_value_cap(risk_profile, product_value, market)
+        if over_cap:
+            return _mark_not_eligible(db, product, {
+                "product": {
+                    "name": product.product_name,
+                    "brand": product.brand or "N/A",
+                    "category": classification_result.get("category", "N/A"),
+                    "price": product_value,
+                    "currency": product.currency,
+                },
+                "eligible": False,
+                "over_cap": True,
+                "reason": over_cap["reason"],
+                "market": market,
+                "risk_profile": risk_profile,
+            }, write_package=False, label="Over cap")
+
         response = {
             "product": {
                 "name": product.product_name,
@@ -107,12 +130,7 @@ def process_single_product_db(product_id: UUID) -> Dict:
 
         # STANDARD pricing 
         try:
-            standard_pricing = calculate_pricing.invoke({
-                "risk_profile": risk_profile,
-                "product_value": product_value,
-                "market": market,
-                "plan": "STANDARD"
-            })
+            standard_pricing = price(risk_profile, product_value, market, "STANDARD")
 
             if standard_pricing.get("error"):
                 # If STANDARD fails, mark as not eligible
@@ -176,11 +194,7 @@ def process_single_product_db(product_id: UUID) -> Dict:
             
             if is_electronics:
                 try:
-                    assurmax_pricing = calculate_pricing.invoke({
-                        "product_value": product_value,
-                        "market": market,
-                        "plan": "ASSURMAX"
-                    })
+                    assurmax_pricing = price("", product_value, market, "ASSURMAX")
                     
                     if not assurmax_pricing.get("error"):
                         response["assurmax_premium"] = {
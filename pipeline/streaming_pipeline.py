@@ -7,7 +7,6 @@ from urllib.parse import urlparse
 from typing import Any, List, Dict, Optional, Callable
 from pathlib import Path
 from dotenv import load_dotenv
-from firecrawl import Firecrawl
 import concurrent.futures
 import threading
 import traceback
@@ -21,16 +20,33 @@ sys.path.insert(0, str(parent_dir))
 
 from database.models import SessionLocal, Product, Partner
 from ai_agent.tools.classify_product import classify_product
-from ai_agent.tools.calculate_pricing import calculate_pricing
+from ai_agent.tools.pricing_engine import check_value_cap, price_plans
 from database.crud import create_insurance_package
 
 
 load_dotenv()
 
 
-API_KEY = os.getenv("FIRECRAWL_API_KEY")
-if not API_KEY:
-    raise RuntimeError("FIRECRAWL_API_KEY missing from environment")
+_firecrawl_client = None
+_firecrawl_lock = threading.Lock()
+
+
+def get_firecrawl_client():
+    """
+    Shared Firecrawl client (created once, thread-safe); the SDK is imported
+    and the key checked on first use, not at import.
+    """
+    global _firecrawl_client
+    if _firecrawl_client is None:
+        with _firecrawl_lock:
+            if _firecrawl_client is None:
+                from firecrawl import Firecrawl
+
+                api_key = os.getenv("FIRECRAWL_API_KEY")
+                if not api_key:
+                    raise RuntimeError("FIRECRAWL_API_KEY missing from environment")
+                _firecrawl_client = Firecrawl(api_key=api_key)
+    return _firecrawl_client
 
 
 MAX_PAGES = 100
@@ -286,6 +302,57 @@ def time_function(func_name: str):
 
 
 
+def _mark_not_eligible(
+    db,
+    product: Product,
+    reason: str,
+    stats: dict,
+    stats_lock: threading.Lock,
+    progress: Dict[str, Any],
+    progress_cb: Optional[Callable[[Dict[str, Any]], None]] = None,
+    package_data: Optional[Dict[str, Any]] = None,
+    label: str = "NOT ELIGIBLE",
+):
+    """
+    Close a product that gets no quote: store its not-eligible package (only
+    when package_data is given), mark it completed, count it and report progress.
+
+    Args:
+        progress: current_url / url_index / total_urls / product_name of the update
+        package_data: package to store, None to write no package row
+        label: debug log prefix
+    """
+    if package_data is not None:
+        create_insurance_package(
+            db=db,
+            partner_id=str(product.partner_id),
+            product_id=str(product.product_id),
+            package_data=package_data,
+            is_eligible=False
+        )
+    
+    product.processing_status = 'completed'
+    product.processing_completed_at = datetime.utcnow()
+    db.commit()
+    
+    with stats_lock:
+        stats["processed"] += 1
+        stats["not_eligible"] += 1
+    
+    debug_log(f"    {label}: {reason[:60]}")
+    
+    # Send progress update
+    if progress_cb:
+        progress_cb({
+            "processed": stats["processed"],
+            "eligible": stats["eligible"],
+            "not_eligible": stats["not_eligible"],
+            "scraped": stats["scraped"],
+            **progress,
+            "eligible_status": False,
+            "reason": reason[:100]
+        })
+
 
 @time_function("scrape_and_process_url")
 def scrape_and_process_url(
@@ -311,7 +378,7 @@ def scrape_and_process_url(
     
     debug_log(f"Starting URL {url_index}/{total_urls}: {url[:80]}...")
     
-    client = Firecrawl(api_key=API_KEY)
+    client = get_firecrawl_client()
     db = SessionLocal()
     
     try:
@@ -472,43 +539,20 @@ def scrape_and_process_url(
                 "exclusions": classification.get("exclusions", [])
             }
             
+            progress = {
+                "current_url": url,
+                "url_index": url_index,
+                "total_urls": total_urls,
+                "product_name": product_name[:50],
+            }
+            
             # If not eligible
             if not response["eligible"]:
                 response["reason"] = classification.get("reason", "Not eligible")
-                
-                create_insurance_package(
-                    db=db,
-                    partner_id=str(product.partner_id),
-                    product_id=str(product.product_id),
+                _mark_not_eligible(
+                    db, product, response["reason"], stats, stats_lock, progress, progress_cb,
                     package_data=response,
-                    is_eligible=False
                 )
-                
-                product.processing_status = 'completed'
-                product.processing_completed_at = datetime.utcnow()
-                db.commit()
-                
-                with stats_lock:
-                    stats["processed"] += 1
-                    stats["not_eligible"] += 1
-                
-                debug_log(f"    NOT ELIGIBLE: {response['reason'][:60]}")
-                
-                # Send progress update
-                if progress_cb:
-                    progress_cb({
-                        "processed": stats["processed"],
-                        "eligible": stats["eligible"],
-                        "not_eligible": stats["not_eligible"],
-                        "scraped": stats["scraped"],
-                        "current_url": url,
-                        "url_index": url_index,
-                        "total_urls": total_urls,
-                        "product_name": product_name[:50],
-                        "eligible_status": False,
-                        "reason": response["reason"][:100]
-                    })
-                
                 continue
             
             # Check stop before pricing calculation
@@ -519,17 +563,22 @@ def scrape_and_process_url(
             risk_profile = classification.get("risk_profile")
             product_value = float(product.price)
             
+            # Over the spec's value cap: rejected before pricing, no package written
+            over_cap = check_value_cap(risk_profile, product_value, market)
+            if over_cap:
+                _mark_not_eligible(
+                    db, product, over_cap["reason"], stats, stats_lock, progress, progress_cb,
+                    label="OVER CAP",
+                )
+                continue
+            
             debug_log(f"    Eligible! Starting pricing calculation...")
             
             try:
-                # Standard pricing
+                # STANDARD and ASSURMAX from one batch-engine row
                 pricing_start = time.time()
-                standard_pricing = calculate_pricing.invoke({
-                    "risk_profile": risk_profile,
-                    "product_value": product_value,
-                    "market": market,
-                    "plan": "STANDARD"
-                })
+                plan_pricing = price_plans(risk_profile, product_value, market)
+                standard_pricing = plan_pricing["STANDARD"]
                 pricing_time = time.time() - pricing_start
                 debug_log(f"    Pricing calculation completed in {pricing_time:.2f}s")
                 
@@ -578,14 +627,7 @@ def scrape_and_process_url(
                         if stop_flag and stop_flag.is_set():
                             raise PipelineStopRequested("Stop requested before ASSURMAX")
                         
-                        assurmax_start = time.time()
-                        assurmax_pricing = calculate_pricing.invoke({
-                            "product_value": product_value,
-                            "market": market,
-                            "plan": "ASSURMAX"
-                        })
-                        assurmax_time = time.time() - assurmax_start
-                        debug_log(f"    ASSURMAX pricing completed in {assurmax_time:.2f}s")
+                        assurmax_pricing = plan_pricing["ASSURMAX"]
                         
                         if not assurmax_pricing.get("error"):
                             response["assurmax_premium"] = {
@@ -718,7 +760,7 @@ def true_streaming_pipeline(
     
     total_start = time.time()
     
-    client = Firecrawl(api_key=API_KEY)
+    client = get_firecrawl_client()
     
     parsed_start = urlparse(start_url)
     start_domain = parsed_start.netloc.replace("www.", "")
@@ -0,0 +1,237 @@
+"""Agent loop tests: parallel tools, timeouts, scratchpad projection and JSON stream cut-off (offline, fake chat model)"""
+import json
+import threading
+import time
+from typing import Any, List
+
+from langchain_classic.agents import create_tool_calling_agent
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.tools import tool
+
+from ai_agent.executor import ParallelAgentExecutor, PromptTokenMetrics, ToolOutputRecorder, project_tool_output
+from ai_agent.json_stream import CompleteJSONParsed, IncrementalJSONParser, JSONStreamTerminator
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Replays one AIMessage per call; text is streamed in 3-character tokens."""
+
+    turns: List[AIMessage]
+    streaming: bool = True
+    prompts: List[Any] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next(self, messages) -> AIMessage:
+        self.prompts.append(messages)
+        return self.turns.pop(0)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._next(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._next(messages)
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ]))
+            return
+        for i in range(0, len(message.content), 3):
+            token = message.content[i:i + 3]
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def tool_turn(*calls) -> AIMessage:
+    return AIMessage(content="", tool_calls=[
+        {"name": name, "args": args, "id": f"call_{i}"} for i, (name, args) in enumerate(calls)
+    ])
+
+
+running = 0
+peak_running = 0
+counter_lock = threading.Lock()
+
+
+@tool
+def slow_price(plan: str) -> dict:
+    """Price one plan (slow)."""
+    global running, peak_running
+    with counter_lock:
+        running += 1
+        peak_running = max(peak_running, running)
+    time.sleep(0.3)
+    with counter_lock:
+        running -= 1
+    return {"plan": plan, "premium": 100, "debug": {"trace": "x" * 200}}
+
+
+@tool
+def hanging_tool(query: str) -> str:
+    """Never answers in time."""
+    time.sleep(1.0)
+    return "too late"
+
+
+@tool
+def broken_tool(query: str) -> str:
+    """Always fails."""
+    raise RuntimeError("backend down")
+
+
+TOOLS = [slow_price, hanging_tool, broken_tool]
+PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Test agent."),
+    ("human", "{input}"),
+    ("placeholder", "{agent_scratchpad}"),
+])
+
+
+def make_executor(turns: List[AIMessage], **kwargs):
+    model = ScriptedChatModel(turns=turns)
+    agent = create_tool_calling_agent(model, TOOLS, PROMPT)
+    return ParallelAgentExecutor(agent=agent, tools=TOOLS, max_iterations=5, **kwargs), model
+
+
+# ---------------------------------------------------------------------------
+# IncrementalJSONParser
+# ---------------------------------------------------------------------------
+
+print("IncrementalJSONParser...\n")
+
+text = 'Here you go: ```json\n{"reason": "covers {curly} \\"quoted {\\" braces", "nested": {"a": [1, {"b": "}"}]}}\n``` done {"second": 1}'
+expected = {"reason": 'covers {curly} "quoted {" braces', "nested": {"a": [1, {"b": "}"}]}}
+assert IncrementalJSONParser().feed(text) == expected
+for size in (1, 2, 5, 7):
+    parser = IncrementalJSONParser()
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+    results = [parser.feed(chunk) for chunk in chunks]
+    first = next(i for i, r in enumerate(results) if r is not None)
+    closing = text.index("}\n```") + 1
+    # Complete on the chunk holding the closing brace, not before
+    assert first == (closing - 1) // size and results[first] == expected, size
+print("✅ Nested / escaped braces inside strings, any chunking")
+
+parser = IncrementalJSONParser()
+assert parser.feed("Prices {not json} then ") is None
+assert parser.feed('{"eligible": false}') == {"eligible": False}
+assert IncrementalJSONParser().feed('[1, 2] {"a": ') is None
+print("✅ Braces in prose are skipped")
+
+# ---------------------------------------------------------------------------
+# Parallel dispatch + projection
+# ---------------------------------------------------------------------------
+
+print("\nParallelAgentExecutor...\n")
+
+executor, model = make_executor(
+    [
+        tool_turn(("slow_price", {"plan": "A"}), ("slow_price", {"plan": "B"}), ("slow_price", {"plan": "C"})),
+        AIMessage(content='{"done": true}'),
+    ],
+    max_tool_workers=4,
+    tool_output_projections={"slow_price": ["plan", "premium"]},
+    return_intermediate_steps=True,
+)
+t0 = time.perf_counter()
+result = executor.invoke({"input": "price"})
+elapsed = time.perf_counter() - t0
+steps = result["intermediate_steps"]
+assert [s[1]["plan"] for s in steps] == ["A", "B", "C"]         # model's order
+assert peak_running == 3 and elapsed < 0.8, (peak_running, elapsed)
+print(f"✅ 3 tool calls ran concurrently ({elapsed:.2f}s for 3 x 0.3s), results in call order")
+
+assert "debug" in steps[0][1]                                  # full output kept for the caller
+scratchpad = str(model.prompts[1])
+assert "premium" in scratchpad and "debug" not in scratchpad
+print("✅ Scratchpad carries the projected tool outputs only")
+
+assert project_tool_output({"plan": "A", "debug": {"x": 1}, "c": {"d": 2, "e": 3}}, ["plan", "c.d"]) == {"plan": "A", "c": {"d": 2}}
+assert project_tool_output('{"plan": "A", "debug": 1}', ["plan"]) == {"plan": "A"}
+assert project_tool_output("not json", ["plan"]) == "not json"
+assert project_tool_output({"plan": "A"}, None) == {"plan": "A"}
+print("✅ Tool output projection")
+
+# ---------------------------------------------------------------------------
+# Timeouts and failures become observations
+# ---------------------------------------------------------------------------
+
+recorder = ToolOutputRecorder()
+executor, model = make_executor(
+    [
+        tool_turn(("hanging_tool", {"query": "q"}), ("broken_tool", {"query": "q"}), ("slow_price", {"plan": "A"})),
+        AIMessage(content='{"done": true}'),
+    ],
+    tool_timeout=0.5,
+    return_intermediate_steps=True,
+)
+t0 = time.perf_counter()
+result = executor.invoke({"input": "go"}, config={"callbacks": [recorder]})
+observations = [s[1] for s in result["intermediate_steps"]]
+assert observations[0] == "Error: tool 'hanging_tool' timed out after 0.5s", observations[0]
+assert observations[1].startswith("Error: tool 'broken_tool' failed: RuntimeError"), observations[1]
+assert observations[2]["plan"] == "A"
+assert time.perf_counter() - t0 < 0.9
+print("✅ Timeout and tool error returned as observations, the run continues")
+
+errors = [o for o in recorder.outputs if o.get("error")]
+assert len(errors) == 1 and errors[0]["tool"] == "broken_tool" and "backend down" in errors[0]["error"]
+print("✅ ToolOutputRecorder closes the entry of a raising tool")
+
+# Time spent queued for a worker does not count against the timeout
+executor, model = make_executor(
+    [
+        tool_turn(("slow_price", {"plan": "A"}), ("slow_price", {"plan": "B"})),
+        AIMessage(content='{"done": true}'),
+    ],
+    max_tool_workers=1,
+    tool_timeout=0.5,
+    return_intermediate_steps=True,
+)
+result = executor.invoke({"input": "price"})
+assert [s[1]["plan"] for s in result["intermediate_steps"]] == ["A", "B"], result["intermediate_steps"]
+print("✅ Timeout clock starts when the call runs, not when it is queued")
+
+# ---------------------------------------------------------------------------
+# Stream cut right after the closing brace
+# ---------------------------------------------------------------------------
+
+
+class TokenLog(BaseCallbackHandler):
+    def __init__(self):
+        self.tokens = []
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.tokens.append(token)
+
+
+answer = '{"eligible": true, "note": "a } in text"}'
+tokens, metrics = TokenLog(), PromptTokenMetrics()
+executor, model = make_executor([
+    tool_turn(("slow_price", {"plan": "A"})),
+    AIMessage(content=f"```json\n{answer}\n``` and a long explanation nobody reads"),
+])
+try:
+    executor.invoke({"input": "go"}, config={"callbacks": [tokens, metrics, JSONStreamTerminator()]})
+    raise AssertionError("stream was not cut")
+except CompleteJSONParsed as done:
+    assert done.value == json.loads(answer)
+streamed = "".join(tokens.tokens)
+# Nothing after the 3-character token holding the closing brace
+assert len(streamed) - (streamed.index(answer) + len(answer)) < 3, streamed
+print(f"✅ Stream stopped at the closing brace ({len(streamed)} chars streamed)")
+
+assert len(metrics.iterations) == 2 and metrics.iterations[-1]["error"] == "CompleteJSONParsed"
+print("✅ PromptTokenMetrics records the cut-short final turn")
+
+print("\n✅ All agent executor checks passed!")
@@ -0,0 +1,26 @@
+"""BM25 keyword index test (offline, reads documents.jsonl)"""
+from ai_agent.rag.bm25 import BM25Index, stem, tokenize
+from ai_agent.rag.embedding import chunk_documents, load_documents
+from ai_agent.rag.spec_metadata import build_filter
+
+print("Building BM25 index over the spec chunks...\n")
+
+for plural, singular in [("smartphones", "smartphone"), ("laptops", "laptop"), ("watches", "watch"),
+                         ("accessories", "accessory"), ("boxes", "box"), ("glasses", "glass")]:
+    assert stem(plural) == stem(singular) == singular, (plural, stem(plural), stem(singular))
+assert [stem(w) for w in ("glass", "bus", "analysis", "tvs", "5s")] == ["glass", "bus", "analysis", "tvs", "5s"]
+assert tokenize("ELECTRONIC_PRODUCTS_TN Laptops") == ["electronic_products_tn", "electronic", "product", "tn", "laptop"]
+print("✅ Plural stripping is the same for chunks and queries")
+
+chunks = chunk_documents(load_documents())
+index = BM25Index([c["text"] for c in chunks], [c["metadata"] for c in chunks])
+tunisia_electronics = build_filter(market="Tunisia", spec_family="ELECTRONICS")
+
+# The spec's eligibility table lists "Smartphones" and "Laptops"
+for query in ("smartphone laptop", "smartphones laptops"):
+    docs = index.search(query, k=3, filter=tunisia_electronics)
+    assert docs, f"no keyword match for {query!r}"
+    assert docs[0].metadata["spec_family"] == "ELECTRONICS" and docs[0].metadata["section"] == "eligible_products"
+    print(f"✅ {query!r} -> {docs[0].metadata['file_name']} [{docs[0].metadata['section']}]")
+
+print("\n✅ All BM25 checks passed!")
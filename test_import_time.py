@@ -0,0 +1,64 @@
+"""Import-time budget test: heavy resources must not load at import"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+
+# Seconds allowed for a cold `import pipeline.streaming_pipeline`
+IMPORT_BUDGET_S = float(os.getenv("IMPORT_BUDGET_S", "3.0"))
+
+# Modules that pull in models / network clients and must stay lazy
+HEAVY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "langchain_huggingface",
+    "langchain_pinecone",
+    "langchain_openai",
+    "firecrawl",
+]
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import pipeline.streaming_pipeline
+elapsed = time.perf_counter() - t0
+import database.models as models
+print(json.dumps({
+    "elapsed": elapsed,
+    "loaded": [m for m in %r if m in sys.modules],
+    "engine_created": models._engine is not None,
+}))
+""" % (HEAVY_MODULES,)
+
+
+def measure_import():
+    # No credentials: importing must not need them either
+    env = {k: v for k, v in os.environ.items()
+           if k not in ("OPENAI_API_KEY", "FIRECRAWL_API_KEY", "DATABASE_URL", "PINECONE_API_KEY")}
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_streaming_pipeline_import_is_fast():
+    result = measure_import()
+    assert not result["loaded"], f"heavy modules loaded at import: {result['loaded']}"
+    assert not result["engine_created"], "database engine created at import"
+    assert result["elapsed"] < IMPORT_BUDGET_S, (
+        f"import took {result['elapsed']:.2f}s (budget {IMPORT_BUDGET_S}s)"
+    )
+
+
+if __name__ == "__main__":
+    result = measure_import()
+    print(f"⏱️  import pipeline.streaming_pipeline: {result['elapsed']:.2f}s (budget {IMPORT_BUDGET_S}s)")
+    print(f"   Heavy modules loaded: {result['loaded'] or 'none'}")
+    print(f"   DB engine created: {result['engine_created']}")
+    test_streaming_pipeline_import_is_fast()
+    print("\n✅ Import-time checks passed!")
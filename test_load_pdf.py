@@ -0,0 +1,52 @@
+"""Incremental PDF extraction test: which previously extracted specs are kept (offline, no PDFs parsed)"""
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from ai_agent.rag import load_pdf
+
+
+def run_extraction(tmp: Path, records, input_dirs):
+    out_dir = tmp / "extracted"
+    out_dir.mkdir(exist_ok=True)
+    load_pdf.OUTPUT_DIR = out_dir
+    load_pdf.OUTPUT_FILE = out_dir / "documents.jsonl"
+    load_pdf.MANIFEST_FILE = out_dir / "extract_manifest.json"
+    load_pdf.INPUT_DIRS = [str(d) for d in input_dirs]
+    load_pdf.OUTPUT_FILE.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+    load_pdf.extract_pdfs()
+    with load_pdf.OUTPUT_FILE.open(encoding="utf-8") as f:
+        return [json.loads(line)["source_path"] for line in f if line.strip()]
+
+
+def page(source_path: str, n: int = 1):
+    return {"doc_id": Path(source_path).stem, "file_name": Path(source_path).name,
+            "source_path": source_path, "category": "specs", "page": n, "text": "spec text"}
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    tmp = Path(tmp)
+    old_folder, new_folder = tmp / "old_specs", tmp / "new_specs"
+    old_folder.mkdir()
+    new_folder.mkdir()
+
+    windows_spec = r"C:\Users\someone\Downloads\produittunis\SPEC_TN.pdf"
+    other_folder_spec = str(old_folder / "SPEC_UAE.pdf")       # folder exists, not scanned this run
+    deleted_spec = str(new_folder / "SPEC_DELETED.pdf")         # scanned folder, file gone
+
+    # Only the new (empty) folder is scanned: specs from elsewhere stay
+    kept = run_extraction(tmp, [page(windows_spec), page(windows_spec, 2), page(other_folder_spec)], [new_folder])
+    assert kept == [windows_spec, windows_spec, other_folder_spec], kept
+    print(f"✅ Specs outside the scanned folders are kept ({len(kept)} pages)")
+
+    # A PDF missing from a scanned folder is dropped, the rest are kept
+    kept = run_extraction(tmp, [page(windows_spec), page(other_folder_spec), page(deleted_spec)], [new_folder])
+    assert kept == [windows_spec, other_folder_spec], kept
+    print("✅ A PDF deleted from a scanned folder is removed")
+
+    assert load_pdf.removed_sources([deleted_spec, windows_spec], set(), [str(new_folder), str(tmp / "missing")]) == [deleted_spec]
+    assert load_pdf.removed_sources([deleted_spec], {deleted_spec}, [str(new_folder)]) == []
+    print("✅ removed_sources")
+
+print("\n✅ All PDF extraction checks passed!")
@@ -0,0 +1,107 @@
+"""Batch pricing engine vs the scalar pricing rules (offline)"""
+import random
+
+import numpy as np
+
+from ai_agent.rag.spec_catalog import get_spec_catalog
+from ai_agent.tools.calculate_pricing import calculate_pricing
+from ai_agent.tools.pricing_engine import (
+    ASSURMAX_CONFIG, CATEGORY_RATE_MATRIX, BucketTable, price_batch, pricing_result,
+)
+
+
+def baseline_pricing(risk_profile, product_value, market, plan):
+    """calculate_pricing as it was before the batch engine (scalar, one plan)."""
+    try:
+        value = float(product_value) if product_value else 0.0
+    except (ValueError, TypeError):
+        value = 0.0
+    if value <= 0:
+        return {"error": "Invalid product value"}
+
+    if plan == "ASSURMAX":
+        if market.upper() != "UAE":
+            return {"error": "ASSURMAX is only available for UAE market", "market": market.upper()}
+        config = ASSURMAX_CONFIG["UAE"]
+        pack_cap, currency, flat = config["pack_cap"], config["currency"], config["premium"]
+        if value > pack_cap:
+            return {
+                "error": f"Product value ({value} {currency}) exceeds ASSURMAX pack cap ({pack_cap} {currency})",
+                "plan": "ASSURMAX",
+                "pack_cap": pack_cap,
+                "currency": currency,
+                "eligible": False,
+                "reason": f"Product price must be ≤ {pack_cap} {currency} for ASSURMAX",
+            }
+        return {
+            "plan": "ASSURMAX",
+            "market": market.upper(),
+            "monthly": {"monthly_premium": round((flat * 1.05) / 12, 2), "currency": currency},
+            "12_months": {"annual_premium": flat, "currency": currency},
+            "24_months": {"total_premium": flat * 2, "currency": currency},
+            "assurmax_pack_cap": {"pack_cap": pack_cap, "currency": currency, "max_products_covered": config["max_products"]},
+            "product_value": value,
+            "flat_premium": True,
+        }
+
+    if not risk_profile:
+        return {"error": "risk_profile is required for STANDARD pricing"}
+    if risk_profile not in CATEGORY_RATE_MATRIX:
+        return {
+            "error": f"Risk profile '{risk_profile}' not found in rate matrix",
+            "valid_profiles": list(CATEGORY_RATE_MATRIX.keys()),
+            "risk_profile": risk_profile,
+        }
+    rate_12m, factor_24m = CATEGORY_RATE_MATRIX[risk_profile]
+    currency = "TND" if "tunisia" in market.lower() or "tn" in market.lower() else "AED"
+    premium_12m = round(value * rate_12m, 2)
+    return {
+        "plan": "STANDARD",
+        "market": market.upper(),
+        "monthly": {"monthly_premium": round((premium_12m * 1.05) / 12, 2), "currency": currency},
+        "12_months": {"annual_premium": premium_12m, "currency": currency},
+        "24_months": {"total_premium": round(premium_12m * factor_24m, 2), "currency": currency},
+        "product_value": value,
+        "risk_profile": risk_profile,
+        "rate_12m_percent": round(rate_12m * 100, 2),
+        "duration_factor_24m": factor_24m,
+    }
+
+
+random.seed(7)
+PROFILES = list(CATEGORY_RATE_MATRIX) + ["", "UNKNOWN_PROFILE"]
+MARKETS = ["UAE", "Tunisia", "uae", "TN"]
+VALUES = (
+    [round(random.uniform(0, 20000), random.choice([0, 2, 3])) for _ in range(4000)]
+    + [0, 0.0, -10, "0", "", "abc", "1234.5", "4999.99", 5000, 5000.01, 0.005, 0.015, 1e9]
+)
+
+rows = [(random.choice(PROFILES), value, random.choice(MARKETS)) for value in VALUES]
+profiles, values, markets = zip(*rows)
+print(f"Pricing {len(rows)} rows in one batch...\n")
+
+# Without spec buckets the batch reproduces the scalar rules exactly
+batch = price_batch(profiles, values, markets, buckets=BucketTable(None))
+for i, (profile, value, market) in enumerate(rows):
+    for plan in ("STANDARD", "ASSURMAX"):
+        expected = baseline_pricing(profile, value, market, plan)
+        got = pricing_result(batch, i, plan)
+        assert got == expected, f"{profile} / {value!r} / {market} / {plan}:\n{got}\n!=\n{expected}"
+print(f"✅ price_batch == scalar rules on {len(rows)} rows x 2 plans")
+
+# The tool with the live catalog: unchanged for profiles without spec buckets
+catalog = get_spec_catalog()
+unbucketed = [row for row in rows if not (catalog.get(row[0]) and catalog.get(row[0]).value_buckets)]
+for profile, value, market in unbucketed[:1000]:
+    for plan in ("STANDARD", "ASSURMAX"):
+        got = calculate_pricing.invoke({"risk_profile": profile, "product_value": value, "market": market, "plan": plan})
+        assert got == baseline_pricing(profile, value, market, plan), (profile, value, market, plan, got)
+print(f"✅ calculate_pricing unchanged for {min(len(unbucketed), 1000)} rows of non-bucketed profiles")
+
+# Rounding ties (x.xx5) round like Python's round()
+amounts = np.round(np.random.default_rng(7).uniform(0, 5000, 20000), 3)
+batch = price_batch(["ELECTRONIC_PRODUCTS"] * len(amounts), amounts, "UAE", buckets=BucketTable(None))
+assert all(batch["standard_12m"][i] == round(float(amounts[i]) * 0.05, 2) for i in range(len(amounts)))
+print("✅ 12m premiums round exactly like round(x, 2)")
+
+print("\n✅ All pricing engine checks passed!")
@@ -0,0 +1,73 @@
+"""Spec catalog compiler test (offline, reads documents.jsonl)"""
+import tempfile
+from pathlib import Path
+
+from ai_agent.rag.spec_catalog import SpecCatalog, compile_catalog, load_documents
+
+print("Compiling spec catalog...\n")
+
+catalog = compile_catalog(load_documents())
+print(f"📚 {len(catalog)} risk profiles (version {catalog.version})")
+
+electronics = catalog.get("ELECTRONIC_PRODUCTS_TN")
+assert electronics.market == "Tunisia" and electronics.currency == "TND"
+assert [b.code for b in electronics.value_buckets] == ["L", "M", "H"]
+assert electronics.value_buckets[-1].is_cap
+print(f"✅ ELECTRONIC_PRODUCTS_TN: cap {electronics.value_cap} TND, bucket of 1200 = {electronics.bucket_for(1200).code}")
+
+zara = catalog.get("TEXTILE_FOOTWEAR_ZARA")
+assert zara.brand_restriction == "ZARA"
+print(f"✅ TEXTILE_FOOTWEAR_ZARA: brand restriction {zara.brand_restriction}")
+
+assurmax = catalog.get("ASSURMAX")
+assert assurmax.terms["pack_cap"] == 5000 and assurmax.terms["premium_rate"] == 0.11
+print(f"✅ ASSURMAX: pack cap {assurmax.terms['pack_cap']}, rate {assurmax.terms['premium_rate']}")
+
+home = catalog.get("HOME_APPLIANCES")
+assert home.value_buckets[0].rates == {"12m": 0.05, "24m": 0.085}
+assert home.value_cap is None and home.bucket_for(12000).code == "H"      # no "(cap)" in the spec
+print(f"✅ HOME_APPLIANCES: bucket rates {[b.rates for b in home.value_buckets]}")
+
+assert {r.risk_profile for r in catalog.find("ELECTRONICS")} == {"ELECTRONIC_PRODUCTS", "ELECTRONIC_PRODUCTS_TN"}
+assert [r.risk_profile for r in catalog.find("ELECTRONICS", "UAE")] == ["ELECTRONIC_PRODUCTS"]
+print("✅ Family / market lookups")
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = Path(tmp) / "spec_catalog.json"
+    catalog.save(path)
+    reloaded = SpecCatalog.load(path)
+    assert reloaded.version == catalog.version
+    assert reloaded.get("HOME_APPLIANCES") == home
+    print(f"✅ Round trip through {path.name} ({path.stat().st_size} bytes)")
+
+# Value buckets in the pricing engine
+from ai_agent.tools.pricing_engine import BucketTable, price_batch, pricing_result
+
+buckets = BucketTable(catalog)
+batch = price_batch(
+    ["ELECTRONIC_PRODUCTS_TN", "ELECTRONIC_PRODUCTS_TN", "ELECTRONIC_PRODUCTS_TN", "HOME_APPLIANCES", "ELECTRONIC_PRODUCTS",
+     "HOME_APPLIANCES"],
+    [1200, 1500.5, 9000, 3000, 9000, 12000],
+    ["Tunisia", "Tunisia", "Tunisia", "UAE", "UAE", "UAE"],
+    buckets=buckets,
+)
+assert list(batch["value_bucket"]) == ["L", "M", None, "M", None, "H"]
+assert buckets.bucket_for("ELECTRONIC_PRODUCTS_TN", 1500.5) == "M"
+over_cap = pricing_result(batch, 2)
+assert over_cap["over_cap"] and over_cap["value_cap"] == 8000 and "12_months" not in over_cap
+# Buckets do not change the premium: still the rate matrix
+home_quote = pricing_result(batch, 3)
+assert home_quote["12_months"]["annual_premium"] == 120.0 and home_quote["24_months"]["total_premium"] == 144.0
+assert home_quote["value_bucket"] == "M" and home_quote["value_cap"] is None
+# Open last bucket: above it is not over any cap
+assert not batch["over_cap"][5] and pricing_result(batch, 5)["value_bucket"] == "H"
+assert "value_bucket" not in pricing_result(batch, 4)
+# A TND cap is not compared with an AED price
+mismatch = price_batch(["ELECTRONIC_PRODUCTS_TN"] * 2, [9000, 9000], ["UAE", "TN"], buckets=buckets)
+assert list(mismatch["over_cap"]) == [False, True] and list(mismatch["value_bucket"]) == [None, None]
+assert "value_bucket" not in pricing_result(mismatch, 0) and "12_months" in pricing_result(mismatch, 0)
+assert buckets.cap_for("ELECTRONIC_PRODUCTS_TN", "AED") is None and buckets.cap_for("ELECTRONIC_PRODUCTS_TN", "TND") == 8000
+assert buckets.bucket_for("ELECTRONIC_PRODUCTS_TN", 1500.5, "AED") is None
+print(f"✅ Pricing buckets: 9000 TND over the {over_cap['value_cap']} cap, 12000 AED HOME_APPLIANCES in open bucket H")
+
+print("\n✅ All spec catalog checks passed!")